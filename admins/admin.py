@@ -1,6 +1,6 @@
 from django.contrib import admin
 from core.models import Announcement, Material, Attendance
-from .models import GroupSubjectAssignment
+from .models import GroupSubjectAssignment, Room
 
 
 @admin.register(Announcement)
@@ -29,9 +29,15 @@ class AttendanceAdmin(admin.ModelAdmin):
 
 @admin.register(GroupSubjectAssignment)
 class GroupSubjectAssignmentAdmin(admin.ModelAdmin):
-    list_display = ('group', 'subject', 'teacher')
+    list_display = ('group', 'subject', 'teacher', 'hours_per_week')
     list_filter = ('group__branch', 'group__degree', 'subject', 'teacher')
     search_fields = (
         'group__name', 'group__branch__name', 'group__degree__name',
         'subject__name', 'subject__code', 'teacher__user__first_name', 'teacher__user__last_name'
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ('name', 'capacity')
+    search_fields = ('name',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AdminsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admins'
+
+    def ready(self):
+        # Register hierarchy cache invalidation signals
+        from . import hierarchy  # noqa: F401
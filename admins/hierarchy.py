@@ -0,0 +1,185 @@
+"""
+Cached degree -> branch -> group hierarchy.
+
+The whole hierarchy is small, so it is built into one versioned document
+that the dependent dropdowns download once and filter in the browser.
+The serialised document is kept per process and in the shared cache;
+saving or deleting a Degree, Branch or Group bumps the version, which
+changes the ETag and makes every process rebuild on its next request.
+The same maps back HierarchyValidator, which the user forms, the Django
+admin and the student import use to check degree/branch/group choices.
+"""
+import json
+import threading
+import time as _time
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Branch, Degree, Group
+
+VERSION_KEY = 'hierarchy:version'
+DOCUMENT_KEY = 'hierarchy:document:{}'
+
+
+class Hierarchy:
+    def __init__(self, version, document):
+        self.version = version
+        self.document = document
+        self.body = json.dumps(document, separators=(',', ':'))
+        self.etag = f'"hierarchy-{version}"'
+        self.degrees = {d['id']: d for d in document['degrees']}
+        self.branches = {b['id']: b for b in document['branches']}
+        self.groups = {g['id']: g for g in document['groups']}
+        self._validator = None
+
+    @property
+    def validator(self):
+        if self._validator is None:
+            self._validator = HierarchyValidator(self)
+        return self._validator
+
+    def branches_for(self, degree_id=None):
+        return [b for b in self.document['branches'] if not degree_id or b['degree_id'] == degree_id]
+
+    def groups_for(self, degree_id=None, branch_id=None):
+        return [
+            g for g in self.document['groups']
+            if (not degree_id or g['degree_id'] == degree_id) and (not branch_id or g['branch_id'] == branch_id)
+        ]
+
+
+def build_document(version):
+    degrees = [{'id': d.id, 'name': d.name} for d in Degree.objects.order_by('name', 'id')]
+    branches = [
+        {'id': b.id, 'name': b.name, 'degree_id': b.degree_id}
+        for b in Branch.objects.order_by('name', 'id')
+    ]
+    names = {'branch': {b['id']: b['name'] for b in branches}, 'degree': {d['id']: d['name'] for d in degrees}}
+    groups = [
+        {
+            'id': g.id,
+            'name': g.name,
+            'branch_id': g.branch_id,
+            'degree_id': g.degree_id,
+            'label': f"{g.name} - {names['branch'].get(g.branch_id, '')} ({names['degree'].get(g.degree_id, '')})",
+        }
+        for g in Group.objects.order_by('name', 'id')
+    ]
+    return {'version': version, 'degrees': degrees, 'branches': branches, 'groups': groups}
+
+
+_hierarchy = None
+_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_hierarchy():
+    """Return the current hierarchy, from this process, the shared cache or the database."""
+    global _hierarchy
+    version = _current_version()
+    current = _hierarchy
+    if current is not None and current.version == version:
+        return current
+    with _lock:
+        if _hierarchy is None or _hierarchy.version != version:
+            key = DOCUMENT_KEY.format(version)
+            document = cache.get(key)
+            if document is None:
+                document = build_document(version)
+                cache.set(key, document, 24 * 3600)
+            _hierarchy = Hierarchy(version, document)
+        return _hierarchy
+
+
+def get_validator():
+    """The HierarchyValidator for the current hierarchy version."""
+    return get_hierarchy().validator
+
+
+def invalidate():
+    cache.set(VERSION_KEY, _time.time_ns(), None)
+
+
+@receiver([post_save, post_delete], sender=Degree)
+@receiver([post_save, post_delete], sender=Branch)
+@receiver([post_save, post_delete], sender=Group)
+def _hierarchy_changed(sender, **kwargs):
+    invalidate()
+
+
+def _as_id(value, label):
+    if value is None or value == '':
+        return None
+    if isinstance(value, int):
+        return value
+    value = str(value).strip()
+    if not value.isdigit():
+        raise ValidationError(f'Invalid {label}.')
+    return int(value)
+
+
+class HierarchyValidator:
+    """
+    Consistency checks for a student's degree/branch/group choice, against
+    in-memory maps of group -> (branch, degree) and branch -> degree taken
+    from the cached hierarchy. Each check is a few dict lookups, so whole
+    imports can be validated without a query per row.
+    """
+
+    def __init__(self, current=None):
+        current = current or get_hierarchy()
+        self.degrees = set(current.degrees)
+        self.branch_degree = {b['id']: b['degree_id'] for b in current.branches.values()}
+        self.group_parents = {g['id']: (g['branch_id'], g['degree_id']) for g in current.groups.values()}
+
+    def validate(self, branch=None, degree=None, group=None):
+        """
+        Check one choice; ids may be ints or form strings (empty = unset).
+        Returns ``(branch_id, degree_id, group_id)`` or raises ValidationError.
+        """
+        branch_id = _as_id(branch, 'Branch')
+        degree_id = _as_id(degree, 'Degree')
+        group_id = _as_id(group, 'Group')
+        if degree_id is not None and degree_id not in self.degrees:
+            raise ValidationError('Selected Degree does not exist.')
+        if branch_id is not None and branch_id not in self.branch_degree:
+            raise ValidationError('Selected Branch does not exist.')
+        if group_id is not None and group_id not in self.group_parents:
+            raise ValidationError('Selected Group does not exist.')
+
+        if degree_id is not None and branch_id is not None:
+            branch_degree = self.branch_degree[branch_id]
+            if branch_degree is not None and branch_degree != degree_id:
+                raise ValidationError('Selected Branch does not belong to the selected Degree.')
+        if group_id is not None:
+            group_branch, group_degree = self.group_parents[group_id]
+            if degree_id is not None and group_degree != degree_id:
+                raise ValidationError('Selected Group does not match the selected Degree.')
+            if branch_id is not None and group_branch != branch_id:
+                raise ValidationError('Selected Group does not match the selected Branch.')
+        return branch_id, degree_id, group_id
+
+    def validate_many(self, rows):
+        """
+        Check a batch of ``(branch, degree, group)`` choices.
+        Returns ``(cleaned, errors)``: cleaned id triples (None where the row
+        failed) and ``[(row index, message)]``.
+        """
+        cleaned, errors = [], []
+        for i, (branch, degree, group) in enumerate(rows):
+            try:
+                cleaned.append(self.validate(branch, degree, group))
+            except ValidationError as e:
+                cleaned.append(None)
+                errors.append((i, e.messages[0]))
+        return cleaned, errors
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admins', '0004_branch_degree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=20, unique=True)),
+                ('capacity', models.PositiveIntegerField(default=60)),
+            ],
+            options={
+                'ordering': ['capacity', 'name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='groupsubjectassignment',
+            name='hours_per_week',
+            field=models.PositiveSmallIntegerField(default=3),
+        ),
+    ]
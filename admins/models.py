@@ -30,6 +30,17 @@ class Group(models.Model):
         return f"{self.name} - {self.branch.name} ({self.degree.name})"
 
 
+class Room(models.Model):
+    name = models.CharField(max_length=20, unique=True)
+    capacity = models.PositiveIntegerField(default=60)
+
+    class Meta:
+        ordering = ['capacity', 'name']
+
+    def __str__(self):
+        return f"{self.name} ({self.capacity})"
+
+
 # Note: Subject model is already defined in teachers app
 # We'll use teachers.Subject instead of creating a duplicate
 
@@ -37,6 +48,8 @@ class GroupSubjectAssignment(models.Model):
     group = models.ForeignKey('admins.Group', on_delete=models.CASCADE, related_name='subject_assignments')
     subject = models.ForeignKey('teachers.Subject', on_delete=models.CASCADE, related_name='group_assignments')
     teacher = models.ForeignKey('teachers.Teacher', on_delete=models.CASCADE, related_name='group_subject_assignments')
+    # Hourly sessions per week the timetable generator has to place
+    hours_per_week = models.PositiveSmallIntegerField(default=3)
 
     class Meta:
         unique_together = ("group", "subject")
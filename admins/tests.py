@@ -1,3 +1,206 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from collections import Counter
+from io import StringIO
 
-# Create your tests here.
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+
+from core.models import Task
+from core.tasks import run_pending
+from students.models import Student
+from teachers.models import Teacher, Subject, Timetable, TeacherUnavailability
+from teachers.scheduler import generate_timetable, synthetic_solver
+from . import hierarchy
+from .models import Degree, Branch, Group, GroupSubjectAssignment, Room
+
+
+class TimetableGeneratorTestCase(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        self.groups = [Group.objects.create(name=f'G{i}', branch=branch, degree=degree) for i in range(3)]
+        self.teachers = []
+        for i in range(2):
+            user = User.objects.create_user(username=f'teacher{i}', password='testpass123')
+            self.teachers.append(Teacher.objects.create(user=user, employee_id=f'T00{i}', department='CS'))
+        for i, group in enumerate(self.groups):
+            for j, teacher in enumerate(self.teachers):
+                subject = Subject.objects.create(name=f'S{i}{j}', code=f'S{i}{j}', teacher=teacher)
+                GroupSubjectAssignment.objects.create(group=group, subject=subject, teacher=teacher, hours_per_week=5)
+        # Group 0 is too big for the small room
+        for i in range(40):
+            user = User.objects.create(username=f'student{i}')
+            Student.objects.create(user=user, roll_number=f'R{i}', group=self.groups[0])
+        Room.objects.create(name='Small', capacity=30)
+        Room.objects.create(name='Hall', capacity=120)
+        TeacherUnavailability.objects.create(teacher=self.teachers[0], day='Monday', time_slot='09:00')
+
+    def test_generated_timetable_is_conflict_free(self):
+        """Test no teacher, group or room is double-booked and constraints hold"""
+        result = generate_timetable(time_limit=5)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.violations(), [])
+
+        rows = list(Timetable.objects.values_list('group_id', 'subject__teacher_id', 'room_number', 'day', 'time_slot'))
+        self.assertEqual(len(rows), 30)
+        for column in (0, 1, 2):
+            clashes = Counter((row[column], row[3], row[4]) for row in rows)
+            self.assertEqual(max(clashes.values()), 1)
+        self.assertNotIn('Small', {row[2] for row in rows if row[0] == self.groups[0].id})
+        self.assertNotIn((self.teachers[0].id, 'Monday', '09:00'), {(row[1], row[3], row[4]) for row in rows})
+
+    @override_settings(TASKS_EAGER=True)
+    def test_admin_page_generates_timetable(self):
+        """Test the admin page runs the generator"""
+        client = Client()
+        client.login(username='admin', password='testpass123')
+        response = client.post(reverse('admins:timetable_generate'), {'time_limit': 5}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Timetable generated')
+        self.assertEqual(Timetable.objects.count(), 30)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_time_limit_is_bounded(self):
+        """Test the solver's time limit is clamped to 1-60 s and must be a finite number"""
+        client = Client()
+        client.login(username='admin', password='testpass123')
+        url = reverse('admins:timetable_generate')
+        for value in ('nan', 'inf', 'soon'):
+            self.assertEqual(client.post(url, {'time_limit': value}).status_code, 400)
+        self.assertFalse(Task.objects.exists())
+        client.post(url, {'time_limit': -5})
+        self.assertEqual(Task.objects.get().kwargs['time_limit'], 1.0)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_admin_page_queues_generation(self):
+        """Test the admin page leaves the solver to the worker"""
+        client = Client()
+        client.login(username='admin', password='testpass123')
+        response = client.post(reverse('admins:timetable_generate'), {'time_limit': 5}, follow=True)
+        self.assertContains(response, 'being generated')
+        self.assertEqual(Timetable.objects.count(), 0)
+        self.assertEqual(Task.objects.get().name, 'teachers.tasks.generate_timetable_task')
+        run_pending(['timetable'])
+        self.assertContains(client.get(reverse('admins:timetable_generate')), 'Timetable generated')
+        self.assertEqual(Timetable.objects.count(), 30)
+
+    def test_assignment_hours_are_validated(self):
+        """Test invalid weekly hours are reported instead of failing"""
+        client = Client()
+        client.login(username='admin', password='testpass123')
+        subject = Subject.objects.create(name='New', code='NEW1', teacher=self.teachers[0])
+        for hours in ('abc', '-2', '99'):
+            response = client.post(reverse('admins:assignment_create'), {
+                'group': self.groups[0].id, 'subject': subject.id, 'teacher': self.teachers[0].id,
+                'hours_per_week': hours,
+            })
+            self.assertContains(response, 'Hours per week must be a whole number')
+        self.assertFalse(GroupSubjectAssignment.objects.filter(subject=subject).exists())
+
+    def test_solver_scales_to_synthetic_institution(self):
+        """Test a synthetic institution of 100 groups is solved without violations"""
+        result = synthetic_solver(100, seed=3).solve(time_limit=20)
+        self.assertTrue(result.complete)
+        self.assertEqual(result.violations(), [])
+
+
+class HierarchyApiTestCase(TestCase):
+    def setUp(self):
+        hierarchy.invalidate()
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.degree = Degree.objects.create(name='B.Tech')
+        self.branch = Branch.objects.create(name='CSE', degree=self.degree)
+        Group.objects.create(name='G1', branch=self.branch, degree=self.degree)
+        self.client = Client()
+        self.client.login(username='admin', password='testpass123')
+
+    def test_etag_revalidation_and_invalidation(self):
+        """Test the hierarchy is a 304 until a group changes"""
+        url = reverse('admins:api_hierarchy')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual([g['name'] for g in json.loads(response.content)['groups']], ['G1'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Group.objects.create(name='G2', branch=self.branch, degree=self.degree)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(json.loads(response.content)['groups']), 2)
+
+    def test_filter_endpoints_use_cached_hierarchy(self):
+        """Test the branch/group endpoints filter the cached document"""
+        other = Degree.objects.create(name='M.Tech')
+        Branch.objects.create(name='ECE', degree=other)
+        response = self.client.get(reverse('admins:api_branches'), {'degree': other.id})
+        self.assertEqual([b['name'] for b in response.json()['results']], ['ECE'])
+        hierarchy.get_hierarchy()
+        with self.assertNumQueries(0):
+            groups = hierarchy.get_hierarchy().groups_for(self.degree.id, self.branch.id)
+        self.assertEqual(groups[0]['label'], 'G1 - CSE (B.Tech)')
+
+
+class HierarchyValidatorTestCase(TestCase):
+    def setUp(self):
+        hierarchy.invalidate()
+        User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        self.btech = Degree.objects.create(name='B.Tech')
+        self.mtech = Degree.objects.create(name='M.Tech')
+        self.cse = Branch.objects.create(name='CSE', degree=self.btech)
+        self.ece = Branch.objects.create(name='ECE', degree=self.btech)
+        self.group = Group.objects.create(name='G1', branch=self.cse, degree=self.btech)
+
+    def test_validate(self):
+        """Test consistent choices pass and mismatches are reported"""
+        validator = hierarchy.get_validator()
+        self.assertEqual(validator.validate(str(self.cse.id), str(self.btech.id), str(self.group.id)),
+                         (self.cse.id, self.btech.id, self.group.id))
+        self.assertEqual(validator.validate('', '', ''), (None, None, None))
+        cleaned, errors = validator.validate_many([
+            (self.cse.id, self.mtech.id, None),
+            (self.ece.id, None, self.group.id),
+            (None, None, 999),
+            (None, None, 'x'),
+        ])
+        self.assertEqual(cleaned, [None] * 4)
+        self.assertEqual([message for _, message in errors], [
+            'Selected Branch does not belong to the selected Degree.',
+            'Selected Group does not match the selected Branch.',
+            'Selected Group does not exist.',
+            'Invalid Group.',
+        ])
+
+    def test_add_user_rejects_mismatch_without_creating_user(self):
+        """Test an inconsistent choice creates no orphan user"""
+        client = Client()
+        client.login(username='admin', password='testpass123')
+        response = client.post(reverse('admins:add_user'), {
+            'username': 'new', 'email': 'n@test.com', 'password': 'x', 'first_name': 'N', 'last_name': 'S',
+            'role': 'student', 'roll_number': 'R1', 'branch': self.ece.id, 'degree': self.btech.id, 'group': self.group.id,
+        })
+        self.assertContains(response, 'Selected Group does not match the selected Branch.')
+        self.assertFalse(User.objects.filter(username='new').exists())
+
+    def test_import_students(self):
+        """Test the CSV import resolves names, validates rows and creates students"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('username,email,roll_number,degree,branch,group\n'
+                    'alice,a@test.com,R1,B.Tech,CSE,G1\n'
+                    'bob,b@test.com,R2,,,G1\n'
+                    'carol,c@test.com,R3,M.Tech,CSE,\n')
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaises(CommandError):
+            call_command('import_students', f.name, stdout=StringIO())
+        self.assertEqual(Student.objects.count(), 0)
+
+        call_command('import_students', f.name, skip_invalid=True, stdout=StringIO())
+        self.assertEqual(
+            set(Student.objects.values_list('roll_number', 'branch_id', 'degree_id', 'group_id')),
+            {('R1', self.cse.id, self.btech.id, self.group.id), ('R2', self.cse.id, self.btech.id, self.group.id)},
+        )
@@ -30,7 +30,12 @@ urlpatterns = [
     path('assignments/', views.assignments_list, name='assignments_list'),
     path('assignments/create/', views.assignment_create, name='assignment_create'),
     path('assignments/<int:pk>/delete/', views.assignment_delete, name='assignment_delete'),
+    # Analytics
+    path('analytics/', views.analytics_view, name='analytics'),
+    # Timetable
+    path('timetable/generate/', views.timetable_generate, name='timetable_generate'),
     # API
+    path('api/hierarchy/', views.api_hierarchy, name='api_hierarchy'),
     path('api/groups/', views.api_groups_by_degree_branch, name='api_groups'),
     path('api/branches/', views.api_branches_by_degree, name='api_branches'),
 ]
@@ -1,14 +1,29 @@
+import math
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response
 
+from core import analytics, metrics
 from core.models import Announcement
+from core.ratelimit import rate_limit
+from core.routers import replica_reads
 from students.models import Student
 from teachers.models import Teacher, Subject
-from .models import Branch, Degree, Group, GroupSubjectAssignment
+from teachers import tasks as timetable_tasks
+from teachers.scheduler import build_solver
+from . import hierarchy
+from .models import Branch, Degree, Group, GroupSubjectAssignment, Room
+
+
+# Matches the limit of the assignment form
+MAX_HOURS_PER_WEEK = 20
 
 
 def _require_staff(user):
@@ -16,6 +31,7 @@ def _require_staff(user):
 
 
 @login_required
+@replica_reads
 def admin_dashboard(request):
     if not _require_staff(request.user):
         messages.error(request, 'Access denied.')
@@ -41,48 +57,70 @@ def admin_dashboard(request):
         'degrees_count': degrees_count,
         'groups_count': groups_count,
         'subjects_count': subjects_count,
+        'auth_overhead': metrics.auth_summary(),
+        'rate_limits': metrics.rate_limits.summary(),
     }
     return render(request, 'admins/admin_dashboard.html', context)
 
 
 # --- Lightweight JSON endpoints for dependent dropdowns ---
+# All of them are served from the cached hierarchy document (admins/hierarchy.py)
+async def _staff_hierarchy(request):
+    """The cached hierarchy for staff users, or None"""
+    user = await request.auser()
+    if not _require_staff(user):
+        return None
+    return await sync_to_async(hierarchy.get_hierarchy)()
+
+
 @login_required
-def api_groups_by_degree_branch(request):
-    if not _require_staff(request.user):
+@rate_limit('api')
+async def api_hierarchy(request):
+    """The whole degree/branch/group hierarchy; 304 when the client's ETag is current"""
+    current = await _staff_hierarchy(request)
+    if current is None:
         return JsonResponse({'detail': 'Forbidden'}, status=403)
-    degree_id = request.GET.get('degree')
-    branch_id = request.GET.get('branch')
-    qs = Group.objects.all()
-    if degree_id:
-        qs = qs.filter(degree_id=degree_id)
-    if branch_id:
-        qs = qs.filter(branch_id=branch_id)
-    data = [
-        {
-            'id': g.id,
-            'name': g.name,
-            'branch_id': g.branch_id,
-            'degree_id': g.degree_id,
-            'label': f"{g.name} - {g.branch.name} ({g.degree.name})"
-        }
-        for g in qs.select_related('branch', 'degree')
-    ]
-    return JsonResponse({'results': data})
+    response = get_conditional_response(request, etag=current.etag)
+    if response is None:
+        response = HttpResponse(current.body, content_type='application/json')
+    response['ETag'] = current.etag
+    # Let the browser keep it but revalidate every time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _id_param(request, name):
+    value = request.GET.get(name)
+    return int(value) if value and value.isdigit() else None
 
 
 @login_required
-def api_branches_by_degree(request):
-    if not _require_staff(request.user):
+@rate_limit('api')
+async def api_groups_by_degree_branch(request):
+    current = await _staff_hierarchy(request)
+    if current is None:
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    groups = current.groups_for(_id_param(request, 'degree'), _id_param(request, 'branch'))
+    return JsonResponse({'results': groups})
+
+
+@login_required
+@rate_limit('api')
+async def api_branches_by_degree(request):
+    current = await _staff_hierarchy(request)
+    if current is None:
         return JsonResponse({'detail': 'Forbidden'}, status=403)
-    degree_id = request.GET.get('degree')
-    qs = Branch.objects.all()
-    if degree_id:
-        qs = qs.filter(degree_id=degree_id)
-    data = [
-        {'id': b.id, 'name': b.name, 'degree_id': b.degree_id}
-        for b in qs.select_related('degree')
-    ]
-    return JsonResponse({'results': data})
+    branches = current.branches_for(_id_param(request, 'degree'))
+    return JsonResponse({'results': branches})
+
+
+def _hierarchy_context():
+    document = hierarchy.get_hierarchy().document
+    return {
+        'branches': document['branches'],
+        'degrees': document['degrees'],
+        'groups': document['groups'],
+    }
 
 
 @login_required
@@ -138,6 +176,16 @@ def add_user(request):
         last_name = request.POST.get('last_name')
         role = request.POST.get('role')
         
+        if role == 'student':
+            # Validate consistency before creating anything: branch belongs
+            # to degree, group matches both
+            try:
+                branch_id, degree_id, group_id = hierarchy.get_validator().validate(
+                    request.POST.get('branch'), request.POST.get('degree'), request.POST.get('group'))
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return render(request, 'admins/add_user.html', _hierarchy_context())
+
         # Create user
         user = User.objects.create_user(
             username=username,
@@ -150,44 +198,13 @@ def add_user(request):
         if role == 'student':
             roll_number = request.POST.get('roll_number')
             interests = request.POST.get('interests', '')
-            branch_id = request.POST.get('branch')
-            degree_id = request.POST.get('degree')
-            group_id = request.POST.get('group')
-
-            # Validate consistency: branch belongs to degree, group matches both
-            branch = Branch.objects.filter(id=branch_id).first() if branch_id else None
-            degree = Degree.objects.filter(id=degree_id).first() if degree_id else None
-            group = Group.objects.filter(id=group_id).first() if group_id else None
-            if degree and branch and branch.degree_id and int(branch.degree_id) != int(degree.id):
-                messages.error(request, 'Selected Branch does not belong to the selected Degree.')
-                return render(request, 'admins/add_user.html', {
-                    'branches': Branch.objects.all(),
-                    'degrees': Degree.objects.all(),
-                    'groups': Group.objects.all(),
-                })
-            if group:
-                if degree and int(group.degree_id) != int(degree.id):
-                    messages.error(request, 'Selected Group does not match the selected Degree.')
-                    return render(request, 'admins/add_user.html', {
-                        'branches': Branch.objects.all(),
-                        'degrees': Degree.objects.all(),
-                        'groups': Group.objects.all(),
-                    })
-                if branch and int(group.branch_id) != int(branch.id):
-                    messages.error(request, 'Selected Group does not match the selected Branch.')
-                    return render(request, 'admins/add_user.html', {
-                        'branches': Branch.objects.all(),
-                        'degrees': Degree.objects.all(),
-                        'groups': Group.objects.all(),
-                    })
-
             Student.objects.create(
                 user=user,
                 roll_number=roll_number,
                 interests=interests,
-                branch_id=branch_id or None,
-                degree_id=degree_id or None,
-                group_id=group_id or None,
+                branch_id=branch_id,
+                degree_id=degree_id,
+                group_id=group_id,
             )
         elif role == 'teacher':
             employee_id = request.POST.get('employee_id')
@@ -201,12 +218,7 @@ def add_user(request):
         messages.success(request, f'{role.title()} created successfully!')
         return redirect('admins:dashboard')
     
-    context = {
-        'branches': Branch.objects.all(),
-        'degrees': Degree.objects.all(),
-        'groups': Group.objects.all(),
-    }
-    return render(request, 'admins/add_user.html', context)
+    return render(request, 'admins/add_user.html', _hierarchy_context())
 
 
 # User Management: list, edit, delete
@@ -231,6 +243,17 @@ def user_edit(request, user_id):
     is_student = hasattr(user, 'student')
     is_teacher = hasattr(user, 'teacher')
     if request.method == 'POST':
+        if is_student:
+            # Validate consistency as above, before saving anything
+            try:
+                branch_id, degree_id, group_id = hierarchy.get_validator().validate(
+                    request.POST.get('branch'), request.POST.get('degree'), request.POST.get('group'))
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return render(request, 'admins/user_edit.html', {
+                    'edit_user': user,
+                    **_hierarchy_context(),
+                })
         user.first_name = request.POST.get('first_name', user.first_name)
         user.last_name = request.POST.get('last_name', user.last_name)
         user.email = request.POST.get('email', user.email)
@@ -239,40 +262,6 @@ def user_edit(request, user_id):
             s = user.student
             s.roll_number = request.POST.get('roll_number', s.roll_number)
             s.interests = request.POST.get('interests', s.interests)
-            branch_id = request.POST.get('branch') or None
-            degree_id = request.POST.get('degree') or None
-            group_id = request.POST.get('group') or None
-
-            # Validate consistency as above
-            branch = Branch.objects.filter(id=branch_id).first() if branch_id else None
-            degree = Degree.objects.filter(id=degree_id).first() if degree_id else None
-            group = Group.objects.filter(id=group_id).first() if group_id else None
-            if degree and branch and branch.degree_id and int(branch.degree_id) != int(degree.id):
-                messages.error(request, 'Selected Branch does not belong to the selected Degree.')
-                return render(request, 'admins/user_edit.html', {
-                    'edit_user': user,
-                    'branches': Branch.objects.all(),
-                    'degrees': Degree.objects.all(),
-                    'groups': Group.objects.all(),
-                })
-            if group:
-                if degree and int(group.degree_id) != int(degree.id):
-                    messages.error(request, 'Selected Group does not match the selected Degree.')
-                    return render(request, 'admins/user_edit.html', {
-                        'edit_user': user,
-                        'branches': Branch.objects.all(),
-                        'degrees': Degree.objects.all(),
-                        'groups': Group.objects.all(),
-                    })
-                if branch and int(group.branch_id) != int(branch.id):
-                    messages.error(request, 'Selected Group does not match the selected Branch.')
-                    return render(request, 'admins/user_edit.html', {
-                        'edit_user': user,
-                        'branches': Branch.objects.all(),
-                        'degrees': Degree.objects.all(),
-                        'groups': Group.objects.all(),
-                    })
-
             s.branch_id = branch_id
             s.degree_id = degree_id
             s.group_id = group_id
@@ -286,9 +275,7 @@ def user_edit(request, user_id):
         return redirect('admins:users_list')
     context = {
         'edit_user': user,
-        'branches': Branch.objects.all(),
-        'degrees': Degree.objects.all(),
-        'groups': Group.objects.all(),
+        **_hierarchy_context(),
     }
     return render(request, 'admins/user_edit.html', context)
 
@@ -329,7 +316,7 @@ def branch_create(request):
             messages.success(request, 'Branch created!')
             return redirect('admins:branches_list')
         messages.error(request, 'Please provide Branch name and Degree.')
-    return render(request, 'admins/branch_form.html', {'degrees': Degree.objects.all()})
+    return render(request, 'admins/branch_form.html', {'degrees': hierarchy.get_hierarchy().document['degrees']})
 
 
 @login_required
@@ -344,7 +331,7 @@ def branch_edit(request, pk):
         obj.save()
         messages.success(request, 'Branch updated!')
         return redirect('admins:branches_list')
-    return render(request, 'admins/branch_form.html', {'branch': obj, 'degrees': Degree.objects.all()})
+    return render(request, 'admins/branch_form.html', {'branch': obj, 'degrees': hierarchy.get_hierarchy().document['degrees']})
 
 
 @login_required
@@ -433,8 +420,7 @@ def group_create(request):
             Group.objects.create(name=name, branch_id=branch_id, degree_id=degree_id)
             messages.success(request, 'Group created!')
             return redirect('admins:groups_list')
-    context = {'branches': Branch.objects.all(), 'degrees': Degree.objects.all()}
-    return render(request, 'admins/group_form.html', context)
+    return render(request, 'admins/group_form.html', _hierarchy_context())
 
 
 @login_required
@@ -450,7 +436,7 @@ def group_edit(request, pk):
         obj.save()
         messages.success(request, 'Group updated!')
         return redirect('admins:groups_list')
-    context = {'group': obj, 'branches': Branch.objects.all(), 'degrees': Degree.objects.all()}
+    context = {'group': obj, **_hierarchy_context()}
     return render(request, 'admins/group_form.html', context)
 
 
@@ -543,14 +529,23 @@ def assignment_create(request):
         group_id = request.POST.get('group')
         subject_id = request.POST.get('subject')
         teacher_id = request.POST.get('teacher')
+        try:
+            hours_per_week = int(request.POST.get('hours_per_week') or 3)
+        except ValueError:
+            hours_per_week = None
         # Validate consistency: subject.teacher must match chosen teacher
         subj = Subject.objects.filter(id=subject_id).first()
-        if not subj:
+        if hours_per_week is None or not 0 <= hours_per_week <= MAX_HOURS_PER_WEEK:
+            messages.error(request, f'Hours per week must be a whole number from 0 to {MAX_HOURS_PER_WEEK}.')
+        elif not subj:
             messages.error(request, 'Invalid subject.')
         elif str(subj.teacher_id) != str(teacher_id):
             messages.error(request, 'Selected subject is not taught by the chosen teacher.')
         else:
-            GroupSubjectAssignment.objects.get_or_create(group_id=group_id, subject_id=subject_id, teacher_id=teacher_id)
+            GroupSubjectAssignment.objects.update_or_create(
+                group_id=group_id, subject_id=subject_id,
+                defaults={'teacher_id': teacher_id, 'hours_per_week': hours_per_week}
+            )
             messages.success(request, 'Assignment created!')
             return redirect('admins:assignments_list')
     context = {
@@ -571,4 +566,43 @@ def assignment_delete(request, pk):
         obj.delete()
         messages.success(request, 'Assignment deleted!')
         return redirect('admins:assignments_list')
-    return render(request, 'admins/confirm_delete.html', {'object': obj, 'type': 'Assignment'})
\ No newline at end of file
+    return render(request, 'admins/confirm_delete.html', {'object': obj, 'type': 'Assignment'})
+
+
+# Analytics
+@login_required
+@replica_reads
+def analytics_view(request):
+    if not _require_staff(request.user):
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+    return render(request, 'admins/analytics.html', {'stats': analytics.get_analytics()})
+
+
+# Timetable generation
+@login_required
+def timetable_generate(request):
+    if not _require_staff(request.user):
+        messages.error(request, 'Access denied.')
+        return redirect('core:dashboard')
+    if request.method == 'POST':
+        try:
+            time_limit = float(request.POST.get('time_limit') or 10)
+        except ValueError:
+            time_limit = math.nan
+        if not math.isfinite(time_limit):
+            return HttpResponse('time_limit must be a number of seconds', status=400)
+        time_limit = max(1.0, min(time_limit, 60))
+        # The solver can take up to a minute, so it runs on the worker
+        timetable_tasks.queue_generation(time_limit, bool(request.POST.get('allow_partial')))
+        return redirect('admins:timetable_generate')
+    solver, scope = build_solver()
+    context = {
+        'groups_count': len(scope),
+        'hours_count': len(solver.lessons),
+        'rooms': Room.objects.all(),
+        'slots_count': len(solver.slots),
+        'problems': solver.diagnose(),
+        'status': timetable_tasks.generation_status(),
+    }
+    return render(request, 'admins/timetable_generate.html', context)
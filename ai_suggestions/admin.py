@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Suggestion, CompletedTask
+from .models import Suggestion, CompletedTask, TaskTemplate
 
 # Register your models here.
 
@@ -13,3 +13,10 @@ class CompletedTaskAdmin(admin.ModelAdmin):
     list_display = ("student", "task_title", "time_minutes", "completed_at")
     list_filter = ("completed_at", "student")
     search_fields = ("task_title", "student__user__username")
+
+
+@admin.register(TaskTemplate)
+class TaskTemplateAdmin(admin.ModelAdmin):
+    list_display = ("title", "tags", "subject", "time_minutes", "is_active")
+    list_filter = ("is_active", "subject")
+    search_fields = ("title", "tags")
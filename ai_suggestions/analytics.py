@@ -0,0 +1,156 @@
+"""
+Completed-task analytics: weekly minutes, streaks and how often the
+suggestions of each source get done.
+
+Everything is read from ``TaskDay`` rollups, one row per student, day and
+suggestion source holding the tasks suggested and completed and the
+minutes spent. The endpoints therefore cost O(days), however many tasks
+a student completes. A day is recomputed from its raw rows (through the
+(student, completed_at) and (student, created_at) indexes) whenever a
+task is completed or deleted and whenever audit rows are written, so
+the rollups stay current without ever rescanning the history.
+``python manage.py rollup_tasks`` builds them for existing data.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import CompletedTask, Suggestion, TaskDay
+from .services import item_source
+
+DEFAULT_WEEKS = 8
+
+
+def day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def rebuild(student_ids=None, start=None, end=None):
+    """
+    Recompute the rollups of ``student_ids`` (all students when None) for
+    the days ``start`` to ``end`` inclusive (unbounded when None).
+    Returns the number of TaskDay rows written.
+    """
+    completed = CompletedTask.objects.all()
+    shown = Suggestion.objects.filter(student__isnull=False)
+    days = TaskDay.objects.all()
+    if student_ids is not None:
+        completed = completed.filter(student_id__in=student_ids)
+        shown = shown.filter(student_id__in=student_ids)
+        days = days.filter(student_id__in=student_ids)
+    if start is not None:
+        completed = completed.filter(completed_at__gte=day_bounds(start)[0])
+        shown = shown.filter(created_at__gte=day_bounds(start)[0])
+        days = days.filter(date__gte=start)
+    if end is not None:
+        completed = completed.filter(completed_at__lt=day_bounds(end)[1])
+        shown = shown.filter(created_at__lt=day_bounds(end)[1])
+        days = days.filter(date__lte=end)
+
+    rows = defaultdict(lambda: {'suggested': 0, 'completed': 0, 'minutes': 0})
+    for row in completed.annotate(date=TruncDate('completed_at')).values('student_id', 'date', 'source').annotate(
+            count=Count('id'), total_minutes=Sum('time_minutes')).order_by():
+        counts = rows[row['student_id'], row['date'], row['source']]
+        counts['completed'] = row['count']
+        counts['minutes'] = max(row['total_minutes'] or 0, 0)
+    # A payload is the list of tasks shown, counted per item source (a
+    # topped-up list mixes them); its length is not portable SQL
+    for student_id, created_at, source, payload in shown.values_list(
+            'student_id', 'created_at', 'source', 'payload').iterator(chunk_size=2000):
+        day = timezone.localdate(created_at)
+        for item in payload if isinstance(payload, list) else [None]:
+            rows[student_id, day, item_source(item, source)]['suggested'] += 1
+
+    with transaction.atomic():
+        days.delete()
+        TaskDay.objects.bulk_create([
+            TaskDay(student_id=student_id, date=date, source=source, **counts)
+            for (student_id, date, source), counts in rows.items()
+        ], batch_size=1000)
+    return len(rows)
+
+
+def rollup_day(student_id, day):
+    return rebuild([student_id], day, day)
+
+
+def schedule(student_id, day):
+    """Queue the recount of a student's day."""
+    from .tasks import rollup_task_day
+    rollup_task_day.delay(student_id, day.isoformat(), dedup_key=f'taskday:{student_id}:{day.isoformat()}')
+
+
+@receiver([post_save, post_delete], sender=CompletedTask)
+def _task_changed(sender, instance, **kwargs):
+    schedule(instance.student_id, timezone.localdate(instance.completed_at))
+
+
+def week_start(day):
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def weekly_minutes(days, today, weeks=DEFAULT_WEEKS):
+    """Minutes and tasks per week (Monday first) for the last ``weeks`` weeks, oldest first"""
+    current = week_start(today)
+    totals = {current - datetime.timedelta(weeks=i): {'minutes': 0, 'tasks': 0} for i in range(weeks)}
+    for day in days:
+        week = totals.get(week_start(day.date))
+        if week is not None:
+            week['minutes'] += day.minutes
+            week['tasks'] += day.completed
+    return [{'week': week.isoformat(), **totals[week]} for week in sorted(totals)]
+
+
+def streaks(active_dates, today):
+    """Current and longest run of consecutive days with a completed task"""
+    longest = run = 0
+    previous = None
+    for day in sorted(active_dates):
+        run = run + 1 if previous is not None and day - previous == datetime.timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    # The current streak survives until the end of the day after the last task
+    current = run if previous is not None and (today - previous).days <= 1 else 0
+    return {'current': current, 'longest': longest}
+
+
+def conversion(totals):
+    """[(source, suggested, completed, minutes)] as dicts with the completion rate (%)"""
+    merged = defaultdict(lambda: [0, 0, 0])
+    for source, *counts in totals:
+        # '' is a task completed without a suggestion to link it to
+        merged[source or 'unknown'] = [a + b for a, b in zip(merged[source or 'unknown'], counts)]
+    return [{
+        'source': source,
+        'suggested': suggested,
+        'completed': completed,
+        'minutes': minutes,
+        'completion_rate': round(completed / suggested * 100, 1) if suggested else None,
+    } for source, (suggested, completed, minutes) in sorted(merged.items())]
+
+
+def student_stats(student, weeks=DEFAULT_WEEKS, today=None):
+    """Weekly minutes, streaks and per-source conversion of one student"""
+    today = today or timezone.localdate()
+    days = list(TaskDay.objects.filter(student=student).only('date', 'source', 'suggested', 'completed', 'minutes'))
+    return {
+        'weekly': weekly_minutes(days, today, weeks),
+        'streak': streaks({day.date for day in days if day.completed}, today),
+        'sources': conversion((day.source, day.suggested, day.completed, day.minutes) for day in days),
+    }
+
+
+def source_stats(since=None):
+    """Per-source conversion over all students, from ``since`` (a date) on"""
+    days = TaskDay.objects.all()
+    if since is not None:
+        days = days.filter(date__gte=since)
+    return conversion(days.values_list('source').annotate(
+        Sum('suggested'), Sum('completed'), Sum('minutes')).order_by())
@@ -0,0 +1,165 @@
+"""
+Buffered audit log of the suggestions students were shown.
+
+The suggestion endpoints used to insert one ``Suggestion`` row per page
+refresh, even when the list came straight from the cache. ``record`` now
+skips a list whose payload hash matches the last one recorded for that
+student (kept in the shared cache), and buffers the rest in memory.
+
+The buffer is written with one ``bulk_create`` once it holds
+``SUGGESTION_AUDIT_BATCH`` rows, at the end of the first request more
+than ``SUGGESTION_AUDIT_FLUSH_SECONDS`` after its oldest row, and when
+the process exits. A crashed process loses at most that much of the
+audit trail. Rows carry the time the list was shown, not when they were
+written.
+
+A completed task names its list by payload hash. The list and its source
+are also kept in the shared cache under that hash, so a completion is
+attributed even while the row sits in another process's buffer; the
+task is linked to the row when that buffer is flushed.
+
+``python manage.py compact_suggestions`` drops old and repeated rows.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import analytics
+from .models import CompletedTask, Suggestion
+
+logger = logging.getLogger(__name__)
+
+# How long the last recorded hash is remembered per student
+HASH_TTL = 24 * 3600
+
+
+def payload_hash(payload):
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def last_hash_key(student_id):
+    return f'suggest-audit:{student_id}'
+
+
+def list_key(student_id, digest):
+    return f'suggest-list:{student_id}:{digest}'
+
+
+class AuditBuffer:
+    def __init__(self):
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def add(self, row):
+        """Buffer a row; True when the buffer should be flushed."""
+        with self._lock:
+            self._rows.append(row)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            return len(self._rows) >= getattr(settings, 'SUGGESTION_AUDIT_BATCH', 100)
+
+    def due(self):
+        with self._lock:
+            return self._oldest is not None and (
+                time.monotonic() - self._oldest >= getattr(settings, 'SUGGESTION_AUDIT_FLUSH_SECONDS', 10))
+
+    def drain(self):
+        with self._lock:
+            rows, self._rows, self._oldest = self._rows, [], None
+        return rows
+
+    def __len__(self):
+        return len(self._rows)
+
+
+buffer = AuditBuffer()
+
+
+def record(student_id, payload, source):
+    """
+    Audit a list shown to a student, unless it is the one last recorded
+    for them. Returns the list's payload hash, which the client sends back
+    with a completed task to say which list it came from (``shown``).
+    """
+    digest = payload_hash(payload)
+    cache.set(list_key(student_id, digest), (source, payload), HASH_TTL)
+    key = last_hash_key(student_id)
+    if cache.get(key) == digest:
+        return digest
+    cache.set(key, digest, HASH_TTL)
+    row = Suggestion(student_id=student_id, payload=payload, source=source, payload_hash=digest,
+                     created_at=timezone.now())
+    if buffer.add(row):
+        flush()
+    return digest
+
+
+def shown(student_id, digest, before=None):
+    """
+    (row, source, payload) of a list shown to a student, by its payload
+    hash. The row is the last one shown before ``before`` (default now),
+    or None while it is still buffered in some process; source and
+    payload come from the shared cache then, or are ('', None) when the
+    hash is unknown.
+    """
+    # Ours may still be buffered
+    flush()
+    row = Suggestion.objects.filter(
+        student_id=student_id, payload_hash=digest, created_at__lte=before or timezone.now()
+    ).order_by('-created_at').first()
+    if row is not None:
+        return row, row.source, row.payload
+    return (None, *cache.get(list_key(student_id, digest), ('', None)))
+
+
+def _link_completions(rows):
+    """Point tasks completed while their list was buffered at its row."""
+    written = {(row.student_id, row.payload_hash): row for row in rows if row.pk}
+    pending = CompletedTask.objects.filter(
+        suggestion_id__isnull=True,
+        student_id__in={row.student_id for row in rows},
+        suggestion_hash__in={row.payload_hash for row in rows},
+    ).values_list('id', 'student_id', 'suggestion_hash')
+    for task_id, student_id, digest in pending:
+        row = written.get((student_id, digest))
+        if row is not None:
+            CompletedTask.objects.filter(id=task_id).update(suggestion_id=row)
+
+
+def flush():
+    """Write the buffered rows; returns how many were written."""
+    rows = buffer.drain()
+    if not rows:
+        return 0
+    try:
+        Suggestion.objects.bulk_create(rows)
+    except Exception:
+        # Forget the hashes, so these lists are recorded again next time
+        cache.delete_many([last_hash_key(row.student_id) for row in rows])
+        logger.exception('Could not write %d suggestion audit row(s)', len(rows))
+        return 0
+    _link_completions(rows)
+    today = timezone.localdate()
+    for student_id in {row.student_id for row in rows}:
+        analytics.schedule(student_id, today)
+    return len(rows)
+
+
+@receiver(request_finished)
+def _flush_when_due(sender, **kwargs):
+    if buffer.due():
+        flush()
+
+
+atexit.register(flush)
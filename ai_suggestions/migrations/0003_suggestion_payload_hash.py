@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_suggestions', '0002_completedtask'),
+        ('students', '0002_student_branch_student_degree_student_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='suggestion',
+            name='payload_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='suggestion',
+            index=models.Index(fields=['student', 'created_at'], name='ai_suggesti_student_f3b40d_idx'),
+        ),
+    ]
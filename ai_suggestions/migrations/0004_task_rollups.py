@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_suggestions', '0003_suggestion_payload_hash'),
+        ('students', '0002_student_branch_student_degree_student_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('source', models.CharField(blank=True, default='', max_length=64)),
+                ('suggested', models.PositiveIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('minutes', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='completedtask',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='completedtask',
+            index=models.Index(fields=['student', 'completed_at'], name='ai_suggesti_student_243ba8_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskday',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.student'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskday',
+            unique_together={('student', 'date', 'source')},
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_suggestions', '0004_task_rollups'),
+        ('teachers', '0003_teacherunavailability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('reason', models.CharField(blank=True, max_length=200)),
+                ('tags', models.CharField(blank=True, help_text='Comma-separated topics, matched against interests and subjects', max_length=200)),
+                ('time_minutes', models.PositiveSmallIntegerField(default=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='teachers.subject')),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_suggestions', '0005_tasktemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='completedtask',
+            name='suggestion_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='suggestion',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # Create your models here.
 
@@ -8,8 +9,14 @@ class Suggestion(models.Model):
     # We'll link to students.models.Student using a lazy string to avoid circular imports
     student = models.ForeignKey("students.Student", null=True, blank=True, on_delete=models.SET_NULL)
     payload = models.JSONField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # When the list was shown; rows are buffered and written later (audit.py)
+    created_at = models.DateTimeField(default=timezone.now)
     source = models.CharField(max_length=64, default="openai")
+    # SHA-256 of the payload, to skip recording an unchanged list (audit.py)
+    payload_hash = models.CharField(max_length=64, blank=True, default="")
+
+    class Meta:
+        indexes = [models.Index(fields=["student", "created_at"])]
 
     def __str__(self):
         return f"Suggestion {self.id} for {self.student}"
@@ -23,9 +30,44 @@ class CompletedTask(models.Model):
     time_minutes = models.IntegerField(default=10)
     completed_at = models.DateTimeField(auto_now_add=True)
     suggestion_id = models.ForeignKey(Suggestion, on_delete=models.SET_NULL, null=True, blank=True)
+    # The suggestion's source when the task was completed, for the rollups
+    source = models.CharField(max_length=64, blank=True, default="")
+    # Payload hash of the list the task was shown in, so the audit row can
+    # be linked once it is written (it may be buffered in another process)
+    suggestion_hash = models.CharField(max_length=64, blank=True, default="")
 
     class Meta:
         ordering = ['-completed_at']
+        indexes = [models.Index(fields=['student', 'completed_at'])]
+
+    def __str__(self):
+        return f"{self.student.user.username} completed: {self.task_title}"
+
+
+class TaskDay(models.Model):
+    """A student's suggested and completed tasks on one day, per suggestion source (analytics.py)"""
+    student = models.ForeignKey("students.Student", on_delete=models.CASCADE)
+    date = models.DateField()
+    source = models.CharField(max_length=64, blank=True, default="")
+    suggested = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    minutes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['student', 'date', 'source']
+
+    def __str__(self):
+        return f"{self.student} {self.date} {self.source}: {self.completed}/{self.suggested}"
+
+
+class TaskTemplate(models.Model):
+    """A free-period task in the catalogue the local recommender picks from (recommender.py)"""
+    title = models.CharField(max_length=200)
+    reason = models.CharField(max_length=200, blank=True)
+    tags = models.CharField(max_length=200, blank=True, help_text="Comma-separated topics, matched against interests and subjects")
+    subject = models.ForeignKey("teachers.Subject", on_delete=models.SET_NULL, null=True, blank=True)
+    time_minutes = models.PositiveSmallIntegerField(default=10)
+    is_active = models.BooleanField(default=True)
 
     def __str__(self):
-        return f"{self.student.user.username} completed: {self.task_title}"
\ No newline at end of file
+        return self.title
@@ -0,0 +1,218 @@
+"""
+Local suggestion engine: TF-IDF matching over the task catalogue.
+
+Every active ``TaskTemplate`` (or, while the catalogue is empty, the
+built-in ``RANDOM_TASKS``) is a document made of its title, reason,
+tags and subject, with tags counting double. The index keeps one posting
+list per term (template ids and L2-normalised TF-IDF weights, as NumPy
+arrays), so a query costs one ``np.bincount`` over the postings of its
+few terms, and the top k come from ``np.argpartition``. No network call
+is involved, so suggestions come back in milliseconds.
+
+A student's query is their comma-separated interests, the subjects of
+their group, and the subject of their next class today (counted twice).
+Templates that match nothing are only used to fill up to k, at random.
+Tasks the student recently completed or dismissed (seen.py) are skipped.
+
+The index is built once per process and rebuilt when the catalogue
+version in the shared cache moves; saving or deleting a template or a
+subject bumps it, as for the timetable index.
+"""
+import math
+import random
+import re
+import threading
+import time as _time
+from collections import Counter
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from admins.models import GroupSubjectAssignment
+from teachers import timetable
+from teachers.models import Subject
+from .models import TaskTemplate
+from .seen import title_key
+
+VERSION_KEY = 'catalogue:version'
+TAG_WEIGHT = 2
+NEXT_CLASS_WEIGHT = 2
+# Suggestion.source of the lists this engine makes
+SOURCE = 'catalogue'
+
+TOKEN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is it of on or the this to up with your you'.split())
+
+
+def tokenize(text):
+    """Lower-cased words without stopwords, plural "s" dropped"""
+    tokens = []
+    for token in TOKEN.findall((text or '').lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_tags(text):
+    return [tag.strip() for tag in (text or '').split(',') if tag.strip()]
+
+
+class CatalogueIndex:
+    def __init__(self, version, templates):
+        self.version = version
+        # [{'title', 'time_minutes', 'reason'}], in index order
+        self.templates = []
+        # The set of terms of each template
+        self.terms = []
+        # Title hash (seen.title_key) -> template indices
+        self.by_key = {}
+        documents = []
+        for template in templates:
+            self.templates.append({
+                'title': template['title'],
+                'time_minutes': template['time_minutes'],
+                'reason': template.get('reason') or '',
+            })
+            terms = Counter(tokenize(' '.join([template['title'], template.get('reason') or '',
+                                               template.get('subject_name') or ''])))
+            for tag in split_tags(template.get('tags')):
+                for token in tokenize(tag):
+                    terms[token] += TAG_WEIGHT
+            documents.append(terms)
+            self.terms.append(frozenset(terms))
+            self.by_key.setdefault(title_key(template['title']), []).append(len(documents) - 1)
+
+        count = len(documents)
+        frequency = Counter(term for terms in documents for term in terms)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in frequency.items()}
+        postings = {term: ([], []) for term in frequency}
+        for doc, terms in enumerate(documents):
+            weights = {term: (1 + math.log(tf)) * self.idf[term] for term, tf in terms.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                postings[term][0].append(doc)
+                postings[term][1].append(weight / norm)
+        self.postings = {term: (np.array(docs, dtype=np.int32), np.array(weights, dtype=np.float32))
+                         for term, (docs, weights) in postings.items()}
+
+    def __len__(self):
+        return len(self.templates)
+
+    def query_vector(self, texts):
+        """{term: weight} for weighted (text, weight) pairs, TF-IDF and L2-normalised"""
+        terms = Counter()
+        for text, weight in texts:
+            for token in tokenize(text):
+                if token in self.idf:
+                    terms[token] += weight
+        weights = {term: (1 + math.log(tf)) * self.idf[term] for term, tf in terms.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term: weight / norm for term, weight in weights.items()}
+
+    def scores(self, query):
+        """Cosine similarity of every template to the query vector"""
+        if not query:
+            return np.zeros(len(self), dtype=np.float32)
+        docs = np.concatenate([self.postings[term][0] for term in query])
+        weights = np.concatenate([self.postings[term][1] * weight for term, weight in query.items()])
+        return np.bincount(docs, weights=weights, minlength=len(self)).astype(np.float32)
+
+    def top(self, query, k, exclude=()):
+        """Indices of the k best templates: matches first, best first, then random fill"""
+        scores = self.scores(query)
+        if exclude:
+            scores[list(exclude)] = -1
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind='stable')].tolist()
+        if len(best) < k:
+            rest = np.flatnonzero(scores == 0).tolist()
+            best += random.sample(rest, min(k - len(best), len(rest)))
+        return best
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def load_templates():
+    templates = list(TaskTemplate.objects.filter(is_active=True).order_by('id').values(
+        'title', 'reason', 'tags', 'time_minutes', subject_name=F('subject__name')))
+    if not templates:
+        from .services import RANDOM_TASKS
+        templates = [{'title': task['title'], 'reason': task['reason'], 'time_minutes': task['time_minutes']}
+                     for task in RANDOM_TASKS]
+    return templates
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The process's catalogue index, rebuilt when the catalogue changed."""
+    global _index
+    version = _current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            _index = CatalogueIndex(version, load_templates())
+        return _index
+
+
+def invalidate():
+    global _index
+    _index = None
+    cache.set(VERSION_KEY, _time.time_ns(), None)
+
+
+@receiver([post_save, post_delete], sender=TaskTemplate)
+@receiver([post_save, post_delete], sender=Subject)
+def _catalogue_changed(sender, **kwargs):
+    invalidate()
+
+
+def student_query(student):
+    """(text, weight) pairs describing a student: interests, group subjects, next class"""
+    texts = [(interest, 1) for interest in split_tags(student.interests)]
+    if student.group_id is not None:
+        subjects = GroupSubjectAssignment.objects.filter(group_id=student.group_id).values_list(
+            'subject__name', flat=True)
+        texts += [(name, 1) for name in subjects]
+        upcoming = timetable.next_session(student.group_id)
+        if upcoming:
+            texts.append((upcoming['subject'], NEXT_CLASS_WEIGHT))
+    return texts
+
+
+def recommend(student, k=3, exclude=()):
+    """
+    Up to ``k`` suggestions ({'title', 'time_minutes', 'reason', 'source'}) for a
+    student, skipping titles whose ``seen.title_key`` is in ``exclude``.
+    """
+    index = get_index()
+    texts = student_query(student)
+    query = index.query_vector(texts)
+    excluded = [doc for key in exclude for doc in index.by_key.get(key, ())]
+    suggestions = []
+    for doc in index.top(query, k, excluded):
+        suggestion = dict(index.templates[doc], source=SOURCE)
+        if not suggestion['reason']:
+            matches = list(dict.fromkeys(text for text, _ in texts if index.terms[doc].intersection(tokenize(text))))
+            suggestion['reason'] = f"For {', '.join(matches[:2])}" if matches else "Quick free-period task"
+        suggestions.append(suggestion)
+    return suggestions
@@ -0,0 +1,72 @@
+"""
+Per-student set of recently completed or dismissed tasks.
+
+Suggestion generation, top-ups and the random tasks skip anything in it,
+so a student is not offered a task they have just finished or waved
+away. The set lives in the cache (``seen:<student id>``) as 64-bit
+hashes of the normalised titles, each expiring ``SUGGESTION_SEEN_DAYS``
+after it was added, at most ``MAX_TITLES`` of them. Checking it is one
+cache read. ``CompletedTask`` is only queried to rebuild a set the cache
+has lost; dismissals are kept nowhere else, so they are forgotten then.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CompletedTask
+
+MAX_TITLES = 500
+
+
+def title_key(title):
+    """64-bit hash of a title, ignoring case and spacing"""
+    normalised = ' '.join(str(title).casefold().split())
+    return int.from_bytes(hashlib.blake2b(normalised.encode(), digest_size=8).digest(), 'big')
+
+
+def seen_key(student_id):
+    return f'seen:{student_id}'
+
+
+def ttl():
+    return getattr(settings, 'SUGGESTION_SEEN_DAYS', 7) * 24 * 3600
+
+
+def _rebuild(student_id, now):
+    since = datetime.fromtimestamp(now - ttl(), tz=dt_timezone.utc)
+    entries = {}
+    for title, completed_at in CompletedTask.objects.filter(
+            student_id=student_id, completed_at__gte=since).values_list('task_title', 'completed_at'):
+        key = title_key(title)
+        entries[key] = max(entries.get(key, 0), int(completed_at.timestamp()) + ttl())
+    return entries
+
+
+def _load(student_id, now):
+    """{title hash: expiry} of the unexpired entries"""
+    entries = cache.get(seen_key(student_id))
+    if entries is None:
+        entries = _rebuild(student_id, now)
+        cache.set(seen_key(student_id), entries, ttl())
+    return {key: expiry for key, expiry in entries.items() if expiry > now}
+
+
+def get(student_id, now=None):
+    """The title hashes a student has completed or dismissed recently"""
+    return frozenset(_load(student_id, int(now or time.time())))
+
+
+def add(student_id, titles, now=None):
+    """Remember completed or dismissed titles; returns the updated set."""
+    now = int(now or time.time())
+    entries = _load(student_id, now)
+    for title in titles:
+        entries[title_key(title)] = now + ttl()
+    if len(entries) > MAX_TITLES:
+        # Keep the newest
+        entries = dict(sorted(entries.items(), key=lambda item: item[1])[-MAX_TITLES:])
+    cache.set(seen_key(student_id), entries, ttl())
+    return frozenset(entries)
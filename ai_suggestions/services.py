@@ -6,11 +6,19 @@ import random
 from django.core.cache import cache
 from django.conf import settings
 
+from teachers import timetable
+from . import recommender, seen
+
 logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", getattr(settings, "OPENAI_API_KEY", None))
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", getattr(settings, "OPENAI_MODEL", "gpt-3.5-turbo"))
 TTL = int(os.getenv("OPENAI_SUGGESTION_TTL", getattr(settings, "OPENAI_SUGGESTION_TTL", 3600)))
+SUGGESTION_COUNT = 3
+# Suggestion.source of each generator's items; a topped-up list can mix them
+LLM_SOURCE = "openai"
+RANDOM_SOURCE = "random"
+MIXED_SOURCE = "mixed"
 
 # lazy import openai
 openai = None
@@ -47,17 +55,25 @@ RANDOM_TASKS = [
     {"title": "Practice mental math", "time_minutes": 10, "reason": "Quick calculations"}
 ]
 
-def _build_prompt(student):
+
+def _build_prompt(student, candidates=()):
     pref = getattr(student, "preferences", "") or ""
     grade = getattr(student, "grade", "") or ""
     subjects = getattr(student, "subjects", None)
     subj_str = ", ".join([s.name for s in subjects.all()]) if subjects else ""
+    upcoming = timetable.next_session(getattr(student, "group_id", None))
+    next_str = f"Next class: {upcoming['subject']} at {upcoming['time']}. " if upcoming else ""
+    interests = getattr(student, "interests", "") or ""
+    catalogue = "; ".join(c["title"] for c in candidates)
+    catalogue_str = f"Pick from or adapt these tasks: {catalogue}. " if catalogue else ""
     return (
-        f"Student preferences: {pref}. Subjects: {subj_str}. Grade: {grade}. "
+        f"Student preferences: {pref}. Interests: {interests}. Subjects: {subj_str}. Grade: {grade}. {next_str}"
+        f"{catalogue_str}"
         "Suggest 3 short actionable tasks for a free period (5-20 minutes each). "
         "Return a JSON array of objects with 'title', 'time_minutes', and 'reason'. Keep concise."
     )
 
+
 def parse_suggestions_from_text(text):
     if not text:
         return []
@@ -71,52 +87,148 @@ def parse_suggestions_from_text(text):
     lines = [ln.strip("- ") for ln in text.splitlines() if ln.strip()]
     return [{"title": lines[i][:200], "time_minutes": 10, "reason": "parsed fallback"} for i in range(min(len(lines), 3))]
 
-def generate_random_tasks(count=3):
-    """Generate random tasks from the predefined list"""
-    return random.sample(RANDOM_TASKS, min(count, len(RANDOM_TASKS)))
+
+def generate_random_tasks(count=3, exclude=()):
+    """Generate random tasks from the predefined list, skipping titles hashed in ``exclude``"""
+    tasks = [task for task in RANDOM_TASKS if seen.title_key(task["title"]) not in exclude]
+    return [dict(task, source=RANDOM_SOURCE) for task in random.sample(tasks, min(count, len(tasks)))]
+
+
+def item_source(item, default=LLM_SOURCE):
+    """The source a suggestion was tagged with by its generator (LLM lists cached before tagging have none)"""
+    return item.get("source") or default if isinstance(item, dict) else default
+
+
+def list_source(suggestions):
+    """Suggestion.source of a list: its items' source, or MIXED_SOURCE when a top-up combined several"""
+    sources = {item_source(item) for item in suggestions}
+    return sources.pop() if len(sources) == 1 else MIXED_SOURCE
+
+
+def task_source(payload, task_title, default=""):
+    """The source of the item titled ``task_title`` in a shown list; ``default`` (the list's) when untagged"""
+    for item in payload if isinstance(payload, list) else ():
+        if isinstance(item, dict) and item.get("title") == task_title:
+            return item_source(item, default)
+    return default
+
+
+def suggestion_cache_key(student_id):
+    return f"ai_sugg:student:{student_id}"
+
+
+def llm_enabled():
+    """Whether the LLM tailors the local suggestions (needs OPENAI_API_KEY)"""
+    return openai is not None and getattr(settings, "SUGGESTION_LLM_ENRICH", True)
+
 
 def get_suggestions_for_student(student, force_refresh=False):
+    """
+    Free-period suggestions for a student, from the local catalogue engine
+    (recommender.py); cached for TTL seconds.
+    """
     if student is None:
         return []
 
-    cache_key = f"ai_sugg:student:{student.id}"
+    cache_key = suggestion_cache_key(student.id)
+    exclude = seen.get(student.id)
     if not force_refresh:
         cached = cache.get(cache_key)
         if cached:
-            return cached
+            return top_up(student, cached, exclude)
 
-    prompt = _build_prompt(student)
-    text = None
+    suggestions = recommender.recommend(student, k=SUGGESTION_COUNT, exclude=exclude)
+    cache.set(cache_key, suggestions, TTL)
+    return suggestions
 
-    if openai:
-        try:
-            resp = openai.ChatCompletion.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a concise assistant that replies with a JSON array."},
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=300,
-                temperature=0.2,
-            )
-            try:
-                text = resp.choices[0].message["content"]
-            except Exception:
-                text = getattr(resp.choices[0], "text", str(resp))
-        except Exception as e:
-            logger.exception("OpenAI call failed: %s", e)
-            text = None
 
-    if not text:
-        # fallback defaults
-        suggestions = [
-            {"title": "Review last class notes", "time_minutes": 10, "reason": "Fallback"},
-            {"title": "Solve 3 quick practice problems", "time_minutes": 15, "reason": "Fallback"},
-            {"title": "Read a short article", "time_minutes": 15, "reason": "Fallback"},
-        ]
-        cache.set(cache_key, suggestions, TTL)
+def top_up(student, suggestions, exclude=None):
+    """
+    Drop the tasks the student has completed or dismissed since
+    ``suggestions`` was cached, and refill it from the catalogue, instead
+    of regenerating the whole list.
+    """
+    if exclude is None:
+        exclude = seen.get(student.id)
+    kept = [s for s in suggestions if not isinstance(s, dict) or seen.title_key(s.get("title", "")) not in exclude]
+    if len(kept) == len(suggestions):
         return suggestions
+    missing = SUGGESTION_COUNT - len(kept)
+    if missing > 0:
+        shown = {seen.title_key(s["title"]) for s in kept if isinstance(s, dict) and "title" in s}
+        kept += recommender.recommend(student, k=missing, exclude=exclude | shown)
+    cache.set(suggestion_cache_key(student.id), kept, TTL)
+    return kept
 
-    suggestions = parse_suggestions_from_text(text)
-    cache.set(cache_key, suggestions, TTL)
+
+def enrich_suggestions(student):
+    """
+    Ask the LLM to tailor the student's suggestions, given the best
+    catalogue matches, and cache its list in place of the local one.
+    The local list stays when the call or its parsing fails.
+    """
+    if student is None or not llm_enabled():
+        return []
+
+    exclude = seen.get(student.id)
+    candidates = recommender.recommend(student, k=8, exclude=exclude)
+    prompt = _build_prompt(student, candidates)
+    text = None
+    try:
+        resp = openai.ChatCompletion.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a concise assistant that replies with a JSON array."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=300,
+            temperature=0.2,
+        )
+        try:
+            text = resp.choices[0].message["content"]
+        except Exception:
+            text = getattr(resp.choices[0], "text", str(resp))
+    except Exception as e:
+        logger.exception("OpenAI call failed: %s", e)
+
+    suggestions = [dict(s, source=LLM_SOURCE) if isinstance(s, dict) else s for s in parse_suggestions_from_text(text)
+                   if not isinstance(s, dict) or seen.title_key(s.get("title", "")) not in exclude]
+    if suggestions:
+        cache.set(suggestion_cache_key(student.id), suggestions, TTL)
     return suggestions
+
+
+def prewarm_suggestions(within_minutes=15, now=None):
+    """
+    Fill the suggestion cache for students whose group has a free period
+    starting within ``within_minutes`` (or running now), so the dashboard
+    finds suggestions ready instead of generating them on page load.
+    Generation is queued on the ``llm`` task queue. Returns the number of
+    students queued.
+    """
+    from datetime import timedelta
+    from django.db.models import Q
+    from django.utils import timezone
+    from students.models import Student
+    from .tasks import refresh_suggestions
+
+    now = timezone.localtime(now or timezone.now())
+    horizon = now + timedelta(minutes=within_minutes)
+    group_ids = Student.objects.values_list("group_id", flat=True).distinct()
+    due = []
+    for group_id in group_ids:
+        period = timetable.next_free_period(group_id, now, days_ahead=0)
+        if period and period["start"] <= horizon:
+            due.append(group_id)
+    if not due:
+        return 0
+
+    groups = Q(group_id__in=[g for g in due if g is not None])
+    if None in due:
+        groups |= Q(group__isnull=True)
+    warmed = 0
+    for student_id in Student.objects.filter(groups).values_list("id", flat=True):
+        if cache.get(suggestion_cache_key(student_id)) is None:
+            refresh_suggestions.delay(student_id, dedup_key=f"suggest:{student_id}")
+            warmed += 1
+    return warmed
@@ -0,0 +1,28 @@
+import datetime
+
+from core.tasks import task
+from students.models import Student
+from . import analytics
+from .services import enrich_suggestions, get_suggestions_for_student
+
+
+@task(queue='llm', max_attempts=2, retry_delay=30)
+def refresh_suggestions(student_id):
+    """Generate fresh suggestions for a student, tailored by the LLM when enabled, and cache them"""
+    student = Student.objects.select_related('user', 'group').filter(id=student_id).first()
+    if student is not None:
+        get_suggestions_for_student(student, force_refresh=True)
+        enrich_suggestions(student)
+
+
+@task(queue='llm', max_attempts=2, retry_delay=30)
+def enrich_student_suggestions(student_id):
+    """Replace a student's cached local suggestions with the LLM's take on them"""
+    student = Student.objects.select_related('user', 'group').filter(id=student_id).first()
+    enrich_suggestions(student)
+
+
+@task()
+def rollup_task_day(student_id, day):
+    """Recount a student's suggested and completed tasks on a day (YYYY-MM-DD)"""
+    analytics.rollup_day(student_id, datetime.date.fromisoformat(day))
@@ -1,3 +1,373 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.core.cache import cache
+from django.utils import timezone
+
+from admins.models import Degree, Branch, Group, GroupSubjectAssignment
+from students.models import Student
+from teachers.models import Teacher, Subject, Timetable
+from teachers import timetable
+from . import analytics, audit, recommender, seen, services
+from .models import CompletedTask, Suggestion, TaskDay, TaskTemplate
+from .services import prewarm_suggestions, suggestion_cache_key
+
+
+@override_settings(TASKS_EAGER=True)
+class PrewarmSuggestionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        timetable.invalidate()
+        user = User.objects.create(username='teacher')
+        teacher = Teacher.objects.create(user=user, employee_id='T001', department='CS')
+        math = Subject.objects.create(name='Mathematics', code='MATH101', teacher=teacher)
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        self.busy = Group.objects.create(name='G1', branch=branch, degree=degree)
+        self.free = Group.objects.create(name='G2', branch=branch, degree=degree)
+        for slot in ('09:00', '10:00', '11:00'):
+            Timetable.objects.create(group=self.busy, day='Monday', time_slot=slot, subject=math, room_number='A101')
+        Timetable.objects.create(group=self.free, day='Monday', time_slot='14:00', subject=math, room_number='A101')
+        # No timetable: never reported free
+        unscheduled = Group.objects.create(name='G3', branch=branch, degree=degree)
+        Student.objects.create(user=User.objects.create(username='s3'), roll_number='R3', group=unscheduled)
+        self.busy_student = Student.objects.create(user=User.objects.create(username='s1'), roll_number='R1', group=self.busy)
+        self.free_student = Student.objects.create(user=User.objects.create(username='s2'), roll_number='R2', group=self.free)
+
+    def test_only_groups_about_to_be_free_are_warmed(self):
+        """Test suggestions are generated for groups whose free period starts soon"""
+        # 2024-01-01 was a Monday
+        now = timezone.make_aware(datetime(2024, 1, 1, 9, 50))
+        self.assertEqual(prewarm_suggestions(within_minutes=15, now=now), 1)
+        self.assertIsNotNone(cache.get(suggestion_cache_key(self.free_student.id)))
+        self.assertIsNone(cache.get(suggestion_cache_key(self.busy_student.id)))
+        # Already warm students are skipped
+        self.assertEqual(prewarm_suggestions(within_minutes=15, now=now), 0)
+
+
+@override_settings(TASKS_EAGER=True, RATE_LIMITS={'suggestions': {'rate': '4/m', 'burst': 2}})
+class SuggestionRateLimitTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(audit.buffer.drain)
+        user = User.objects.create(username='student')
+        self.student = Student.objects.create(user=user, roll_number='R1')
+        self.client.force_login(user)
+        self.url = reverse('ai_suggestions:free_suggestions')
+
+    def test_force_is_rate_limited(self):
+        """Test ?force=1 no longer bypasses the per-student rate limit"""
+        cache.set(suggestion_cache_key(self.student.id), [{'title': 'Read'}])
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        response = self.client.get(self.url, {'force': '1'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+class SuggestionAuditTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        audit.buffer.drain()
+        self.addCleanup(audit.buffer.drain)
+        user = User.objects.create(username='student')
+        self.student = Student.objects.create(user=user, roll_number='R1')
+        self.client.force_login(user)
+
+    def test_unchanged_lists_are_not_recorded_again(self):
+        """Test refreshing a cached list adds no audit rows, and rows are written in one batch"""
+        cache.set(suggestion_cache_key(self.student.id), [{'title': 'Read'}])
+        url = reverse('ai_suggestions:free_suggestions')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        audit.record(self.student.id, [{'title': 'Revise'}], 'random')
+        self.assertEqual(Suggestion.objects.count(), 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(audit.flush(), 2)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "ai_suggestions_suggestion"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(list(Suggestion.objects.order_by('id').values_list('source', flat=True)),
+                         ['openai', 'random'])
+        self.assertEqual(Suggestion.objects.first().payload_hash, audit.payload_hash([{'title': 'Read'}]))
+
+    @override_settings(SUGGESTION_AUDIT_BATCH=2)
+    def test_full_buffer_is_flushed(self):
+        """Test the buffer is written as soon as it holds a batch"""
+        audit.record(self.student.id, ['a'], 'random')
+        self.assertEqual(Suggestion.objects.count(), 0)
+        audit.record(self.student.id, ['b'], 'random')
+        self.assertEqual(Suggestion.objects.count(), 2)
+        self.assertEqual(len(audit.buffer), 0)
+
+    def test_completing_a_task_links_the_buffered_list(self):
+        """Test a completed task points at the list it was shown in, even if still buffered"""
+        digest = audit.record(self.student.id, [{'title': 'Read'}], 'openai')
+        # A newer list does not take the credit
+        audit.record(self.student.id, [{'title': 'Walk'}], 'random')
+        response = self.client.post(reverse('ai_suggestions:mark_completed'),
+                                    {'task_title': 'Read', 'suggestion_hash': digest},
+                                    content_type='application/json')
+        self.assertTrue(response.json()['success'])
+        task = CompletedTask.objects.get()
+        self.assertEqual((task.suggestion_id.payload, task.source), ([{'title': 'Read'}], 'openai'))
+
+    def test_list_buffered_in_another_process(self):
+        """Test a completion is attributed while its list sits in another process's buffer, and linked later"""
+        shown_at = timezone.now() - timedelta(seconds=30)
+        with mock.patch('django.utils.timezone.now', return_value=shown_at):
+            digest = audit.record(self.student.id, [{'title': 'Read'}], 'catalogue')
+        # The other process's buffer
+        elsewhere = audit.buffer.drain()
+        response = self.client.post(reverse('ai_suggestions:mark_completed'),
+                                    {'task_title': 'Read', 'suggestion_hash': digest},
+                                    content_type='application/json')
+        self.assertTrue(response.json()['success'])
+        task = CompletedTask.objects.get()
+        self.assertEqual((task.suggestion_id, task.source), (None, 'catalogue'))
+
+        audit.buffer.add(*elsewhere)
+        audit.flush()
+        task.refresh_from_db()
+        self.assertEqual(task.suggestion_id.payload, [{'title': 'Read'}])
+        # The row is dated when the list was shown, not when it was written
+        self.assertEqual(task.suggestion_id.created_at, shown_at)
+
+    def test_mixed_lists_credit_each_item_source(self):
+        """Test a topped-up list is recorded as mixed and each task is credited to its own source"""
+        payload = [{'title': 'Read', 'source': 'openai'}, {'title': 'Walk', 'source': 'catalogue'}]
+        cache.set(suggestion_cache_key(self.student.id), payload)
+        digest = self.client.get(reverse('ai_suggestions:free_suggestions')).json()['suggestion_hash']
+        self.client.post(reverse('ai_suggestions:mark_completed'), {'task_title': 'Walk', 'suggestion_hash': digest},
+                         content_type='application/json')
+        self.assertEqual(Suggestion.objects.get().source, 'mixed')
+        self.assertEqual(CompletedTask.objects.get().source, 'catalogue')
+        analytics.rebuild([self.student.id])
+        self.assertEqual(sorted(TaskDay.objects.values_list('source', 'suggested', 'completed')),
+                         [('catalogue', 1, 1), ('openai', 1, 0)])
+
+    def test_lists_carry_their_hash(self):
+        """Test every list returned names its audit hash"""
+        cache.set(suggestion_cache_key(self.student.id), [{'title': 'Read'}])
+        data = self.client.get(reverse('ai_suggestions:free_suggestions')).json()
+        self.assertEqual(data['suggestion_hash'], audit.payload_hash([{'title': 'Read'}]))
+        data = self.client.get(reverse('ai_suggestions:random_suggestions')).json()
+        self.assertEqual(data['suggestion_hash'], audit.payload_hash(data['suggestions']))
+
+    def test_compact_suggestions(self):
+        """Test compaction drops expired and repeated rows but keeps those a completed task uses"""
+        old = timezone.now() - timedelta(days=200)
+        rows = [Suggestion.objects.create(student=self.student, payload=payload) for payload in
+                (['a'], ['a'], ['b'], ['a'], ['old'], ['kept'])]
+        Suggestion.objects.filter(id__in=[rows[4].id, rows[5].id]).update(created_at=old)
+        CompletedTask.objects.create(student=self.student, task_title='t', suggestion_id=rows[5])
+        out = StringIO()
+        call_command('compact_suggestions', '--days', '90', stdout=out)
+        self.assertIn('Deleted 1 row(s) older than 90 days and 1 repeated row(s)', out.getvalue())
+        self.assertEqual(sorted(Suggestion.objects.values_list('id', flat=True)),
+                         [rows[0].id, rows[2].id, rows[3].id, rows[5].id])
+        self.assertFalse(Suggestion.objects.filter(payload_hash='').exists())
+
+
+@override_settings(TASKS_EAGER=True)
+class TaskAnalyticsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        audit.buffer.drain()
+        self.addCleanup(audit.buffer.drain)
+        user = User.objects.create(username='student')
+        self.student = Student.objects.create(user=user, roll_number='R1')
+        self.client.force_login(user)
+        self.today = timezone.localdate()
+
+    def complete(self, days_ago, minutes=10, suggestion=None):
+        task = CompletedTask.objects.create(student=self.student, task_title='t', time_minutes=minutes,
+                                            suggestion_id=suggestion)
+        CompletedTask.objects.filter(id=task.id).update(completed_at=task.completed_at - timedelta(days=days_ago))
+
+    def test_rollups_follow_completions(self):
+        """Test shown lists and completed tasks are counted per day and source as they happen"""
+        digest = audit.record(self.student.id, [{'title': 'Read'}, {'title': 'Walk'}], 'openai')
+        audit.flush()
+        for title in ('Read', 'Walk'):
+            self.client.post(reverse('ai_suggestions:mark_completed'),
+                             {'task_title': title, 'time_minutes': 15, 'suggestion_hash': digest},
+                             content_type='application/json')
+        day = TaskDay.objects.get()
+        self.assertEqual((day.date, day.source, day.suggested, day.completed, day.minutes),
+                         (self.today, 'openai', 2, 2, 30))
+        CompletedTask.objects.first().delete()
+        self.assertEqual(TaskDay.objects.get().completed, 1)
+
+    def test_student_stats(self):
+        """Test weekly minutes, streaks and per-source completion rates"""
+        shown = Suggestion.objects.create(student=self.student, payload=['a', 'b', 'c', 'd'], source='openai')
+        for days_ago in (0, 1, 2, 5, 6, 7, 8):
+            self.complete(days_ago, suggestion=shown if days_ago == 0 else None)
+        CompletedTask.objects.update(source='')
+        call_command('rollup_tasks', stdout=StringIO())
+        self.assertEqual(CompletedTask.objects.filter(source='openai').count(), 1)
+        stats = analytics.student_stats(self.student, weeks=3, today=self.today)
+        self.assertEqual(stats['streak'], {'current': 3, 'longest': 4})
+        self.assertEqual(len(stats['weekly']), 3)
+        self.assertEqual(sum(week['minutes'] for week in stats['weekly']), 70)
+        self.assertEqual(stats['weekly'][-1]['week'], analytics.week_start(self.today).isoformat())
+        self.assertEqual(stats['sources'], [
+            {'source': 'openai', 'suggested': 4, 'completed': 1, 'minutes': 10, 'completion_rate': 25.0},
+            {'source': 'unknown', 'suggested': 0, 'completed': 6, 'minutes': 60, 'completion_rate': None},
+        ])
+
+    def test_endpoints_cost_days_not_tasks(self):
+        """Test the stats endpoint runs the same queries for 1 or 50 tasks, and the source one is staff only"""
+        url = reverse('ai_suggestions:task_stats')
+        self.client.get(url)  # caches the session's role
+        self.complete(0)
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).json()['streak']['current'], 1)
+        for _ in range(49):
+            self.complete(0)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).json()['weekly'][-1]['tasks'], 50)
+        self.assertEqual(len(few), len(many))
+
+        self.assertEqual(self.client.get(reverse('ai_suggestions:source_stats')).status_code, 403)
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        response = self.client.get(reverse('ai_suggestions:source_stats'), {'days': '30'})
+        self.assertEqual(response.json()['sources'][0]['completed'], 50)
+
+
+@override_settings(TASKS_EAGER=True)
+class RecommenderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        audit.buffer.drain()
+        self.addCleanup(audit.buffer.drain)
+        recommender.invalidate()
+        user = User.objects.create(username='teacher')
+        teacher = Teacher.objects.create(user=user, employee_id='T001', department='CS')
+        self.physics = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        self.group = Group.objects.create(name='G1', branch=branch, degree=degree)
+        GroupSubjectAssignment.objects.create(group=self.group, subject=self.physics, teacher=teacher)
+        for title, tags, subject in [
+            ('Write a small function and test it', 'programming, python', None),
+            ('Trace a sorting algorithm by hand', 'programming, algorithms', None),
+            ('Sketch a free-body diagram', 'mechanics, diagrams', self.physics),
+            ('Learn five new English words', 'english, vocabulary', None),
+            ('Balance three chemical equations', 'chemistry', None),
+        ]:
+            TaskTemplate.objects.create(title=title, tags=tags, subject=subject)
+        self.student = Student.objects.create(user=User.objects.create(username='s1'), roll_number='R1',
+                                              group=self.group, interests='Programming, Python')
+
+    def test_matches_interests_and_subjects(self):
+        """Test the catalogue matches are ranked by interests, then group subjects, then filled at random"""
+        suggestions = recommender.recommend(self.student, k=4)
+        self.assertEqual([s['title'] for s in suggestions[:3]], [
+            'Write a small function and test it', 'Trace a sorting algorithm by hand', 'Sketch a free-body diagram'])
+        self.assertEqual(suggestions[0]['reason'], 'For Programming, Python')
+        self.assertEqual(suggestions[2]['reason'], 'For Physics')
+        self.assertEqual({s['source'] for s in suggestions}, {'catalogue'})
+        self.assertEqual(len(recommender.recommend(self.student, k=10)), 5)
+
+    def test_catalogue_changes_rebuild_the_index(self):
+        """Test a new or edited template is picked up without restarting"""
+        index = recommender.get_index()
+        self.assertIs(recommender.get_index(), index)
+        TaskTemplate.objects.create(title='Read about Python generators', tags='python')
+        self.assertIsNot(recommender.get_index(), index)
+        self.assertEqual(len(recommender.get_index()), 6)
+        TaskTemplate.objects.all().delete()
+        # An empty catalogue falls back to the built-in tasks
+        self.assertEqual(len(recommender.get_index()), 20)
+
+    def test_first_load_is_answered_locally(self):
+        """Test the dashboard gets personalised suggestions on the first request, without the LLM"""
+        self.client.force_login(self.student.user)
+        with mock.patch('ai_suggestions.services.openai', None):
+            data = self.client.get(reverse('ai_suggestions:free_suggestions')).json()
+        self.assertNotIn('pending', data)
+        self.assertEqual(data['suggestions'][0]['title'], 'Write a small function and test it')
+        audit.flush()
+        self.assertEqual(Suggestion.objects.get().source, 'catalogue')
+
+    def test_llm_enrichment_replaces_the_cached_list(self):
+        """Test the LLM's tailored list, when enabled, is what the next load returns"""
+        llm = mock.Mock()
+        llm.ChatCompletion.create.return_value.choices = [
+            mock.Mock(message={'content': '[{"title": "Refactor a Python script", "time_minutes": 15}]'})]
+        with mock.patch('ai_suggestions.services.openai', llm):
+            self.assertEqual(services.enrich_suggestions(self.student)[0]['title'], 'Refactor a Python script')
+            prompt = llm.ChatCompletion.create.call_args.kwargs['messages'][1]['content']
+        self.assertIn('Write a small function and test it', prompt)
+        self.assertEqual(cache.get(suggestion_cache_key(self.student.id))[0]['title'], 'Refactor a Python script')
+
+
+@override_settings(TASKS_EAGER=True)
+class SeenTasksTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        audit.buffer.drain()
+        self.addCleanup(audit.buffer.drain)
+        recommender.invalidate()
+        for i in range(6):
+            TaskTemplate.objects.create(title=f'Python task {i}', tags='python')
+        user = User.objects.create(username='student')
+        self.student = Student.objects.create(user=user, roll_number='R1', interests='Python')
+        self.client.force_login(user)
+
+    def titles(self, suggestions):
+        return [s['title'] for s in suggestions]
+
+    def test_completed_task_is_replaced_in_the_cached_list(self):
+        """Test completing a suggestion swaps it for a new one, keeping the rest of the list"""
+        first = self.titles(self.client.get(reverse('ai_suggestions:free_suggestions')).json()['suggestions'])
+        response = self.client.post(reverse('ai_suggestions:mark_completed'), {'task_title': first[0]},
+                                    content_type='application/json').json()
+        after = self.titles(response['suggestions'])
+        self.assertEqual(after[:2], first[1:])
+        self.assertNotIn(first[0], after)
+        self.assertEqual(self.titles(cache.get(suggestion_cache_key(self.student.id))), after)
+        # A full regeneration skips it too
+        refreshed = self.titles(services.get_suggestions_for_student(self.student, force_refresh=True))
+        self.assertNotIn(first[0], refreshed)
+
+    def test_dismiss_and_random_tasks(self):
+        """Test dismissed tasks are hidden, and random tasks skip completed ones"""
+        first = self.titles(self.client.get(reverse('ai_suggestions:free_suggestions')).json()['suggestions'])
+        response = self.client.post(reverse('ai_suggestions:dismiss_suggestion'), {'task_title': first[1]},
+                                    content_type='application/json').json()
+        self.assertNotIn(first[1], self.titles(response['suggestions']))
+        self.assertEqual(len(response['suggestions']), 3)
+        done = [task['title'] for task in services.RANDOM_TASKS[:18]]
+        seen.add(self.student.id, done)
+        random_titles = self.titles(self.client.get(reverse('ai_suggestions:random_suggestions')).json()['suggestions'])
+        self.assertEqual(sorted(random_titles), sorted(task['title'] for task in services.RANDOM_TASKS[18:]))
+
+    def test_exhausted_catalogue(self):
+        """Test a student who has done every task gets empty lists, and nothing is audited"""
+        seen.add(self.student.id, [f'Python task {i}' for i in range(6)] + [t['title'] for t in services.RANDOM_TASKS])
+        response = self.client.get(reverse('ai_suggestions:free_suggestions'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'suggestions': [], 'suggestion_hash': None})
+        response = self.client.get(reverse('ai_suggestions:random_suggestions'))
+        self.assertEqual(response.json(), {'suggestions': [], 'suggestion_hash': None})
+        audit.flush()
+        self.assertFalse(Suggestion.objects.exists())
+
+    def test_seen_set_is_cached_and_expires(self):
+        """Test the seen-set is read from the cache, rebuilt from CompletedTask only when lost, and expires"""
+        CompletedTask.objects.create(student=self.student, task_title='Python task 0')
+        with self.assertNumQueries(1):
+            self.assertIn(seen.title_key('python  TASK 0'), seen.get(self.student.id))
+        with self.assertNumQueries(0):
+            seen.get(self.student.id)
+        later = timezone.now().timestamp() + 8 * 24 * 3600
+        self.assertEqual(seen.get(self.student.id, now=later), frozenset())
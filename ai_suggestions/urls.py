@@ -7,5 +7,8 @@ urlpatterns = [
     path("free-suggestions/", views.free_period_suggestions, name="free_suggestions"),
     path("random-suggestions/", views.generate_random_suggestions, name="random_suggestions"),
     path("mark-completed/", views.mark_task_completed, name="mark_completed"),
+    path("dismiss/", views.dismiss_suggestion, name="dismiss_suggestion"),
     path("completed-tasks/", views.get_completed_tasks, name="completed_tasks"),
+    path("stats/", views.task_stats, name="task_stats"),
+    path("stats/sources/", views.source_stats, name="source_stats"),
 ]
@@ -1,76 +1,102 @@
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.core.cache import cache
+from django.utils import timezone
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+import datetime
 import json
 
-from .services import get_suggestions_for_student, generate_random_tasks
+from asgiref.sync import sync_to_async
+
+from core.ratelimit import rate_limit
+from core.roles import STUDENT, role_required
+from .services import (RANDOM_SOURCE, generate_random_tasks, get_suggestions_for_student, list_source, llm_enabled,
+                       suggestion_cache_key, task_source, top_up)
+from . import analytics, audit, seen
+from .tasks import enrich_student_suggestions
 from .models import Suggestion, CompletedTask
 
 # Create your views here.
 
 @login_required
+@role_required(STUDENT, api=True)
+@rate_limit('suggestions')
 @require_GET
-def free_period_suggestions(request):
+async def free_period_suggestions(request):
     # adapt: student relation on user
-    student = getattr(request.user, "student", None)
-    if student is None:
-        return JsonResponse({"error": "Not a student"}, status=403)
-
-    # rate-limit per user (15s)
-    rl_key = f"ai_rl:{request.user.id}"
-    if not request.GET.get("force") and cache.get(rl_key):
-        return JsonResponse({"error": "Rate limited"}, status=429)
-    cache.set(rl_key, 1, 15)
+    student = request.profile
 
+    # ?force=1 skips the cached list; it is rate limited like any request
     force = request.GET.get("force") == "1"
-    suggestions = get_suggestions_for_student(student, force_refresh=force)
-
-    # store for audit (optional) — don't store raw keys or sensitive info
-    try:
-        suggestion_obj = Suggestion.objects.create(student=student, payload=suggestions, source="openai")
-        # Add suggestion ID to each suggestion for tracking
-        for suggestion in suggestions:
-            suggestion['suggestion_id'] = suggestion_obj.id
-    except Exception:
-        # fail silently for storage errors
-        pass
-
-    return JsonResponse({"suggestions": suggestions})
+    cache_key = suggestion_cache_key(student.id)
+    suggestions = None if force else await cache.aget(cache_key)
+    if suggestions:
+        # Without what was completed or dismissed since, refilled
+        suggestions = await sync_to_async(top_up)(student, suggestions)
+    else:
+        # The local catalogue engine answers in milliseconds, without a
+        # network call; the LLM, when enabled, tailors the list later on
+        # the llm queue (in a worker thread, as it is inline when
+        # TASKS_EAGER is set) and the next load picks that up
+        suggestions = await sync_to_async(get_suggestions_for_student)(student, force_refresh=True)
+        if llm_enabled():
+            await sync_to_async(enrich_student_suggestions.delay, thread_sensitive=False)(
+                student.id, dedup_key=f"suggest:{student.id}")
+
+    # Everything in the catalogue was completed or dismissed lately
+    if not suggestions:
+        return JsonResponse({"suggestions": [], "suggestion_hash": None})
+
+    # store for audit (optional) — don't store raw keys or sensitive info;
+    # buffered, and skipped when the student was shown this list already.
+    # Items carry the source that generated them; a top-up can mix sources
+    digest = await sync_to_async(audit.record)(student.id, suggestions, list_source(suggestions))
+
+    return JsonResponse({"suggestions": suggestions, "suggestion_hash": digest})
 
 
 @login_required
+@role_required(STUDENT, api=True)
 @require_GET
-def generate_random_suggestions(request):
+async def generate_random_suggestions(request):
     """Generate random tasks for the student"""
-    student = getattr(request.user, "student", None)
-    if student is None:
-        return JsonResponse({"error": "Not a student"}, status=403)
+    student = request.profile
 
-    # Generate random tasks
-    random_suggestions = generate_random_tasks(3)
+    # Generate random tasks, none recently completed or dismissed
+    random_suggestions = generate_random_tasks(3, exclude=await sync_to_async(seen.get)(student.id))
     
     # Store the random suggestions
-    try:
-        suggestion_obj = Suggestion.objects.create(student=student, payload=random_suggestions, source="random")
-        for suggestion in random_suggestions:
-            suggestion['suggestion_id'] = suggestion_obj.id
-    except Exception:
-        pass
+    digest = None
+    if random_suggestions:
+        digest = await sync_to_async(audit.record)(student.id, random_suggestions, RANDOM_SOURCE)
 
-    return JsonResponse({"suggestions": random_suggestions})
+    return JsonResponse({"suggestions": random_suggestions, "suggestion_hash": digest})
+
+
+def _forget_task(student, task_title):
+    """
+    Add a task to the student's seen-set. Returns their cached suggestions,
+    topped up, and that list's audit hash, or (None, None).
+    """
+    exclude = seen.add(student.id, [task_title])
+    cached = cache.get(suggestion_cache_key(student.id))
+    if not cached:
+        return None, None
+    suggestions = top_up(student, cached, exclude)
+    if not suggestions:
+        return suggestions, None
+    return suggestions, audit.record(student.id, suggestions, list_source(suggestions))
 
 
 @login_required
+@role_required(STUDENT, api=True)
 @require_POST
 @csrf_exempt
 def mark_task_completed(request):
     """Mark a task as completed and remove it from current suggestions"""
-    student = getattr(request.user, "student", None)
-    if student is None:
-        return JsonResponse({"error": "Not a student"}, status=403)
+    student = request.profile
 
     try:
         data = json.loads(request.body)
@@ -78,25 +104,38 @@ def mark_task_completed(request):
         task_reason = data.get('task_reason', '')
         time_minutes = data.get('time_minutes', 10)
         suggestion_id = data.get('suggestion_id')
+        # Identifies the list the task was shown in (returned with every list)
+        suggestion_hash = data.get('suggestion_hash')
 
         if not task_title:
             return JsonResponse({"error": "Task title is required"}, status=400)
 
-        # Create completed task record
+        # Create completed task record, credited to the source of the task
+        # itself (a topped-up list mixes sources)
         suggestion_obj = None
+        source, payload = "", None
         if suggestion_id:
             try:
-                suggestion_obj = Suggestion.objects.get(id=suggestion_id)
-            except Suggestion.DoesNotExist:
+                suggestion_obj = Suggestion.objects.filter(id=suggestion_id, student=student).first()
+            except ValueError:
                 pass
+            if suggestion_obj:
+                source, payload = suggestion_obj.source, suggestion_obj.payload
+        elif suggestion_hash:
+            # The row may not be written yet; audit.flush links it then
+            suggestion_obj, source, payload = audit.shown(student.id, suggestion_hash)
+        source = task_source(payload, task_title, source)
 
         CompletedTask.objects.create(
             student=student,
             task_title=task_title,
             task_reason=task_reason,
             time_minutes=time_minutes,
-            suggestion_id=suggestion_obj
+            suggestion_id=suggestion_obj,
+            suggestion_hash=suggestion_hash or "",
+            source=source
         )
+        suggestions, digest = _forget_task(student, task_title)
 
         return JsonResponse({
             "success": True,
@@ -104,7 +143,9 @@ def mark_task_completed(request):
             "completed_task": {
                 "title": task_title,
                 "time_minutes": time_minutes
-            }
+            },
+            "suggestions": suggestions,
+            "suggestion_hash": digest,
         })
 
     except json.JSONDecodeError:
@@ -114,23 +155,60 @@ def mark_task_completed(request):
 
 
 @login_required
+@role_required(STUDENT, api=True)
+@require_POST
+def dismiss_suggestion(request):
+    """Hide a suggested task from the student for a while and return the topped-up list"""
+    try:
+        task_title = json.loads(request.body).get("task_title")
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not task_title:
+        return JsonResponse({"error": "Task title is required"}, status=400)
+    suggestions, digest = _forget_task(request.profile, task_title)
+    return JsonResponse({"success": True, "suggestions": suggestions, "suggestion_hash": digest})
+
+
+@login_required
+@role_required(STUDENT, api=True)
 @require_GET
-def get_completed_tasks(request):
+async def get_completed_tasks(request):
     """Get completed tasks for the student"""
-    student = getattr(request.user, "student", None)
-    if student is None:
-        return JsonResponse({"error": "Not a student"}, status=403)
+    student = request.profile
 
-    completed_tasks = CompletedTask.objects.filter(student=student)[:10]  # Last 10 tasks
-    
-    tasks_data = []
-    for task in completed_tasks:
-        tasks_data.append({
+    tasks_data = [
+        {
             'id': task.id,
             'task_title': task.task_title,
             'task_reason': task.task_reason,
             'time_minutes': task.time_minutes,
             'completed_at': task.completed_at.strftime('%Y-%m-%d %H:%M')
-        })
+        }
+        async for task in CompletedTask.objects.filter(student=student)[:10]  # Last 10 tasks
+    ]
 
     return JsonResponse({"completed_tasks": tasks_data})
+
+
+@login_required
+@role_required(STUDENT, api=True)
+@rate_limit('api')
+@require_GET
+async def task_stats(request):
+    """Weekly minutes, streaks and completion rate per suggestion source, from the daily rollups"""
+    weeks = request.GET.get('weeks', '')
+    weeks = min(int(weeks), 52) if weeks.isdigit() and int(weeks) else analytics.DEFAULT_WEEKS
+    return JsonResponse(await sync_to_async(analytics.student_stats)(request.profile, weeks))
+
+
+@login_required
+@rate_limit('api')
+@require_GET
+async def source_stats(request):
+    """Completion rate per suggestion source over all students, for staff (?days=30)"""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'detail': 'Forbidden'}, status=403)
+    days = request.GET.get('days', '')
+    since = timezone.localdate() - datetime.timedelta(days=int(days)) if days.isdigit() else None
+    return JsonResponse({'sources': await sync_to_async(analytics.source_stats)(since)})
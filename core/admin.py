@@ -1,12 +1,15 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from students.admin import StudentAdminForm
 from students.models import Student
 from teachers.models import Teacher
+from .models import AttendanceSummary, Task, Term
 
 
 class StudentInline(admin.StackedInline):
     model = Student
+    form = StudentAdminForm
     can_delete = False
     verbose_name_plural = 'Student Profile'
 
@@ -23,4 +26,23 @@ class CustomUserAdmin(UserAdmin):
 
 # Re-register UserAdmin
 admin.site.unregister(User)
-admin.site.register(User, CustomUserAdmin)
\ No newline at end of file
+admin.site.register(User, CustomUserAdmin)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'queue', 'status', 'attempts', 'run_at', 'finished_at')
+    list_filter = ('queue', 'status')
+    search_fields = ('name', 'dedup_key')
+
+
+@admin.register(Term)
+class TermAdmin(admin.ModelAdmin):
+    list_display = ('name', 'start_date', 'end_date', 'archived_at')
+    readonly_fields = ('archived_at',)
+
+
+@admin.register(AttendanceSummary)
+class AttendanceSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'subject', 'term', 'present', 'total')
+    list_filter = ('term', 'subject')
@@ -0,0 +1,40 @@
+"""
+Helpers for the async views.
+
+Under ASGI (``sih_project.asgi``) these views run on the event loop, so a
+request waiting on the network, a file or a live feed does not hold a
+worker thread. Under WSGI Django runs them in a private loop per request,
+so they keep working there too.
+"""
+import os
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def file_chunks(file, chunk_size=CHUNK_SIZE):
+    """Read an open file chunk by chunk in a worker thread."""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(chunk_size):
+            yield chunk
+    finally:
+        await sync_to_async(file.close, thread_sensitive=False)()
+
+
+def file_download(request, field_file):
+    """Stream a stored file as an attachment without loading it into memory."""
+    filename = os.path.basename(field_file.name)
+    file = field_file.open('rb')
+    if not isinstance(request, ASGIRequest):
+        return FileResponse(file, as_attachment=True, filename=filename)
+    response = StreamingHttpResponse(file_chunks(file), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    try:
+        response['Content-Length'] = field_file.size
+    except (OSError, NotImplementedError):
+        pass
+    return response
@@ -0,0 +1,340 @@
+"""
+Institute-wide attendance analytics.
+
+The live attendance (the current term, once closed terms are archived) is
+read in one query as integer columns, each aggregated by the database into
+one string that NumPy parses, and every aggregate is a vectorized
+group-by over those arrays (``np.unique`` + ``np.bincount``), instead of a
+``calculate_attendance_percentage`` call per student and subject.
+
+The time slot of a row is the timetable period of its class, not the time
+it was written, which for uploaded roll calls is the upload.
+
+Reading a term of attendance out of the database takes seconds, so the
+columns are also kept as a columnar snapshot (``core.snapshot``, in
+``ANALYTICS_SNAPSHOT_DIR``) that a cold build memory-maps instead. Results
+are cached under a version that any attendance write, or a change to
+students or subjects, bumps, and under the timetable version. After a
+write the next request queues a snapshot refresh and, until it has run,
+serves the figures of the previous snapshot with its time as ``as_of``.
+"""
+import datetime
+import time as _time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Func, IntegerField
+from django.db.models.functions import Cast
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.dateparse import parse_datetime
+
+from admins.models import Group
+from students.models import Student
+from teachers import timetable
+from teachers.models import Subject, Teacher, Timetable
+from .models import Attendance
+from .snapshot import EPOCH_ORDINAL, load_snapshot, write_snapshot
+from .tasks import task
+
+VERSION_KEY = 'attendance:version'
+RESULT_KEY = 'analytics:{}'
+RESULT_TTL = 24 * 3600
+# A result computed from an outdated snapshot is only kept until the refresh lands
+STALE_TTL = 60
+AT_RISK_BELOW = 75.0
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+EPOCH = datetime.date(1970, 1, 1)
+
+
+class DateNumber(Func):
+    """A date column as the integer YYYYMMDD (cheaper than date arithmetic in SQLite)."""
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template="CAST(replace(%(expressions)s, '-', '') AS INTEGER)", **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template="CAST(to_char(%(expressions)s, 'YYYYMMDD') AS INTEGER)", **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template="CAST(DATE_FORMAT(%(expressions)s, '%%%%Y%%%%m%%%%d') AS UNSIGNED)", **extra_context)
+
+
+# Aggregates that return a whole column as one comma-separated string
+COLUMN_AGGREGATES = {
+    'sqlite': 'group_concat({})',
+    'postgresql': "string_agg(CAST({} AS TEXT), ',')",
+}
+COLUMNS = ['student_id', 'subject_id', 'ymd', 'present']
+
+
+def _epoch_days(yyyymmdd):
+    """Days since 1970-01-01 of YYYYMMDD integers."""
+    months = (yyyymmdd // 10000 - 1970) * 12 + yyyymmdd // 100 % 100 - 1
+    return months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) + yyyymmdd % 100 - 1
+
+
+def load_columns(using='default'):
+    """Live attendance as integer columns student, subject, day, present."""
+    queryset = Attendance.objects.using(using).annotate(
+        ymd=DateNumber('date'), present=Cast('is_present', IntegerField())
+    ).values_list(*COLUMNS)
+    sql, params = queryset.query.sql_with_params()
+    connection = connections[queryset.db]
+    aggregate = COLUMN_AGGREGATES.get(connection.vendor)
+    with connection.cursor() as cursor:
+        if aggregate:
+            # Each column comes back as one string that NumPy parses in C;
+            # stepping through millions of rows in Python is what costs
+            # seconds. The aggregates of one query see the rows in the same
+            # order, so the columns line up.
+            columns = ', '.join(aggregate.format(connection.ops.quote_name(name)) for name in COLUMNS)
+            cursor.execute(f'SELECT {columns} FROM ({sql}) AS attendance_rows', params)
+            values = cursor.fetchone()
+            if values[0]:
+                data = np.stack([np.fromstring(value, dtype=np.int64, sep=',') for value in values], axis=1)
+            else:
+                data = np.empty((0, len(COLUMNS)), dtype=np.int64)
+        else:
+            cursor.execute(sql, params)
+            data = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, len(COLUMNS))
+    return {
+        'student': data[:, 0],
+        'subject': data[:, 1],
+        'day': _epoch_days(data[:, 2]),
+        'present': data[:, 3],
+    }
+
+
+def _lookup(pairs):
+    """An array mapping id -> value (-1 where unknown), for vectorized joins."""
+    pairs = list(pairs)
+    table = np.full(max((key for key, _ in pairs), default=0) + 1, -1, dtype=np.int64)
+    for key, value in pairs:
+        if value is not None:
+            table[key] = value
+    return table
+
+
+def _join(table, ids):
+    values = np.full(len(ids), -1, dtype=np.int64)
+    known = ids < len(table)
+    values[known] = table[ids[known]]
+    return values
+
+
+def _rates(keys, present, base=0):
+    """
+    (key, classes, present, %) per distinct key, skipping unknown (-1)
+    keys. Keys are small ids, so counting is a bincount indexed by the key
+    (minus ``base``) rather than a sort.
+    """
+    keep = keys >= 0
+    keys = keys[keep] - base
+    total = np.bincount(keys)
+    attended = np.bincount(keys, weights=present[keep], minlength=len(total)).astype(np.int64)
+    values = np.flatnonzero(total)
+    total, attended = total[values], attended[values]
+    percent = np.round(attended / total * 100, 2)
+    return values + base, total, attended, percent
+
+
+def _table(rates, names):
+    return [
+        {'name': names.get(int(key), str(key)), 'classes': int(total), 'present': int(attended),
+         'percentage': float(percent)}
+        for key, total, attended, percent in zip(*rates)
+    ]
+
+
+def _slot_key(group, weekday, subject):
+    return (group * 7 + weekday) * 2 ** 32 + subject
+
+
+def slot_lookup(using='default'):
+    """
+    Sorted (keys, hours) of the timetable: the hour of a group's first
+    session of a subject on a weekday. Shared entries are under group 0.
+    """
+    first = {}
+    for group_id, day, subject_id, time_slot in Timetable.objects.using(using).values_list(
+            'group_id', 'day', 'subject_id', 'time_slot'):
+        key = _slot_key(group_id or 0, WEEKDAYS.index(day), subject_id)
+        first[key] = min(first.get(key, 24), int(time_slot[:2]))
+    keys = sorted(first)
+    return np.array(keys, dtype=np.int64), np.array([first[key] for key in keys], dtype=np.int64)
+
+
+def _slots(lookup, groups, weekday, subject):
+    """
+    The timetable hour each attendance row belongs to (-1 when the class is
+    not on the timetable): the group's own entry, else a shared one. The
+    time the row was written says nothing for uploaded roll calls.
+    """
+    keys, hours = lookup
+    slots = np.full(len(subject), -1, dtype=np.int64)
+    if not len(keys):
+        return slots
+    for group in (np.maximum(groups, 0), np.zeros_like(groups)):
+        wanted = _slot_key(group, weekday, subject)
+        position = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = (keys[position] == wanted) & (slots < 0)
+        slots[found] = hours[position[found]]
+    return slots
+
+
+def compute(columns, student_groups, subject_teachers, group_names, teacher_names, slot_lookup=None):
+    """All aggregates for ``columns`` (see load_columns) as plain, cacheable data."""
+    present = columns['present']
+
+    # Students below the threshold, overall and per group
+    student_ids, _, _, student_percent = _rates(columns['student'], present)
+    at_risk = student_percent < AT_RISK_BELOW
+    risk_groups = _join(student_groups, student_ids)
+    risk_values, risk_counts = np.unique(risk_groups[at_risk & (risk_groups >= 0)], return_counts=True)
+    at_risk_by_group = dict(zip(risk_values.tolist(), risk_counts.tolist()))
+
+    row_groups = _join(student_groups, columns['student'])
+    group_rates = _rates(row_groups, present)
+    groups = _table(group_rates, group_names)
+    for row, key in zip(groups, group_rates[0]):
+        row['at_risk'] = at_risk_by_group.get(int(key), 0)
+
+    day = columns['day']
+    weekday = (day + 3) % 7  # 1970-01-01 was a Thursday
+    week_start = day - weekday
+    slots = _slots(slot_lookup or (np.empty(0, dtype=np.int64),) * 2, row_groups, weekday, columns['subject'])
+    return {
+        'rows': int(len(present)),
+        'students': int(len(student_ids)),
+        'overall': round(float(present.mean()) * 100, 2) if len(present) else 0.0,
+        'at_risk': int(at_risk.sum()),
+        'at_risk_below': AT_RISK_BELOW,
+        'groups': groups,
+        'teachers': _table(_rates(_join(subject_teachers, columns['subject']), present), teacher_names),
+        'weekdays': _table(_rates(weekday, present), dict(enumerate(WEEKDAYS))),
+        'slots': _table(_rates(slots, present), {h: f'{h:02d}:00' for h in range(24)}),
+        'trend': [
+            {'week': (EPOCH + datetime.timedelta(days=int(start))).isoformat(), 'percentage': float(percent)}
+            for start, _, _, percent in zip(*_rates(week_start, present, base=week_start.min() if len(day) else 0))
+        ],
+    }
+
+
+def build(using='default', columns=None):
+    group_names = {g.id: str(g) for g in Group.objects.using(using).select_related('branch', 'degree')}
+    teacher_names = {
+        t.id: t.user.get_full_name() or t.user.username
+        for t in Teacher.objects.using(using).select_related('user')
+    }
+    return compute(
+        load_columns(using) if columns is None else columns,
+        _lookup(Student.objects.using(using).values_list('id', 'group_id')),
+        _lookup(Subject.objects.using(using).values_list('id', 'teacher_id')),
+        group_names,
+        teacher_names,
+        slot_lookup(using),
+    )
+
+
+def save_snapshot(directory, columns, version):
+    """Write ``columns`` (see load_columns) as the snapshot of attendance ``version``."""
+    return write_snapshot(directory, {
+        'student_id': columns['student'],
+        'subject_id': columns['subject'],
+        'date': columns['day'] + EPOCH_ORDINAL,
+        'present': columns['present'],
+    }, include_archive=False, analytics_version=version)
+
+
+def read_snapshot(directory):
+    """(columns, metadata) of the snapshot in ``directory``, or None when there is none."""
+    try:
+        snapshot = load_snapshot(directory)
+    except (OSError, ValueError):
+        return None
+    columns = {
+        'student': snapshot.student_id.astype(np.int64),
+        'subject': snapshot.subject_id.astype(np.int64),
+        'day': snapshot.date.astype(np.int64) - EPOCH_ORDINAL,
+        'present': snapshot.present.astype(np.int64),
+    }
+    return columns, snapshot.meta
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _result_key(version):
+    return RESULT_KEY.format(f'{version}:{cache.get(timetable.VERSION_KEY)}')
+
+
+def refresh(using='default'):
+    """Read the attendance from the database, write the snapshot and cache the aggregates."""
+    # Read the version first: a write during the read leaves the snapshot outdated
+    version = _current_version()
+    started = _time.perf_counter()
+    columns = load_columns(using)
+    if settings.ANALYTICS_SNAPSHOT_DIR:
+        save_snapshot(settings.ANALYTICS_SNAPSHOT_DIR, columns, version)
+    result = build(using, columns)
+    result['seconds'] = round(_time.perf_counter() - started, 3)
+    cache.set(_result_key(version), result, RESULT_TTL)
+    return result
+
+
+@task(queue='analytics', max_attempts=1)
+def refresh_snapshot():
+    """Bring the analytics snapshot and cached aggregates up to date with the attendance"""
+    refresh()
+
+
+def get_analytics():
+    """The cached aggregates, recomputed after any attendance or timetable write."""
+    version = _current_version()
+    key = _result_key(version)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    snapshot = read_snapshot(settings.ANALYTICS_SNAPSHOT_DIR) if settings.ANALYTICS_SNAPSHOT_DIR else None
+    if snapshot is None:
+        return refresh()
+    columns, meta = snapshot
+    stale = meta.get('analytics_version') != version
+    if stale:
+        refresh_snapshot.delay(dedup_key='analytics:snapshot')
+        # Eager tasks have refreshed it already
+        result = cache.get(key)
+        if result is not None:
+            return result
+    started = _time.perf_counter()
+    result = build(columns=columns)
+    result['seconds'] = round(_time.perf_counter() - started, 3)
+    if stale:
+        result['as_of'] = parse_datetime(meta['created_at'])
+    cache.set(key, result, STALE_TTL if stale else RESULT_TTL)
+    return result
+
+
+def invalidate():
+    cache.set(VERSION_KEY, _time.time_ns(), None)
+
+
+# Attendance deletes are not hooked: a post_delete receiver would make the
+# bulk deletes of archive_attendance fetch every row, so it invalidates itself.
+@receiver(post_save, sender=Attendance)
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Subject)
+def _attendance_changed(sender, **kwargs):
+    invalidate()
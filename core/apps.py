@@ -5,3 +5,9 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
 
+    def ready(self):
+        # Register the @task functions of every app
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
+        # Connect the signals that invalidate the cached analytics and roles
+        from . import analytics, roles  # noqa: F401
@@ -0,0 +1,6 @@
+def role(request):
+    """``role`` and ``profile`` as resolved by core.roles.RoleMiddleware"""
+    return {
+        'role': getattr(request, 'role', None),
+        'profile': getattr(request, 'profile', None),
+    }
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with the iteration count taken from
+    ``PASSWORD_PBKDF2_ITERATIONS`` (Django's default when unset).
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes still
+    verify, and a password stored with a different count is re-hashed to
+    the configured one at the user's next login.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', None) or super().iterations
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core import analytics
+from core.models import Attendance, ArchivedAttendance, AttendanceSummary, Term
+
+
+class Command(BaseCommand):
+    help = ('Move the attendance of closed terms out of the live Attendance table into ArchivedAttendance, '
+            'with per-student, per-subject AttendanceSummary rows for reports and percentages')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', help='Name of the term to archive (default: every closed, unarchived term)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        terms = Term.objects.filter(archived_at__isnull=True, end_date__lt=timezone.localdate())
+        if options['term']:
+            term = Term.objects.filter(name=options['term']).first()
+            if term is None:
+                raise CommandError(f"No term named '{options['term']}'.")
+            if term.archived_at:
+                raise CommandError(f'{term.name} was archived on {term.archived_at:%Y-%m-%d}.')
+            if not term.is_closed:
+                raise CommandError(f'{term.name} has not ended yet.')
+            terms = [term]
+        if not terms:
+            self.stdout.write('No closed terms to archive.')
+            return
+
+        for term in terms:
+            rows = Attendance.objects.filter(date__range=(term.start_date, term.end_date))
+            if options['dry_run']:
+                self.stdout.write(f'{term.name}: would archive {rows.count()} attendance row(s)')
+                continue
+            with transaction.atomic():
+                archived, summaries = self.archive(term, rows, options['batch_size'])
+            analytics.invalidate()
+            self.stdout.write(self.style.SUCCESS(
+                f'{term.name}: archived {archived} attendance row(s) into {summaries} summary row(s)'))
+
+    def archive(self, term, rows, batch_size):
+        # Replace the running summaries kept while the term was live
+        AttendanceSummary.objects.filter(term=term).delete()
+        summaries = AttendanceSummary.objects.bulk_create([
+            AttendanceSummary(term=term, student_id=row['student_id'], subject_id=row['subject_id'],
+                              total=row['total'], present=row['present'])
+            for row in rows.values('student_id', 'subject_id').annotate(
+                total=Count('id'), present=Count('id', filter=Q(is_present=True))).order_by()
+        ], batch_size=batch_size)
+
+        archived = 0
+        batch = []
+        fields = ('student_id', 'subject_id', 'date', 'is_present', 'marked_at')
+        for row in rows.values(*fields).iterator(chunk_size=batch_size):
+            batch.append(ArchivedAttendance(term=term, **row))
+            if len(batch) >= batch_size:
+                ArchivedAttendance.objects.bulk_create(batch)
+                archived += len(batch)
+                batch = []
+        ArchivedAttendance.objects.bulk_create(batch)
+        archived += len(batch)
+
+        rows.delete()
+        term.archived_at = timezone.now()
+        term.save(update_fields=['archived_at'])
+        return archived, len(summaries)
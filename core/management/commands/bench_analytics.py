@@ -0,0 +1,115 @@
+import os
+import random
+import tempfile
+import time as _time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from admins.models import Branch, Degree, Group
+from core import analytics
+from core.models import Attendance
+from sih_project.database import database_config
+from students.models import Student
+from teachers.models import Teacher, Subject, Timetable
+
+
+class Command(BaseCommand):
+    help = ('Time the institute-wide attendance analytics cold, on a throwaway SQLite database seeded '
+            'with a term of synthetic attendance')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000)
+        parser.add_argument('--subjects', type=int, default=6, help='Classes per student per day')
+        parser.add_argument('--days', type=int, default=60, help='Teaching days in the term')
+        parser.add_argument('--group-size', type=int, default=60)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            alias = 'bench_analytics'
+            configured = connections.configure_settings({
+                'default': settings.DATABASES['default'],
+                alias: database_config('sqlite', settings.BASE_DIR, name=os.path.join(tmp, 'bench.sqlite3')),
+            })
+            connections.settings[alias] = configured[alias]
+            try:
+                call_command('migrate', database=alias, verbosity=0)
+                started = _time.perf_counter()
+                rows = self.seed(alias, options)
+                self.stdout.write(f'Seeded {rows} attendance rows in {_time.perf_counter() - started:.1f} s')
+                self.run(alias, os.path.join(tmp, 'snapshot'))
+            finally:
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+
+    def seed(self, alias, options):
+        degree = Degree.objects.using(alias).create(name='Bench')
+        branch = Branch.objects.using(alias).create(name='Bench', degree=degree)
+        groups = Group.objects.using(alias).bulk_create([
+            Group(name=f'G{i}', branch=branch, degree=degree)
+            for i in range(-(-options['students'] // options['group_size']))
+        ])
+        users = User.objects.db_manager(alias).bulk_create(
+            [User(username=f'bench-{i}') for i in range(options['students'] + options['subjects'])])
+        teachers = Teacher.objects.using(alias).bulk_create([
+            Teacher(user=user, employee_id=f'BENCH{i}', department='Bench')
+            for i, user in enumerate(users[options['students']:])
+        ])
+        subjects = Subject.objects.using(alias).bulk_create([
+            Subject(name=f'Subject {i}', code=f'BENCH{i}', teacher=teacher) for i, teacher in enumerate(teachers)
+        ])
+        students = Student.objects.using(alias).bulk_create([
+            Student(user=user, roll_number=f'B{i}', group=groups[i // options['group_size']])
+            for i, user in enumerate(users[:options['students']])
+        ])
+
+        rng = random.Random(0)
+        rows = 0
+        day = date.today() - timedelta(days=options['days'] * 7 // 5)
+        for _ in range(options['days']):
+            while day.weekday() >= 5:
+                day += timedelta(days=1)
+            batch = []
+            for subject in subjects:
+                batch.extend(
+                    Attendance(student=student, subject=subject, date=day, is_present=rng.random() < 0.8)
+                    for student in students
+                )
+            Attendance.objects.using(alias).bulk_create(batch, batch_size=5000)
+            rows += len(batch)
+            day += timedelta(days=1)
+        # Each subject in its own slot, every weekday
+        Timetable.objects.using(alias).bulk_create([
+            Timetable(group=group, day=weekday, time_slot=f'{hour:02d}:00', subject=subject, room_number='R1')
+            for group in groups
+            for weekday in ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday')
+            for hour, subject in enumerate(subjects, start=9)
+        ])
+        return rows
+
+    def run(self, alias, directory):
+        started = _time.perf_counter()
+        columns = analytics.load_columns(alias)
+        loaded = _time.perf_counter()
+        analytics.save_snapshot(directory, columns, version=0)
+        saved = _time.perf_counter()
+        stats = analytics.build(alias)
+        built = _time.perf_counter()
+        stats = analytics.build(alias, analytics.read_snapshot(directory)[0])
+        snapshot_built = _time.perf_counter()
+        analytics.compute(columns, analytics._lookup(Student.objects.using(alias).values_list('id', 'group_id')),
+                          analytics._lookup(Subject.objects.using(alias).values_list('id', 'teacher_id')), {}, {},
+                          analytics.slot_lookup(alias))
+        computed = _time.perf_counter()
+        self.stdout.write(f"{'read (1 query)':>26} {loaded - started:>7.2f} s")
+        self.stdout.write(f"{'write snapshot':>26} {saved - loaded:>7.2f} s")
+        self.stdout.write(f"{'vectorized aggregates':>26} {computed - snapshot_built:>7.2f} s")
+        self.stdout.write(f"{'total, cold from database':>26} {built - saved:>7.2f} s")
+        self.stdout.write(f"{'total, cold from snapshot':>26} {snapshot_built - built:>7.2f} s")
+        self.stdout.write(f"{stats['students']} students, {stats['rows']} rows, {stats['overall']}% overall, "
+                          f"{stats['at_risk']} at risk, {len(stats['groups'])} groups")
@@ -0,0 +1,83 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from teachers import live, views as teacher_views
+from teachers.models import Teacher, Subject, QRCode
+
+
+class Command(BaseCommand):
+    help = ('Compare how many concurrent waiting connections the app holds under WSGI (thread per request) '
+            'and ASGI (event loop), using the live attendance long-poll in-process')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, nargs='+', default=[50, 200, 500])
+        parser.add_argument('--wsgi-threads', type=int, default=16,
+                            help='Threads of the simulated WSGI server (e.g. gunicorn workers x threads)')
+        parser.add_argument('--wait', type=float, default=1.0, help='Seconds each long-poll waits')
+
+    def handle(self, *args, **options):
+        username = f'bench-{uuid.uuid4().hex[:8]}'
+        user = User.objects.create(username=username)
+        teacher = Teacher.objects.create(user=user, employee_id=username, department='Benchmark')
+        subject = Subject.objects.create(name='Benchmark', code=username, teacher=teacher)
+        qr_code = QRCode.objects.create(subject=subject, teacher=teacher, qr_data='{}',
+                                        expires_at=timezone.now() + timedelta(minutes=30))
+        timeout = teacher_views.LIVE_POLL_TIMEOUT
+        teacher_views.LIVE_POLL_TIMEOUT = options['wait']
+        # The in-process clients talk to the app as 'testserver'
+        hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+        hosts.enable()
+        try:
+            login = Client()
+            login.force_login(user)
+            url = reverse('teachers:qr_live_status', args=[qr_code.id])
+            since = login.get(url, {'since': -1}).json()['version']
+            self.stdout.write(f"{'clients':>8} {'server':>6} {'seconds':>8} {'req/s':>8} {'held at once':>13}")
+            for clients in options['clients']:
+                for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                    started = time.perf_counter()
+                    run(login.cookies, url, since, clients, options)
+                    elapsed = time.perf_counter() - started
+                    held = min(clients, round(clients * options['wait'] / elapsed))
+                    self.stdout.write(f'{clients:>8} {name:>6} {elapsed:>8.2f} {clients / elapsed:>8.1f} {held:>13}')
+        finally:
+            hosts.disable()
+            teacher_views.LIVE_POLL_TIMEOUT = timeout
+            live._sessions.pop(qr_code.id, None)
+            user.delete()
+
+    def run_wsgi(self, cookies, url, since, clients, options):
+        def request(_):
+            client = Client()
+            client.cookies = cookies
+            return client.get(url, {'since': since}).status_code
+
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as pool:
+            statuses = list(pool.map(request, range(clients)))
+        self.report_failures(statuses)
+
+    def run_asgi(self, cookies, url, since, clients, options):
+        async def main():
+            async def request():
+                client = AsyncClient()
+                client.cookies = cookies
+                return (await client.get(url, {'since': since})).status_code
+
+            return await asyncio.gather(*(request() for _ in range(clients)))
+
+        self.report_failures(asyncio.run(main()))
+
+    def report_failures(self, statuses):
+        failed = len([status for status in statuses if status != 200])
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} request(s) failed'))
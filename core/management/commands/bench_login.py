@@ -0,0 +1,95 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import metrics
+from students.models import Student
+
+ENGINES = ['db', 'cached_db', 'cache', 'signed_cookies']
+# The morning rush to survive: this many logins within this many seconds
+TARGET_LOGINS = 3000
+TARGET_SECONDS = 600
+
+
+class Command(BaseCommand):
+    help = ('Replay a login storm (log in, then open the dashboard) for each session engine and PBKDF2 '
+            'iteration count, and report throughput against 3,000 logins in ten minutes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent browsers')
+        parser.add_argument('--sessions', nargs='+', default=['db', 'cached_db', 'signed_cookies'], choices=ENGINES)
+        parser.add_argument('--iterations', type=int, nargs='+',
+                            default=[settings.PASSWORD_PBKDF2_ITERATIONS or 0],
+                            help='PBKDF2 iteration counts to compare (0 = Django default)')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:6]
+        prefix = f'bench-login-{tag}-'
+        password = 'bench-password'
+        users = User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(options['students'])])
+        Student.objects.bulk_create([Student(user=u, roll_number=f'BL-{tag}-{i}') for i, u in enumerate(users)])
+        session_keys = []
+        target = TARGET_LOGINS / TARGET_SECONDS
+        self.stdout.write(f"{'sessions':>14} {'iterations':>10} {'logins/s':>9} {'p50 ms':>7} {'p95 ms':>7} "
+                          f"{'auth ms':>8} {'auth q':>7} {'3000 in':>8}")
+        try:
+            for iterations in options['iterations']:
+                with override_settings(PASSWORD_PBKDF2_ITERATIONS=iterations or None):
+                    # Stored at the count under test, so logins do not re-hash
+                    User.objects.filter(username__startswith=prefix).update(password=make_password(password))
+                    for engine in options['sessions']:
+                        with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{engine}',
+                                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                            rate, p50, p95, failed, keys = self.storm(users, password, options['threads'])
+                        session_keys += keys
+                        auth = metrics.auth_overhead.summary() or {'p50_ms': 0, 'queries': 0}
+                        minutes = TARGET_LOGINS / rate / 60 if rate else float('inf')
+                        verdict = self.style.SUCCESS if rate >= target else self.style.ERROR
+                        label = iterations or 'default'
+                        self.stdout.write(
+                            f'{engine:>14} {label:>10} {rate:>9.1f} {p50:>7.0f} {p95:>7.0f} '
+                            f"{auth['p50_ms']:>8.2f} {auth['queries']:>7.1f} " + verdict(f'{minutes:>6.1f}m'))
+                        if failed:
+                            self.stdout.write(self.style.WARNING(f'{failed} login(s) failed'))
+        finally:
+            Session.objects.filter(session_key__in=session_keys).delete()
+            User.objects.filter(username__startswith=prefix).delete()
+        self.stdout.write(f'Target: {TARGET_LOGINS} logins in {TARGET_SECONDS // 60} minutes = {target:.1f}/s '
+                          f'(auth = session, user and role loading per request, median)')
+
+    def storm(self, users, password, threads):
+        login_url = reverse('core:login')
+        dashboard_url = reverse('core:dashboard')
+
+        def login(user):
+            client = Client()
+            started = time.perf_counter()
+            try:
+                response = client.post(login_url, {'username': user.username, 'password': password})
+                ok = response.status_code == 302 and client.get(dashboard_url, follow=True).status_code == 200
+            finally:
+                connections.close_all()
+            return time.perf_counter() - started, ok, client.cookies.get(settings.SESSION_COOKIE_NAME)
+
+        metrics.auth_overhead.clear()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(login, users))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(seconds * 1000 for seconds, ok, _ in results if ok)
+        failed = len(results) - len(latencies)
+        p50 = statistics.median(latencies) if latencies else 0
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        keys = [cookie.value for _, _, cookie in results if cookie is not None]
+        return len(latencies) / elapsed, p50, p95, failed, keys
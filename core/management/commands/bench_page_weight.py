@@ -0,0 +1,103 @@
+import gzip
+import os
+import re
+from html.parser import HTMLParser
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.staticfiles import brotli
+from students.models import Student
+from teachers.models import Teacher
+
+
+class AssetParser(HTMLParser):
+    """Stylesheets and scripts a page loads before it can render"""
+
+    def __init__(self):
+        super().__init__()
+        self.assets = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and attrs.get('rel') == 'stylesheet' and attrs.get('href'):
+            self.assets.append(attrs['href'])
+        elif tag == 'script' and attrs.get('src'):
+            self.assets.append(attrs['src'])
+
+
+class Command(BaseCommand):
+    help = ('Report the weight of the main pages: HTML plus the CSS/JS they load, raw and as served '
+            'pre-compressed (gzip/brotli), and how many requests leave for third-party hosts')
+
+    PAGES = [
+        ('login', 'core:login', None),
+        ('student dashboard', 'students:dashboard', 'student'),
+        ('scan QR', 'students:scan_qr', 'student'),
+        ('teacher dashboard', 'teachers:dashboard', 'teacher'),
+        ('admin dashboard', 'admins:dashboard', 'admin'),
+    ]
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'page':>18} {'assets':>6} {'external':>8} {'raw KB':>8} {'gzip KB':>8} {'br KB':>8}")
+        # Throwaway users, rolled back at the end
+        with transaction.atomic(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            clients = self.clients()
+            for label, url_name, role in self.PAGES:
+                response = clients[role].get(reverse(url_name))
+                self.report(label, response.content)
+            transaction.set_rollback(True)
+
+    def clients(self):
+        student = User.objects.create(username='bench-weight-student')
+        Student.objects.create(user=student, roll_number='BENCH-WEIGHT')
+        teacher = User.objects.create(username='bench-weight-teacher')
+        Teacher.objects.create(user=teacher, employee_id='BENCH-WEIGHT', department='Bench')
+        admin = User.objects.create(username='bench-weight-admin', is_staff=True)
+        clients = {None: Client()}
+        for role, user in (('student', student), ('teacher', teacher), ('admin', admin)):
+            clients[role] = Client()
+            clients[role].force_login(user)
+        return clients
+
+    def report(self, label, html):
+        parser = AssetParser()
+        parser.feed(html.decode())
+        sizes = [self.sizes(html)]
+        external = 0
+        for url in parser.assets:
+            if re.match(r'^(https?:)?//', url):
+                external += 1
+                continue
+            path = self.find(url)
+            if path:
+                with open(path, 'rb') as f:
+                    sizes.append(self.sizes(f.read(), path))
+        raw, gz, br = (sum(column) / 1024 for column in zip(*sizes))
+        br = f'{br:>8.1f}' if brotli else f"{'-':>8}"
+        self.stdout.write(f'{label:>18} {len(parser.assets):>6} {external:>8} {raw:>8.1f} {gz:>8.1f} {br}')
+
+    def find(self, url):
+        if not url.startswith(settings.STATIC_URL):
+            return None
+        name = url[len(settings.STATIC_URL):].split('?')[0]
+        collected = os.path.join(str(settings.STATIC_ROOT), name)
+        if os.path.exists(collected):
+            return collected
+        return finders.find(name)
+
+    def sizes(self, data, path=None):
+        """Raw, gzip and brotli bytes, using the collectstatic copies when present"""
+        def variant(suffix, compress):
+            if path and os.path.exists(path + suffix):
+                return os.path.getsize(path + suffix)
+            return len(compress(data))
+
+        gz = variant('.gz', lambda d: gzip.compress(d, 9))
+        br = variant('.br', brotli.compress) if brotli else 0
+        return len(data), min(gz, len(data)), min(br, len(data))
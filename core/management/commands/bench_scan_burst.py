@@ -0,0 +1,130 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connections, transaction
+from django.utils import timezone
+
+from core.models import Attendance, Task
+from sih_project.database import PROFILES, database_config
+from students.models import Student
+from teachers.models import Teacher, Subject, QRCode
+
+
+class Command(BaseCommand):
+    help = ('Replay a QR scan burst (many students marking attendance at once, with dashboards reading) '
+            'against each database profile and report throughput and lock errors')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=['sqlite-basic', 'sqlite'], choices=PROFILES)
+        parser.add_argument('--students', type=int, default=400)
+        parser.add_argument('--threads', type=int, default=32, help='Concurrent scanning clients')
+        parser.add_argument('--readers', type=int, default=4, help='Threads reading attendance meanwhile')
+        parser.add_argument('--postgres-db', default=os.environ.get('DB_BENCH_NAME'),
+                            help='Existing, disposable Postgres database to run the postgres profile in')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'profile':>13} {'scans':>6} {'locked':>7} {'seconds':>8} {'scans/s':>8} "
+                          f"{'p50 ms':>7} {'p95 ms':>7}")
+        for profile in options['profiles']:
+            with tempfile.TemporaryDirectory() as tmp:
+                if profile == 'postgres':
+                    if not options['postgres_db']:
+                        raise CommandError('The postgres profile needs --postgres-db (or DB_BENCH_NAME).')
+                    name = options['postgres_db']
+                else:
+                    name = os.path.join(tmp, 'bench.sqlite3')
+                alias = f'bench_{profile}'
+                configured = connections.configure_settings({
+                    'default': settings.DATABASES['default'],
+                    alias: database_config(profile, settings.BASE_DIR, name=name),
+                })
+                connections.settings[alias] = configured[alias]
+                try:
+                    call_command('migrate', database=alias, verbosity=0)
+                    self.run_profile(profile, alias, options)
+                finally:
+                    connections[alias].close()
+                    del connections[alias]
+                    del connections.settings[alias]
+
+    def run_profile(self, profile, alias, options):
+        db = Student.objects.db_manager(alias)
+        teacher = Teacher.objects.using(alias).create(
+            user=User.objects.db_manager(alias).create(username='bench-teacher'), employee_id='BENCH', department='Bench')
+        subject = Subject.objects.using(alias).create(name='Bench', code='BENCH', teacher=teacher)
+        QRCode.objects.using(alias).create(subject=subject, teacher=teacher, qr_data='{}',
+                                           expires_at=timezone.now() + timedelta(minutes=15))
+        users = User.objects.db_manager(alias).bulk_create(
+            [User(username=f'bench-{i}') for i in range(options['students'])])
+        students = db.bulk_create([Student(user=u, roll_number=f'B{i}') for i, u in enumerate(users)])
+        # Tidy up the previous run's rows if the postgres database is reused
+        Attendance.objects.using(alias).filter(subject__code='BENCH').delete()
+
+        latencies = []
+        locked = 0
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def scan(student):
+            # The writes of students.views.scan_qr
+            nonlocal locked
+            started = time.perf_counter()
+            try:
+                QRCode.objects.using(alias).filter(
+                    subject=subject, teacher=teacher, is_active=True, expires_at__gt=timezone.now()
+                ).order_by('-created_at').first()
+                Attendance.objects.using(alias).get_or_create(
+                    student=student, subject=subject, date=timezone.now().date(), defaults={'is_present': True})
+                try:
+                    with transaction.atomic(using=alias):
+                        Task.objects.using(alias).create(
+                            name='students.tasks.recount_attendance', args=[student.id],
+                            dedup_key=f'recount:{student.id}')
+                except IntegrityError:
+                    pass
+            except OperationalError:
+                with lock:
+                    locked += 1
+                return
+            finally:
+                connections[alias].close()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        def read():
+            # Teacher live counts and student dashboards during the burst
+            while not done.is_set():
+                try:
+                    Attendance.objects.using(alias).filter(subject=subject, is_present=True).count()
+                    list(Student.objects.using(alias).order_by('-attendance_percentage')[:50])
+                except OperationalError:
+                    pass
+            connections[alias].close()
+
+        readers = [threading.Thread(target=read) for _ in range(options['readers'])]
+        for reader in readers:
+            reader.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(scan, students))
+        elapsed = time.perf_counter() - started
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        ok = len(latencies)
+        p50 = statistics.median(latencies) * 1000 if latencies else 0
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else p50
+        self.stdout.write(f'{profile:>13} {ok:>6} {locked:>7} {elapsed:>8.2f} {ok / elapsed:>8.1f} '
+                          f'{p50:>7.1f} {p95:>7.1f}')
+        if profile == 'postgres':
+            User.objects.using(alias).filter(username__startswith='bench-').delete()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from teachers.scheduler import synthetic_solver
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the timetable solver on synthetic institutions (no database needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, nargs='+', default=[50, 100, 200, 400])
+        parser.add_argument('--subjects', type=int, default=6, help='Subjects per group')
+        parser.add_argument('--hours', type=int, default=4, help='Weekly hours per subject')
+        parser.add_argument('--room-utilisation', type=float, default=0.75)
+        parser.add_argument('--unavailable', type=float, default=0.1,
+                            help='Share of slots each teacher is unavailable')
+        parser.add_argument('--time-limit', type=float, default=30.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'groups':>7} {'lessons':>8} {'rooms':>6} {'placed':>8} {'iters':>8} {'seconds':>8}  valid")
+        for groups in options['groups']:
+            solver = synthetic_solver(
+                groups,
+                subjects_per_group=options['subjects'],
+                hours=options['hours'],
+                room_utilisation=options['room_utilisation'],
+                unavailable_ratio=options['unavailable'],
+                seed=options['seed'],
+            )
+            result = solver.solve(time_limit=options['time_limit'])
+            summary = result.summary()
+            valid = 'yes' if not result.violations() else 'NO'
+            self.stdout.write(
+                f"{groups:>7} {summary['lessons']:>8} {len(solver.rooms):>6} {summary['placed']:>8} "
+                f"{summary['iterations']:>8} {summary['seconds']:>8}  {valid}"
+            )
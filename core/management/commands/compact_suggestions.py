@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ai_suggestions.audit import payload_hash
+from ai_suggestions.models import Suggestion
+
+
+class Command(BaseCommand):
+    help = ('Compact the suggestion audit log: delete rows older than the retention period and rows that repeat '
+            "the student's previous list. Rows a completed task points to are kept")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SUGGESTION_RETENTION_DAYS,
+                            help='Keep this many days of suggestions')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        # Rows are deleted only if no CompletedTask refers to them
+        removable = Suggestion.objects.filter(completedtask__isnull=True)
+
+        hashed = self.backfill_hashes(batch_size, dry_run)
+        repeats = self.repeated_ids(batch_size)
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = removable.filter(created_at__lt=cutoff)
+        if dry_run:
+            repeats = sum(removable.filter(id__in=repeats[i:i + batch_size], created_at__gte=cutoff).count()
+                          for i in range(0, len(repeats), batch_size))
+            self.stdout.write(f'Would hash {hashed} row(s), delete {expired.count()} row(s) older than '
+                              f"{options['days']} days and {repeats} repeated row(s) among those already hashed")
+            return
+
+        expired_count, _ = expired.delete()
+        repeated_count = 0
+        for i in range(0, len(repeats), batch_size):
+            count, _ = removable.filter(id__in=repeats[i:i + batch_size]).delete()
+            repeated_count += count
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {expired_count} row(s) older than {options["days"]} days and {repeated_count} repeated '
+            f'row(s); {Suggestion.objects.count()} left'))
+
+    def backfill_hashes(self, batch_size, dry_run):
+        """Hash the payloads of rows recorded before payload_hash existed"""
+        rows = Suggestion.objects.filter(payload_hash='')
+        if dry_run:
+            return rows.count()
+        count = 0
+        batch = []
+        for row in rows.values('id', 'payload').iterator(chunk_size=batch_size):
+            batch.append(Suggestion(id=row['id'], payload_hash=payload_hash(row['payload'])))
+            if len(batch) >= batch_size:
+                count += Suggestion.objects.bulk_update(batch, ['payload_hash'])
+                batch = []
+        count += Suggestion.objects.bulk_update(batch, ['payload_hash'])
+        return count
+
+    def repeated_ids(self, batch_size):
+        """Rows whose payload equals the one recorded just before them for the same student"""
+        repeats = []
+        previous = (None, None)
+        rows = Suggestion.objects.exclude(payload_hash='').order_by('student_id', 'created_at', 'id')
+        for row in rows.values('id', 'student_id', 'payload_hash').iterator(chunk_size=batch_size):
+            if previous == (row['student_id'], row['payload_hash']):
+                repeats.append(row['id'])
+            previous = (row['student_id'], row['payload_hash'])
+        return repeats
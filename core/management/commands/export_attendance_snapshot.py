@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Export attendance as a columnar NumPy snapshot (one memory-mappable .npy file per column) '
+            'for offline analysis; load it with core.snapshot.load_snapshot')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--live-only', action='store_true', help='Leave out archived terms')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        meta = export_snapshot(options['directory'], include_archive=not options['live_only'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {meta['rows']} attendance row(s) to {options['directory']} "
+            f'in {time.perf_counter() - started:.2f} s'))
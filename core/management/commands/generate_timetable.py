@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from teachers.scheduler import build_solver, generate_timetable
+
+
+class Command(BaseCommand):
+    help = 'Generate a conflict-free weekly timetable from the group-subject assignments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='groups',
+                            help='Only regenerate this group (repeatable); other groups stay fixed')
+        parser.add_argument('--time-limit', type=float, default=10.0, help='Solver time budget in seconds')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--dry-run', action='store_true', help='Solve but do not save')
+        parser.add_argument('--allow-partial', action='store_true',
+                            help='Save the best schedule found even if some hours could not be placed')
+
+    def handle(self, *args, **options):
+        solver, scope = build_solver(options['groups'], seed=options['seed'])
+        if not solver.lessons:
+            raise CommandError('No group-subject assignments with weekly hours to schedule.')
+        if not solver.rooms:
+            raise CommandError('No rooms defined. Add rooms before generating a timetable.')
+        for problem in solver.diagnose():
+            self.stdout.write(self.style.WARNING(problem))
+
+        result = generate_timetable(
+            options['groups'],
+            seed=options['seed'],
+            time_limit=options['time_limit'],
+            commit=not options['dry_run'],
+            allow_partial=options['allow_partial'],
+        )
+        summary = result.summary()
+        self.stdout.write(
+            f"Placed {summary['placed']}/{summary['lessons']} hours for {len(scope)} groups "
+            f"in {summary['seconds']}s ({summary['iterations']} iterations)"
+        )
+        if not result.complete:
+            self.stdout.write(self.style.ERROR(f"{summary['unplaced']} hours could not be placed"))
+            if not options['allow_partial']:
+                self.stdout.write('Nothing was saved; rerun with a larger --time-limit or --allow-partial.')
+            return
+        if options['dry_run']:
+            self.stdout.write('Dry run: nothing was saved.')
+        else:
+            self.stdout.write(self.style.SUCCESS('Timetable saved.'))
@@ -0,0 +1,119 @@
+import csv
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from admins.hierarchy import get_hierarchy
+from students.models import Student
+
+
+class Command(BaseCommand):
+    help = ('Import students from a CSV with columns username, email, first_name, last_name, password, '
+            'roll_number, interests, degree, branch, group (degree/branch/group by id or name)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Import the valid rows even if some rows are invalid')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                rows = list(csv.DictReader(f))
+        except OSError as e:
+            raise CommandError(f'Cannot read {options["csv_file"]}: {e}')
+        if not rows:
+            raise CommandError('The CSV file has no rows.')
+
+        hierarchy = get_hierarchy()
+        validator = hierarchy.validator
+        errors = {}
+        valid = []
+        for line, row in enumerate(rows, start=2):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            if not row.get('username') or not row.get('roll_number'):
+                errors[line] = 'username and roll_number are required.'
+                continue
+            try:
+                ids = self.resolve(hierarchy, row)
+                row['branch_id'], row['degree_id'], row['group_id'] = validator.validate(*ids)
+            except ValidationError as e:
+                errors[line] = e.messages[0]
+                continue
+            valid.append((line, row))
+
+        self.check_duplicates(valid, errors)
+        valid = [(line, row) for line, row in valid if line not in errors]
+
+        for line, message in sorted(errors.items()):
+            self.stdout.write(self.style.ERROR(f'Line {line}: {message}'))
+        if errors and not options['skip_invalid']:
+            raise CommandError(f'{len(errors)} invalid row(s); nothing was imported (use --skip-invalid to import the rest).')
+        if options['dry_run']:
+            self.stdout.write(f'Dry run: {len(valid)} row(s) would be imported.')
+            return
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=row['username'],
+                    email=row.get('email', ''),
+                    first_name=row.get('first_name', ''),
+                    last_name=row.get('last_name', ''),
+                    password=make_password(row.get('password') or None),
+                )
+                for _, row in valid
+            ])
+            Student.objects.bulk_create([
+                Student(
+                    user=user,
+                    roll_number=row['roll_number'],
+                    interests=row.get('interests', ''),
+                    branch_id=row['branch_id'],
+                    degree_id=row['degree_id'],
+                    group_id=row['group_id'],
+                )
+                for user, (_, row) in zip(users, valid)
+            ])
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(valid)} student(s).'))
+
+    def resolve(self, hierarchy, row):
+        """(branch, degree, group) ids from ids or names; missing parents are taken from the group."""
+        degree = self.lookup(row.get('degree'), hierarchy.document['degrees'], 'Degree')
+        branch = self.lookup(row.get('branch'), hierarchy.branches_for(degree), 'Branch')
+        group = self.lookup(row.get('group'), hierarchy.groups_for(degree, branch), 'Group')
+        if group is not None and group in hierarchy.groups:
+            branch = branch or hierarchy.groups[group]['branch_id']
+            degree = degree or hierarchy.groups[group]['degree_id']
+        return branch, degree, group
+
+    def lookup(self, value, candidates, label):
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        matches = [item['id'] for item in candidates if item['name'].lower() == value.lower()]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise ValidationError(f'{label} "{value}" is ambiguous; use its id.')
+        raise ValidationError(f'{label} "{value}" does not exist.')
+
+    def check_duplicates(self, valid, errors):
+        seen = {'username': {}, 'roll_number': {}}
+        for line, row in valid:
+            for field, lines in seen.items():
+                if row[field] in lines:
+                    errors[line] = f'Duplicate {field} "{row[field]}" (also on line {lines[row[field]]}).'
+                lines.setdefault(row[field], line)
+        taken_usernames = set(User.objects.filter(username__in=seen['username']).values_list('username', flat=True))
+        taken_rolls = set(Student.objects.filter(roll_number__in=seen['roll_number']).values_list('roll_number', flat=True))
+        for line, row in valid:
+            if row['username'] in taken_usernames:
+                errors.setdefault(line, f'Username "{row["username"]}" already exists.')
+            elif row['roll_number'] in taken_rolls:
+                errors.setdefault(line, f'Roll number "{row["roll_number"]}" already exists.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from ai_suggestions.services import prewarm_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Generate suggestions ahead of time for students whose free period is about to start'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--within', type=int, default=15,
+                            help='Warm groups whose free period starts within this many minutes')
+
+    def handle(self, *args, **options):
+        warmed = prewarm_suggestions(within_minutes=options['within'])
+        self.stdout.write(self.style.SUCCESS(f'Queued suggestions for {warmed} students'))
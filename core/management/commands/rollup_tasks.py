@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from ai_suggestions import analytics
+from ai_suggestions.models import CompletedTask, Suggestion
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the daily completed-task rollups behind the task analytics API from the CompletedTask and '
+            'Suggestion rows. They are kept current as tasks are completed; run this once for existing data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only rebuild the last N days (default: all)')
+
+    def handle(self, *args, **options):
+        # Completed before CompletedTask.source existed
+        sourced = CompletedTask.objects.filter(source='', suggestion_id__isnull=False).update(
+            source=Subquery(Suggestion.objects.filter(id=OuterRef('suggestion_id_id')).values('source')[:1]))
+        start = timezone.localdate() - timedelta(days=options['days']) if options['days'] else None
+        written = analytics.rebuild(start=start)
+        self.stdout.write(self.style.SUCCESS(
+            f'Set the source of {sourced} completed task(s); wrote {written} daily rollup row(s)'))
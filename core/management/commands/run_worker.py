@@ -0,0 +1,68 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database queue (see core/tasks.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues',
+                            help='Queue to work on (repeatable); defaults to every queue in TASK_QUEUES')
+        parser.add_argument('--threads', type=int, default=1, help='Worker threads in this process')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when the queues are empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due')
+        parser.add_argument('--keep-hours', type=float, default=24.0,
+                            help='Delete finished tasks older than this many hours')
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(getattr(settings, 'TASK_QUEUES', {})) or ['default']
+        self.stop = threading.Event()
+        self.total = 0
+        self.lock = threading.Lock()
+        tasks.recover_stale(queues)
+        tasks.purge(timedelta(hours=options['keep_hours']))
+        self.stdout.write(f"Worker {tasks.worker_name()} on queues {', '.join(queues)} "
+                          f"with {options['threads']} thread(s)")
+
+        threads = [
+            threading.Thread(target=self.work, args=(queues, f'{tasks.worker_name()}:{i}', options), daemon=True)
+            for i in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f'Ran {self.total} task(s)'))
+
+    def work(self, queues, worker, options):
+        last_sweep = time.monotonic()
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                ran = tasks.run_pending(queues, worker)
+                with self.lock:
+                    self.total += ran
+                if ran:
+                    continue
+                if options['burst']:
+                    return
+                if time.monotonic() - last_sweep > 600:
+                    tasks.recover_stale(queues)
+                    tasks.purge(timedelta(hours=options['keep_hours']))
+                    last_sweep = time.monotonic()
+                self.stop.wait(options['poll'])
+        finally:
+            connection.close()
@@ -3,6 +3,7 @@ from django.contrib.auth.models import User
 from students.models import Student
 from teachers.models import Teacher, Subject, Timetable
 from admins.models import Degree, Branch, Group, GroupSubjectAssignment
+from ai_suggestions.models import TaskTemplate
 from core.models import Announcement
 
 
@@ -19,6 +20,7 @@ class Command(BaseCommand):
         self.create_demo_assignments()
         self.create_demo_timetable()
         self.create_demo_announcements()
+        self.create_demo_task_catalogue()
 
         self.stdout.write(
             self.style.SUCCESS('Demo data setup completed successfully!')
@@ -130,7 +132,8 @@ class Command(BaseCommand):
 
     def create_demo_timetable(self):
         subjects = Subject.objects.all()
-        if subjects.exists():
+        group = Group.objects.first()
+        if subjects.exists() and group:
             timetable_data = [
                 ('Monday', '09:00', subjects[0], 'A101'),
                 ('Monday', '10:00', subjects[1], 'B201'),
@@ -142,8 +145,9 @@ class Command(BaseCommand):
             ]
 
             for day, time_slot, subject, room in timetable_data:
-                if not Timetable.objects.filter(day=day, time_slot=time_slot).exists():
+                if not Timetable.objects.filter(group=group, day=day, time_slot=time_slot).exists():
                     Timetable.objects.create(
+                        group=group,
                         day=day,
                         time_slot=time_slot,
                         subject=subject,
@@ -168,4 +172,31 @@ class Command(BaseCommand):
                     )
                     self.stdout.write(f'Created announcement: {title}')
 
+    def create_demo_task_catalogue(self):
+        subjects = {subject.name: subject for subject in Subject.objects.all()}
+        catalogue_data = [
+            ('Solve 5 quick algebra problems', 'mathematics, algebra, practice', 'Mathematics', 15),
+            ('Derive one formula from today\'s lecture', 'mathematics, calculus, revision', 'Mathematics', 12),
+            ('Practice mental math drills', 'mathematics, arithmetic, speed', None, 10),
+            ('Sketch a free-body diagram for a known problem', 'physics, mechanics, diagrams', 'Physics', 12),
+            ('Summarise Newton\'s laws in your own words', 'physics, science, revision', 'Physics', 10),
+            ('Write a small function and test it', 'programming, coding, python, computer science', 'Computer Science', 20),
+            ('Trace a sorting algorithm by hand', 'programming, algorithms, computer science', 'Computer Science', 15),
+            ('Read the docs of a library you use', 'programming, technology, reading', None, 15),
+            ('Balance three chemical equations', 'chemistry, science, practice', 'Chemistry', 12),
+            ('Make flashcards of the periodic table groups', 'chemistry, memory, flashcards', 'Chemistry', 15),
+            ('Learn five new English words', 'english, vocabulary, language', 'English', 10),
+            ('Write a one-paragraph summary of an article', 'english, writing, reading', 'English', 15),
+            ('Watch a short science explainer video', 'science, technology, video', None, 10),
+            ('Read about a recent engineering breakthrough', 'engineering, technology, reading', None, 12),
+            ('Draw a mind map of this week\'s topics', 'revision, visual, planning', None, 12),
+            ('Plan your study schedule for the week', 'planning, time management', None, 8),
+            ('Review your notes from the last class', 'revision, notes', None, 10),
+            ('Do a 5-minute stretch and breathing break', 'health, wellbeing, break', None, 5),
+        ]
 
+        for title, tags, subject, minutes in catalogue_data:
+            if not TaskTemplate.objects.filter(title=title).exists():
+                TaskTemplate.objects.create(title=title, tags=tags, subject=subjects.get(subject),
+                                            time_minutes=minutes)
+        self.stdout.write('Created the free-period task catalogue')
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Copy the SQLite primary database into the replica (DB_REPLICA_NAME) with the SQLite backup API, '
+            'to try replica routing locally')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every N seconds, like a replica lagging by up to N seconds')
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections.settings:
+            raise CommandError('No replica database configured; set DB_REPLICA_NAME.')
+        primary = connections.settings['default']
+        replica = connections.settings[REPLICA_ALIAS]
+        if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError('sync_replica only copies SQLite databases; use your database\'s replication.')
+        if str(primary['NAME']) == str(replica['NAME']):
+            raise CommandError('The replica and the primary are the same file.')
+        while True:
+            started = time.perf_counter()
+            self.copy(primary['NAME'], replica['NAME'])
+            self.stdout.write(f"Copied {primary['NAME']} to {replica['NAME']} "
+                              f'in {(time.perf_counter() - started) * 1000:.0f} ms')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source, target):
+        # The backup API takes a consistent snapshot while the app keeps writing
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
@@ -0,0 +1,92 @@
+"""
+Per-request auth overhead, for the admin dashboard.
+
+``RoleMiddleware`` times the part of each request that loads the session,
+the user and their role, and counts the queries it ran. The last
+``WINDOW`` samples are kept in memory per process (like the live-counter
+pub/sub), which is enough to see what a session engine or a cache change
+does to every request.
+
+The rate limiter (core/ratelimit.py) counts allowed and limited requests
+per policy here too, since the process started.
+"""
+import statistics
+import threading
+from collections import Counter, deque
+
+from django.conf import settings
+
+WINDOW = 2000
+
+
+class Timings:
+    def __init__(self, window=WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, ms, queries):
+        with self._lock:
+            self._samples.append((ms, queries))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return None
+        times = sorted(ms for ms, _ in samples)
+        return {
+            'requests': len(samples),
+            'p50_ms': round(statistics.median(times), 2),
+            'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))], 2),
+            'queries': round(sum(queries for _, queries in samples) / len(samples), 2),
+        }
+
+
+auth_overhead = Timings()
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` that counts the queries it sees."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def auth_summary():
+    summary = auth_overhead.summary()
+    if summary is not None:
+        summary['session_engine'] = settings.SESSION_ENGINE.rsplit('.', 1)[-1]
+    return summary
+
+
+class RateLimitCounts:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, policy, allowed):
+        with self._lock:
+            self._counts[policy, allowed] += 1
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+    def summary(self):
+        """[{'policy', 'allowed', 'limited'}] for the policies that saw requests"""
+        with self._lock:
+            counts = dict(self._counts)
+        policies = sorted({policy for policy, _ in counts})
+        return [{'policy': policy, 'allowed': counts.get((policy, True), 0),
+                 'limited': counts.get((policy, False), 0)} for policy in policies]
+
+
+rate_limits = RateLimitCounts()
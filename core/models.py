@@ -18,6 +18,65 @@ class Attendance(models.Model):
         return f"{self.student.user.get_full_name()} - {self.subject.name} - {self.date} ({status})"
 
 
+class Term(models.Model):
+    """An academic term; attendance of closed terms is moved out by `archive_attendance`"""
+    name = models.CharField(max_length=100, unique=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+    archived_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-start_date']
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date} - {self.end_date})"
+
+    @property
+    def is_closed(self):
+        return self.end_date < timezone.localdate()
+
+    @classmethod
+    def current(cls, date=None):
+        date = date or timezone.localdate()
+        return cls.objects.filter(start_date__lte=date, end_date__gte=date).first()
+
+
+class ArchivedAttendance(models.Model):
+    """Attendance of an archived term, kept for audits but out of live queries"""
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='archived_attendance')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
+    subject = models.ForeignKey('teachers.Subject', on_delete=models.CASCADE)
+    date = models.DateField()
+    is_present = models.BooleanField(default=False)
+    marked_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['term', 'student'])]
+
+    def __str__(self):
+        status = "Present" if self.is_present else "Absent"
+        return f"{self.student} - {self.subject.name} - {self.date} ({status})"
+
+
+class AttendanceSummary(models.Model):
+    """Per-term class counts of a student in a subject, precomputed at archival"""
+    term = models.ForeignKey(Term, on_delete=models.CASCADE, related_name='attendance_summaries')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
+    subject = models.ForeignKey('teachers.Subject', on_delete=models.CASCADE)
+    total = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['term', 'student', 'subject']
+
+    def __str__(self):
+        return f"{self.student} - {self.subject.name} - {self.term.name}: {self.present}/{self.total}"
+
+    @property
+    def percentage(self):
+        return round(self.present / self.total * 100, 2) if self.total else 0.0
+
+
 class Material(models.Model):
     title = models.CharField(max_length=200)
     file = models.FileField(upload_to='materials/')
@@ -48,4 +107,48 @@ class Announcement(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.title} ({self.get_target_audience_display()})"
\ No newline at end of file
+        return f"{self.title} ({self.get_target_audience_display()})"
+
+
+class Task(models.Model):
+    """A unit of deferred work, queued by core.tasks and run by `run_worker`"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=200)
+    queue = models.CharField(max_length=50, default='default')
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [models.Index(fields=['queue', 'status', 'run_at'])]
+        constraints = [
+            # At most one waiting copy of a deduplicated task
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status='queued'),
+                name='unique_queued_task',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} [{self.queue}] ({self.status})"
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from collections import deque
+
+
+def _release(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Broker:
+    """
+    Minimal in-process publish/subscribe hub.
+
+    Every topic keeps a monotonically increasing version and a short backlog of
+    recent events. Subscribers block on the topic until the version moves past
+    the one they last saw, so connected clients never have to poll the database.
+    Async views use ``wait_async``, which parks a future on the event loop
+    instead of a thread.
+    """
+
+    def __init__(self, backlog=200):
+        self._lock = threading.Lock()
+        self._conditions = {}
+        self._versions = {}
+        self._events = {}
+        self._async_waiters = {}
+        self._backlog = backlog
+
+    def _condition(self, topic):
+        with self._lock:
+            cond = self._conditions.get(topic)
+            if cond is None:
+                cond = threading.Condition()
+                self._conditions[topic] = cond
+                self._versions[topic] = 0
+                self._events[topic] = deque(maxlen=self._backlog)
+            return cond
+
+    def version(self, topic):
+        return self._versions.get(topic, 0)
+
+    def publish(self, topic, event):
+        cond = self._condition(topic)
+        with cond:
+            version = self._versions.get(topic, 0) + 1
+            self._versions[topic] = version
+            self._events.setdefault(topic, deque(maxlen=self._backlog)).append((version, event))
+            cond.notify_all()
+            self._wake_async(topic)
+            return version
+
+    def _wake_async(self, topic):
+        for loop, future in self._async_waiters.pop(topic, ()):
+            try:
+                loop.call_soon_threadsafe(_release, future)
+            except RuntimeError:
+                # The waiter's loop has already closed
+                pass
+
+    def wait(self, topic, since, timeout=None):
+        """Block until ``topic`` moves past ``since`` (or timeout); return (version, events)."""
+        cond = self._condition(topic)
+        with cond:
+            # A discarded topic releases its waiters with no events.
+            cond.wait_for(lambda: self._versions.get(topic, since + 1) > since, timeout=timeout)
+            events = self._events.get(topic, ())
+            return self._versions.get(topic, since), [e for v, e in events if v > since]
+
+    async def wait_async(self, topic, since, timeout=None):
+        """``wait`` for coroutines: suspends without holding a thread."""
+        cond = self._condition(topic)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+        with cond:
+            if self._versions.get(topic, since + 1) > since:
+                future.set_result(None)
+            else:
+                self._async_waiters.setdefault(topic, set()).add(waiter)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with cond:
+                self._async_waiters.get(topic, set()).discard(waiter)
+        with cond:
+            events = self._events.get(topic, ())
+            return self._versions.get(topic, since), [e for v, e in events if v > since]
+
+    def discard(self, topic):
+        with self._lock:
+            cond = self._conditions.pop(topic, None)
+            self._versions.pop(topic, None)
+            self._events.pop(topic, None)
+        if cond is not None:
+            with cond:
+                cond.notify_all()
+                self._wake_async(topic)
+
+
+broker = Broker()
@@ -0,0 +1,151 @@
+"""
+Per-client rate limits for the expensive endpoints.
+
+Each policy in ``settings.RATE_LIMITS`` is a sustained ``rate``
+(``'4/m'``) plus a ``burst`` a client may spend at once. ``rate_limit``
+applies one to a view, per user (per IP for anonymous requests), and
+answers 429 with ``Retry-After`` once the client has used it up.
+
+Counters live in the shared cache, so every process and worker enforces
+the same budget. Django's cache API offers atomic ``add``/``incr`` but no
+compare-and-set, so the bucket is kept as two fixed windows of
+``burst / rate`` seconds: the current window's count plus the previous
+one's, weighted by how much of it still overlaps. That allows ``burst``
+requests at once and ``rate`` sustained, like a token bucket. A request
+increments the count first and decides on the value it got back, so of
+two requests racing for the last token only one gets it; a refused
+request decrements again.
+
+Allowed and limited requests are counted per policy for the admin
+dashboard (core/metrics.py).
+"""
+import functools
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from core import metrics
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600}
+
+
+class Policy:
+    def __init__(self, name, rate, burst):
+        count, _, unit = rate.partition('/')
+        if unit not in UNITS or not count.isdigit() or int(count) <= 0:
+            raise ValueError(f"Rate limit '{name}': rate must look like '4/m', got {rate!r}.")
+        if int(burst) <= 0:
+            raise ValueError(f"Rate limit '{name}': burst must be positive, got {burst!r}.")
+        self.name = name
+        self.burst = int(burst)
+        self.rate = int(count) / UNITS[unit]
+        # Time to refill a full burst; also the counting window
+        self.window = self.burst / self.rate
+
+    @classmethod
+    def named(cls, name):
+        config = settings.RATE_LIMITS[name]
+        return cls(name, config['rate'], config.get('burst', 1))
+
+    def keys(self, ident, now):
+        index = int(now // self.window)
+        return (f'rl:{self.name}:{ident}:{index}', f'rl:{self.name}:{ident}:{index - 1}',
+                now - index * self.window)
+
+    def retry_after(self, current, previous, elapsed):
+        """Seconds until the client may send the next request."""
+        free = self.burst - 1
+        if current > free:
+            # Wait for the next window, then for this one's weight to drain
+            wait = self.window - elapsed + self.window * (1 - free / current)
+        else:
+            wait = self.window * (1 - (free - current) / previous) - elapsed
+        return max(1, math.ceil(wait))
+
+    def check(self, current, previous, elapsed):
+        """None when a request is allowed, else its Retry-After."""
+        weight = (self.window - elapsed) / self.window
+        if previous * weight + current + 1 > self.burst:
+            return self.retry_after(current, previous, elapsed)
+        return None
+
+
+def client_ident(user, request):
+    if user.is_authenticated:
+        return f'u{user.id}'
+    return f"ip{request.META.get('REMOTE_ADDR', '')}"
+
+
+def hit(policy, ident, now=None):
+    """Take a token: None when allowed, else the Retry-After in seconds."""
+    key, previous_key, elapsed = policy.keys(ident, time.time() if now is None else now)
+    cache.add(key, 0, math.ceil(2 * policy.window) + 1)
+    current = cache.incr(key)
+    retry = policy.check(current - 1, cache.get(previous_key, 0), elapsed)
+    if retry is not None:
+        cache.decr(key)
+    return retry
+
+
+async def ahit(policy, ident, now=None):
+    key, previous_key, elapsed = policy.keys(ident, time.time() if now is None else now)
+    await cache.aadd(key, 0, math.ceil(2 * policy.window) + 1)
+    current = await cache.aincr(key)
+    retry = policy.check(current - 1, await cache.aget(previous_key, 0), elapsed)
+    if retry is not None:
+        await cache.adecr(key)
+    return retry
+
+
+def _limited(retry_after):
+    response = JsonResponse({
+        'error': 'Rate limited',
+        'message': f'Too many requests. Try again in {retry_after} s.',
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _record(policy, retry):
+    allowed = retry is None
+    metrics.rate_limits.record(policy.name, allowed)
+    return allowed
+
+
+def rate_limit(name, methods=None):
+    """
+    Apply the ``RATE_LIMITS[name]`` policy to a view (sync or async).
+
+    Only requests with one of ``methods`` count, when given. Use below
+    ``login_required``, so clients are told apart by user.
+    """
+    def decorator(view):
+        def applies(request):
+            return getattr(settings, 'RATE_LIMIT_ENABLED', True) and (
+                methods is None or request.method in methods)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if applies(request):
+                    policy = Policy.named(name)
+                    retry = await ahit(policy, client_ident(await request.auser(), request))
+                    if not _record(policy, retry):
+                        return _limited(retry)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if applies(request):
+                    policy = Policy.named(name)
+                    retry = hit(policy, client_ident(request.user, request))
+                    if not _record(policy, retry):
+                        return _limited(retry)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,131 @@
+"""
+Role and profile of the requesting user, resolved once.
+
+``RoleMiddleware`` sets ``request.role`` (``'student'``, ``'teacher'``,
+``'admin'`` or None) and ``request.profile`` (the Student, with its group,
+branch and degree, or the Teacher) for every authenticated request. Views
+check access with ``role_required`` instead of probing
+``hasattr(request.user, 'student')`` and then ``'teacher'``, each of which
+is a query when the profile is missing.
+
+The pair is cached per user (``role:<user id>:<hierarchy version>``), so
+a request usually resolves it without touching the database. Saving or
+deleting the user or their Student/Teacher drops the entry, and renaming
+a group/branch/degree bumps the hierarchy version. The reverse one-to-one
+caches on ``request.user`` are primed too, so ``user.student`` in
+templates and older code costs nothing either. The middleware also times
+this work (core/metrics.py).
+"""
+import functools
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.deprecation import MiddlewareMixin
+
+from admins.hierarchy import get_hierarchy
+from core import metrics
+from students.models import Student
+from teachers.models import Teacher
+
+STUDENT = 'student'
+TEACHER = 'teacher'
+ADMIN = 'admin'
+TTL = 3600
+
+
+def role_cache_key(user_id):
+    return f'role:{user_id}:{get_hierarchy().version}'
+
+
+def resolve(user):
+    """(role, profile) from the database; a student profile wins over a teacher one, as on login."""
+    student = Student.objects.select_related('group', 'branch', 'degree').filter(user_id=user.id).first()
+    if student is not None:
+        return STUDENT, student
+    teacher = Teacher.objects.filter(user_id=user.id).first()
+    if teacher is not None:
+        return TEACHER, teacher
+    return (ADMIN if user.is_staff else None), None
+
+
+def get_role(user):
+    """The user's (role, profile), from the cache when possible."""
+    key = role_cache_key(user.id)
+    cached = cache.get(key)
+    if cached is None:
+        cached = resolve(user)
+        cache.set(key, cached, TTL)
+    role, profile = cached
+    # Known answers for user.student / user.teacher, including "none"
+    User.student.related.set_cached_value(user, profile if role == STUDENT else None)
+    User.teacher.related.set_cached_value(user, profile if role == TEACHER else None)
+    if profile is not None:
+        type(profile).user.field.set_cached_value(profile, user)
+    return role, profile
+
+
+def invalidate(user_id):
+    cache.delete(role_cache_key(user_id))
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Teacher)
+def _profile_changed(sender, instance, **kwargs):
+    invalidate(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def _user_changed(sender, instance, **kwargs):
+    invalidate(instance.id)
+
+
+class RoleMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request.role, request.profile = None, None
+        # Session and user are loaded lazily, on the first look at request.user
+        counter = metrics.QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            if request.user.is_authenticated:
+                request.role, request.profile = get_role(request.user)
+        metrics.auth_overhead.record((time.perf_counter() - started) * 1000, counter.count)
+
+
+def _denied(request, roles, api):
+    if api:
+        error = f'Not a {roles[0]}' if len(roles) == 1 else 'Access denied.'
+        return JsonResponse({'error': error}, status=403)
+    messages.error(request, 'Access denied.')
+    return redirect('core:dashboard')
+
+
+def role_required(*roles, api=False):
+    """
+    Only let users with one of ``roles`` through (sync and async views).
+
+    Others get the usual "Access denied." redirect to their dashboard, or
+    a 403 JSON error with ``api=True``. Use below ``login_required``.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                if request.role not in roles:
+                    return _denied(request, roles, api)
+                return await view(request, *args, **kwargs)
+        else:
+            @functools.wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.role not in roles:
+                    return _denied(request, roles, api)
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
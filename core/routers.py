@@ -0,0 +1,92 @@
+"""
+Read-replica routing for dashboards and reports.
+
+Views decorated with ``replica_reads`` send their reads to the ``replica``
+database alias when one is configured (DB_REPLICA_NAME); everything else,
+and every write, uses ``default``.
+
+Replicas lag, so reads stay on the primary:
+- for the rest of a request once it has written anything, and
+- for REPLICA_STICKY_SECONDS after a request from the same browser wrote
+  (tracked with a cookie by ``ReplicaStickinessMiddleware``), so a student
+  who just scanned or a teacher who just uploaded sees their own change.
+"""
+import contextvars
+import functools
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary'
+
+# Reads of the current request may use the replica
+_reads_from_replica = contextvars.ContextVar('reads_from_replica', default=False)
+# The current request wrote, or its browser wrote recently
+_pinned_to_primary = contextvars.ContextVar('pinned_to_primary', default=False)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections.settings
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _reads_from_replica.get() and not _pinned_to_primary.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        _pinned_to_primary.set(True)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replica hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated on its own
+        return db != REPLICA_ALIAS
+
+
+def replica_reads(view):
+    """Let a view's reads go to the replica (sync and async views)."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _reads_from_replica.set(request.method in ('GET', 'HEAD'))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _reads_from_replica.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _reads_from_replica.set(request.method in ('GET', 'HEAD'))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _reads_from_replica.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware(MiddlewareMixin):
+    """Pin a browser to the primary for a short window after it writes."""
+
+    def process_request(self, request):
+        _reads_from_replica.set(False)
+        _pinned_to_primary.set(STICKY_COOKIE in request.COOKIES)
+        _wrote.set(False)
+
+    def process_response(self, request, response):
+        if _wrote.get():
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,156 @@
+"""
+Static files without a CDN or a separate web server.
+
+``CompressedManifestStaticFilesStorage`` is Django's manifest storage
+(``collectstatic`` writes ``app.3f2a9c1b.css`` next to ``app.css`` and
+``{% static %}`` emits the hashed name) that also writes ``.gz`` and, when
+the ``brotli`` package is installed, ``.br`` copies of every text asset.
+
+``StaticFilesMiddleware`` serves STATIC_ROOT from the app itself: the
+pre-compressed variant the browser accepts, hashed names with a one-year
+``immutable`` Cache-Control, anything else with a short one. Each encoding
+has its own ETag, so caches and revalidations never mix them up. It indexes
+STATIC_ROOT once at startup, so a request is a dict lookup and a file open.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.svg', '.json', '.txt', '.html', '.map', '.ttf', '.eot', '.xml')
+# Not worth a second file below this size
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 60
+# Content-Encoding and ETag suffix of each pre-compressed copy, by preference
+ENCODINGS = (('br', 'br', '-br'), ('gz', 'gzip', '-gz'))
+
+
+def accepted_encodings(header):
+    """The q-value of each coding in an Accept-Encoding header (``*`` included)."""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in self._compressible(paths):
+            self.compress(name)
+
+    def _compressible(self, paths):
+        # The originals and their hashed copies
+        names = set(paths)
+        names.update(self.hashed_files.values())
+        return sorted(name for name in names if name.endswith(COMPRESSIBLE) and self.exists(name))
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data)))
+        for suffix, compressed in variants:
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+class StaticFilesMiddleware(MiddlewareMixin):
+    """Serve collected static files (with DEBUG off) with compression and long caching."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        root = getattr(settings, 'STATIC_ROOT', None)
+        if settings.DEBUG or not root or not os.path.isdir(root):
+            raise MiddlewareNotUsed
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.files = self._index(str(root))
+
+    def _index(self, root):
+        immutable = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                immutable = set(json.load(f).get('paths', {}).values())
+        files = {}
+        for directory, _, names in os.walk(root):
+            for filename in names:
+                if filename.endswith(('.gz', '.br')) or filename == 'staticfiles.json':
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                stat = os.stat(path)
+                files[name] = {
+                    'path': path,
+                    'etag': f'"{int(stat.st_mtime):x}-{stat.st_size:x}"',
+                    'last_modified': formatdate(stat.st_mtime, usegmt=True),
+                    'max_age': IMMUTABLE_MAX_AGE if name in immutable else MUTABLE_MAX_AGE,
+                    'immutable': name in immutable,
+                    'br': os.path.exists(path + '.br'),
+                    'gz': os.path.exists(path + '.gz'),
+                }
+        return files
+
+    def process_request(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path_info.startswith(self.prefix):
+            return None
+        name = posixpath.normpath(request.path_info[len(self.prefix):]).lstrip('/')
+        entry = self.files.get(name)
+        if entry is None:
+            return None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        path, encoding, etag = entry['path'], None, entry['etag']
+        for suffix, coding, tag in ENCODINGS:
+            if entry[suffix] and accepted.get(coding, accepted.get('*', 0)) > 0:
+                path, encoding = f'{path}.{suffix}', coding
+                etag = etag[:-1] + tag + '"'
+                break
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'))
+            # Typed after the original name, not the .gz/.br copy
+            content_type, _ = mimetypes.guess_type(name)
+            response['Content-Type'] = content_type or 'application/octet-stream'
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = entry['last_modified']
+        response['ETag'] = etag
+        response['Vary'] = 'Accept-Encoding'
+        cache_control = f"public, max-age={entry['max_age']}"
+        if entry['immutable']:
+            cache_control += ', immutable'
+        response['Cache-Control'] = cache_control
+        return response
@@ -0,0 +1,214 @@
+"""
+A small database-backed task queue.
+
+Functions decorated with ``@task`` get a ``.delay()`` that stores a
+``core.Task`` row; ``python manage.py run_worker`` claims and runs them.
+No broker is needed: the database is the queue, and claiming is a
+conditional UPDATE under a per-queue lock so any number of worker
+processes can share it.
+
+- Retries: a task that raises is retried with exponential backoff until
+  ``max_attempts`` is reached, then left as ``failed``.
+- Dedup: ``delay(..., dedup_key=...)`` is a no-op while a queued task
+  with the same key is waiting.
+- Concurrency: at most ``TASK_QUEUES[queue]['concurrency']`` tasks of a
+  queue run at once, across all workers.
+
+With ``TASKS_EAGER`` set, ``.delay()`` runs the task inline instead (the
+default in development so nothing changes without a worker).
+"""
+import hashlib
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = {'concurrency': 1, 'timeout': 300}
+
+registry = {}
+
+
+def queue_config(queue):
+    config = dict(DEFAULT_QUEUE)
+    config.update(getattr(settings, 'TASK_QUEUES', {}).get(queue, {}))
+    return config
+
+
+class TaskFunction:
+    def __init__(self, func, name, queue, max_attempts, retry_delay):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, dedup_key=None, countdown=0, **kwargs):
+        """
+        Queue the task. Arguments must be JSON-serialisable. Returns the
+        ``Task`` row, or None when it ran eagerly or a queued duplicate
+        already exists.
+        """
+        if getattr(settings, 'TASKS_EAGER', False):
+            try:
+                self.func(*args, **kwargs)
+            except Exception:
+                logger.exception('Task %s failed', self.name)
+            return None
+        try:
+            with transaction.atomic():
+                return Task.objects.create(
+                    name=self.name,
+                    queue=self.queue,
+                    args=list(args),
+                    kwargs=kwargs,
+                    dedup_key=dedup_key,
+                    max_attempts=self.max_attempts,
+                    run_at=timezone.now() + timedelta(seconds=countdown),
+                )
+        except IntegrityError:
+            if dedup_key is None:
+                raise
+            return None
+
+
+def task(queue='default', max_attempts=3, retry_delay=10, name=None):
+    """Register a function as a background task on ``queue``."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = TaskFunction(func, task_name, queue, max_attempts, retry_delay)
+        return registry[task_name]
+    return decorator
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _lock_queue(queue):
+    """
+    Serialise claims on ``queue`` until the end of the transaction. On
+    Postgres (READ COMMITTED) the running count in a claim cannot see a
+    claim another worker has not committed yet, so without the lock two
+    workers can both take the last free place. SQLite has a single writer,
+    which already serialises the claiming UPDATEs.
+    """
+    if connection.vendor == 'postgresql':
+        digest = hashlib.blake2b(f'task-queue:{queue}'.encode(), digest_size=8).digest()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [int.from_bytes(digest, 'big', signed=True)])
+
+
+def claim(queue, worker):
+    """
+    Take the next due task of ``queue`` unless the queue is already
+    running its concurrency limit. The limit is checked in the UPDATE
+    that claims the row, under a per-queue lock, so concurrent workers
+    cannot overshoot it.
+    """
+    config = queue_config(queue)
+    now = timezone.now()
+    with transaction.atomic():
+        _lock_queue(queue)
+        candidate = (Task.objects.filter(queue=queue, status=Task.QUEUED, run_at__lte=now)
+                     .values_list('id', flat=True).first())
+        if candidate is None:
+            return None
+        running = (Task.objects.filter(queue=OuterRef('queue'), status=Task.RUNNING)
+                   .order_by().values('queue').annotate(n=Count('id')).values('n'))
+        claimed = (Task.objects.filter(pk=candidate, status=Task.QUEUED)
+                   .alias(running=Coalesce(Subquery(running, output_field=IntegerField()), Value(0)))
+                   .filter(running__lt=config['concurrency'])
+                   .update(status=Task.RUNNING, locked_by=worker,
+                           locked_until=now + timedelta(seconds=config['timeout'])))
+    if not claimed:
+        return None
+    return Task.objects.get(pk=candidate)
+
+
+def execute(job):
+    """Run a claimed task and record the outcome."""
+    job.attempts += 1
+    func = registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {job.name}')
+        func.func(*job.args, **job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.exception('Task %s (#%s) failed', job.name, job.id)
+        retry_delay = func.retry_delay if func else 0
+        if func is not None and job.attempts < job.max_attempts:
+            _requeue(job, timezone.now() + timedelta(seconds=retry_delay * 2 ** (job.attempts - 1)))
+        else:
+            _finish(job, Task.FAILED)
+        return False
+    _finish(job, Task.DONE)
+    return True
+
+
+def _finish(job, status):
+    job.status = status
+    job.locked_by = ''
+    job.locked_until = None
+    job.finished_at = timezone.now()
+    job.save()
+
+
+def _requeue(job, run_at):
+    job.status = Task.QUEUED
+    job.run_at = run_at
+    job.locked_by = ''
+    job.locked_until = None
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # A fresh copy is already queued and will do the work
+        job.last_error += '\nSuperseded by a newer queued task.'
+        _finish(job, Task.FAILED)
+
+
+def recover_stale(queues):
+    """Requeue tasks whose worker died (their lease ran out)."""
+    stale = Task.objects.filter(queue__in=queues, status=Task.RUNNING, locked_until__lt=timezone.now())
+    for job in stale:
+        job.attempts += 1
+        job.last_error = f'Worker {job.locked_by} stopped before the task finished.'
+        if job.attempts < job.max_attempts:
+            _requeue(job, timezone.now())
+        else:
+            _finish(job, Task.FAILED)
+
+
+def purge(older_than):
+    """Delete finished tasks older than ``older_than`` (a timedelta)."""
+    cutoff = timezone.now() - older_than
+    deleted, _ = Task.objects.filter(status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_pending(queues, worker=None):
+    """Run due tasks of ``queues`` until none can be claimed. Returns the number run."""
+    worker = worker or worker_name()
+    count = 0
+    while True:
+        job = next(filter(None, (claim(queue, worker) for queue in queues)), None)
+        if job is None:
+            return count
+        execute(job)
+        count += 1
@@ -1,9 +1,35 @@
-from django.test import TestCase, Client
+import json
+import os
+import tempfile
+from io import StringIO
+from datetime import date, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from core.staticfiles import StaticFilesMiddleware
+from django.contrib.auth.hashers import check_password, make_password
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
+from admins.models import Branch, Degree, Group
 from students.models import Student
-from teachers.models import Teacher, Subject
-from core.models import Material, Announcement
+from teachers.models import Teacher, Subject, QRCode, Timetable
+from core import analytics, metrics, ratelimit, roles, routers, tasks
+from core.models import Attendance, ArchivedAttendance, AttendanceSummary, Material, Announcement, Task, Term
+from core.snapshot import export_snapshot, load_snapshot
+from core.tasks import task
+from core.utils import (
+    calculate_attendance_percentage, student_attendance_percentages, subject_attendance_percentages,
+    term_attendance_history,
+)
+from sih_project.database import database_config
 
 
 class SIHProjectTestCase(TestCase):
@@ -140,3 +166,443 @@ class SIHProjectTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+calls = []
+
+
+@task(queue='tests', max_attempts=2, retry_delay=0)
+def flaky(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASK_QUEUES={'tests': {'concurrency': 1}})
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_dedup_key_collapses_queued_tasks(self):
+        """Test a deduplicated task is queued once and run by the worker"""
+        self.assertIsNotNone(flaky.delay(1, dedup_key='k'))
+        self.assertIsNone(flaky.delay(1, dedup_key='k'))
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(tasks.run_pending(['tests']), 1)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+        # Once the first copy has run a new one can be queued
+        self.assertIsNotNone(flaky.delay(1, dedup_key='k'))
+
+    def test_failed_task_is_retried_then_failed(self):
+        """Test failing tasks are retried up to max_attempts"""
+        flaky.delay(2, fail=True)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            tasks.run_pending(['tests'])
+        job = Task.objects.get()
+        self.assertEqual((job.status, job.attempts), (Task.FAILED, 2))
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(calls, [2, 2])
+
+    def test_queue_concurrency_limit(self):
+        """Test no task is claimed while the queue runs its concurrency limit"""
+        flaky.delay(3)
+        flaky.delay(4)
+        running = tasks.claim('tests', 'w1')
+        self.assertIsNotNone(running)
+        self.assertIsNone(tasks.claim('tests', 'w2'))
+        tasks.execute(running)
+        self.assertIsNotNone(tasks.claim('tests', 'w2'))
+
+    def test_scan_recount_runs_in_background(self):
+        """Test the attendance percentage is recomputed by the worker after a scan"""
+        teacher = Teacher.objects.create(user=User.objects.create(username='t'), employee_id='T9', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        student = Student.objects.create(user=User.objects.create_user(username='s', password='testpass123'), roll_number='S9')
+        QRCode.objects.create(subject=subject, teacher=teacher, qr_data='x',
+                              expires_at=timezone.now() + timedelta(minutes=15))
+        client = Client()
+        client.login(username='s', password='testpass123')
+        client.post(reverse('students:scan_qr'), {
+            'qr_data': json.dumps({'subject_id': subject.id, 'teacher_id': teacher.id})
+        })
+        student.refresh_from_db()
+        self.assertEqual(student.attendance_percentage, 0.0)
+        tasks.run_pending(['default'])
+        student.refresh_from_db()
+        self.assertEqual(student.attendance_percentage, 100.0)
+
+
+class DatabaseProfileTestCase(TestCase):
+    def test_profiles(self):
+        """Test the SQLite profile tunes locking and the Postgres one pools or persists connections"""
+        sqlite = database_config('sqlite', settings.BASE_DIR)
+        self.assertEqual(sqlite['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('journal_mode=WAL', sqlite['OPTIONS']['init_command'])
+        with mock.patch.dict(os.environ, {'DB_POOL': 'True', 'DB_POOL_SIZE': '20'}):
+            postgres = database_config('postgres', settings.BASE_DIR)
+        self.assertEqual((postgres['CONN_MAX_AGE'], postgres['OPTIONS']['pool']['max_size']), (0, 20))
+        self.assertEqual(database_config('postgres', settings.BASE_DIR)['CONN_MAX_AGE'], 60)
+        with self.assertRaises(ImproperlyConfigured):
+            database_config('mysql', settings.BASE_DIR)
+
+
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        replica = mock.patch.object(routers, 'replica_configured', return_value=True)
+        replica.start()
+        self.addCleanup(replica.stop)
+
+    def route(self, request, write=False):
+        """Run a replica_reads view and return where its reads went"""
+        @routers.replica_reads
+        def view(request):
+            if write:
+                self.router.db_for_write(Student)
+            return self.router.db_for_read(Student)
+
+        routers.ReplicaStickinessMiddleware(lambda r: None).process_request(request)
+        return view(request)
+
+    def test_reads_go_to_replica_until_a_write(self):
+        """Test report reads use the replica, and the primary once the request or browser has written"""
+        self.assertEqual(self.route(self.factory.get('/')), 'replica')
+        self.assertIsNone(self.route(self.factory.post('/')))
+        self.assertIsNone(self.route(self.factory.get('/'), write=True))
+        request = self.factory.get('/')
+        request.COOKIES[routers.STICKY_COOKIE] = '1'
+        self.assertIsNone(self.route(request))
+        self.assertIsNone(self.router.db_for_read(Student))
+        self.assertFalse(self.router.allow_migrate('replica', 'core'))
+
+    def test_writes_set_sticky_cookie(self):
+        """Test a request that writes pins the browser to the primary for a while"""
+        User.objects.create_user(username='sticky', password='testpass123')
+        client = Client()
+        response = client.get(reverse('core:login'))
+        self.assertNotIn(routers.STICKY_COOKIE, response.cookies)
+        response = client.post(reverse('core:login'), {'username': 'sticky', 'password': 'testpass123'})
+        self.assertEqual(response.cookies[routers.STICKY_COOKIE]['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+
+class AttendanceArchiveTestCase(TestCase):
+    def test_archive_closed_term(self):
+        """Test a closed term's attendance moves to the archive without changing percentages or history"""
+        teacher = Teacher.objects.create(user=User.objects.create(username='t'), employee_id='T1', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        student = Student.objects.create(user=User.objects.create(username='s'), roll_number='S1')
+        today = timezone.localdate()
+        term = Term.objects.create(name='Spring', start_date=today - timedelta(days=120),
+                                   end_date=today - timedelta(days=30))
+        Term.objects.create(name='Autumn', start_date=today - timedelta(days=29), end_date=today + timedelta(days=60))
+        for days, present in ((100, True), (90, True), (80, False), (60, True), (10, False)):
+            Attendance.objects.create(student=student, subject=subject, is_present=present,
+                                      date=today - timedelta(days=days))
+        Attendance.objects.create(student=student, subject=subject, is_present=True, date=today - timedelta(days=5))
+        # Only the current term counts; earlier ones are in the history
+        before = calculate_attendance_percentage(student, subject)
+        self.assertEqual(before, 50.0)
+        with self.assertNumQueries(2):
+            self.assertEqual(subject_attendance_percentages(student), {subject.id: before})
+        self.assertEqual(student_attendance_percentages(subject, [student]), {student.id: before})
+
+        call_command('archive_attendance', '--batch-size', '2', stdout=StringIO())
+
+        self.assertEqual(Attendance.objects.count(), 2)
+        self.assertEqual(ArchivedAttendance.objects.filter(term=term).count(), 4)
+        summary = AttendanceSummary.objects.get(term=term, student=student, subject=subject)
+        self.assertEqual((summary.present, summary.total), (3, 4))
+        self.assertEqual(calculate_attendance_percentage(student, subject), before)
+        self.assertEqual(term_attendance_history(student), [{'term': 'Spring', 'percentage': 75.0}])
+        term.refresh_from_db()
+        self.assertIsNotNone(term.archived_at)
+        with self.assertRaises(CommandError):
+            call_command('archive_attendance', '--term', 'Autumn')
+
+
+class AttendanceSnapshotTestCase(TestCase):
+    def test_export_and_load(self):
+        """Test the columnar snapshot round-trips live and archived attendance"""
+        teacher = Teacher.objects.create(user=User.objects.create(username='t'), employee_id='T1', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        students = [Student.objects.create(user=User.objects.create(username=f's{i}'), roll_number=f'S{i}')
+                    for i in range(2)]
+        day = timezone.localdate()
+        term = Term.objects.create(name='Old', start_date=day - timedelta(days=400), end_date=day - timedelta(days=300))
+        Attendance.objects.create(student=students[0], subject=subject, date=day, is_present=True)
+        Attendance.objects.create(student=students[1], subject=subject, date=day, is_present=False)
+        ArchivedAttendance.objects.create(term=term, student=students[0], subject=subject, is_present=False,
+                                          date=term.start_date, marked_at=timezone.now())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, 'snapshot')
+            meta = export_snapshot(directory)
+            self.assertEqual(meta['rows'], 3)
+            snapshot = load_snapshot(directory)
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(sorted(snapshot.date.tolist()), [term.start_date.toordinal()] + [day.toordinal()] * 2)
+            self.assertEqual(str(snapshot.dates().max()), day.isoformat())
+            keys, percentages = snapshot.percentage_by('student_id')
+            self.assertEqual(dict(zip(keys.tolist(), percentages.tolist())),
+                             {students[0].id: 50.0, students[1].id: 0.0})
+            self.assertEqual(export_snapshot(directory, include_archive=False)['rows'], 2)
+            del snapshot
+
+
+@override_settings(TASKS_EAGER=True)
+class AnalyticsTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, 'analytics')
+        snapshot_dir = override_settings(ANALYTICS_SNAPSHOT_DIR=self.directory)
+        snapshot_dir.enable()
+        self.addCleanup(snapshot_dir.disable)
+
+    def test_aggregates_and_invalidation(self):
+        """Test the vectorized aggregates and that a new attendance row refreshes them"""
+        degree = Degree.objects.create(name='BTech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        groups = [Group.objects.create(name=name, branch=branch, degree=degree) for name in ('A', 'B')]
+        teacher = Teacher.objects.create(user=User.objects.create(username='t', first_name='Ada'),
+                                         employee_id='T1', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        students = [
+            Student.objects.create(user=User.objects.create(username=f's{i}'), roll_number=f'S{i}', group=groups[i])
+            for i in range(2)
+        ]
+        self.assertEqual((analytics.get_analytics()['rows'], analytics.get_analytics()['trend']), (0, []))
+        # The roll is in the 10:00 class, whenever it is written down
+        Timetable.objects.create(group=groups[0], day='Monday', time_slot='10:00', subject=subject, room_number='A1')
+        Timetable.objects.create(group=None, day='Monday', time_slot='14:00', subject=subject, room_number='A1')
+        monday = date(2026, 1, 5)
+        for offset, (first, second) in enumerate([(True, False), (True, True), (True, False), (True, False)]):
+            for student, present in zip(students, (first, second)):
+                Attendance.objects.create(student=student, subject=subject, date=monday + timedelta(days=offset),
+                                          is_present=present)
+
+        stats = analytics.get_analytics()
+        self.assertEqual((stats['rows'], stats['overall'], stats['at_risk']), (8, 62.5, 1))
+        self.assertEqual([(g['percentage'], g['at_risk']) for g in stats['groups']], [(100.0, 0), (25.0, 1)])
+        self.assertEqual(stats['teachers'][0]['name'], 'Ada')
+        self.assertEqual([d['name'] for d in stats['weekdays']], ['Monday', 'Tuesday', 'Wednesday', 'Thursday'])
+        self.assertEqual(stats['trend'], [{'week': '2026-01-05', 'percentage': 62.5}])
+        self.assertEqual([(s['name'], s['classes']) for s in stats['slots']], [('10:00', 1), ('14:00', 1)])
+
+        Attendance.objects.create(student=students[1], subject=subject, date=monday + timedelta(days=7),
+                                  is_present=True)
+        self.assertEqual(analytics.get_analytics()['rows'], 9)
+
+    @override_settings(TASKS_EAGER=False)
+    def test_serves_the_snapshot_until_refreshed(self):
+        """Test a cold build reads the snapshot, and an outdated one is served while a refresh is queued"""
+        teacher = Teacher.objects.create(user=User.objects.create(username='t'), employee_id='T1', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        student = Student.objects.create(user=User.objects.create(username='s'), roll_number='S1')
+        Attendance.objects.create(student=student, subject=subject, date=date(2026, 1, 5), is_present=True)
+        self.assertEqual(analytics.get_analytics()['rows'], 1)
+        self.assertEqual(load_snapshot(self.directory).meta['rows'], 1)
+
+        cache.clear()
+        analytics.invalidate()
+        with CaptureQueriesContext(connection) as queries:
+            stats = analytics.get_analytics()
+        self.assertFalse([q for q in queries if 'FROM "core_attendance"' in q['sql']])
+        self.assertEqual(stats['rows'], 1)
+        self.assertTrue(stats['as_of'])
+        self.assertEqual(Task.objects.filter(name='core.analytics.refresh_snapshot').count(), 1)
+
+        Attendance.objects.create(student=student, subject=subject, date=date(2026, 1, 6), is_present=False)
+        tasks.run_pending(['analytics'])
+        stats = analytics.get_analytics()
+        self.assertEqual((stats['rows'], stats['overall']), (2, 50.0))
+        self.assertNotIn('as_of', stats)
+
+    def test_admin_page(self):
+        """Test the analytics page is for staff only"""
+        User.objects.create_user(username='admin', password='testpass123', is_staff=True)
+        User.objects.create_user(username='plain', password='testpass123')
+        client = Client()
+        client.login(username='plain', password='testpass123')
+        self.assertRedirects(client.get(reverse('admins:analytics')), reverse('core:dashboard'),
+                             fetch_redirect_response=False)
+        client.login(username='admin', password='testpass123')
+        self.assertContains(client.get(reverse('admins:analytics')), 'Attendance Analytics')
+
+
+class StaticFilesMiddlewareTestCase(TestCase):
+    def test_serves_compressed_and_cached(self):
+        """Test collected files are served pre-compressed, hashed names with far-future caching"""
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'css'))
+            for name, body in (('css/app.css', b'body{}' * 200), ('css/app.1a2b3c.css', b'body{}' * 200)):
+                with open(os.path.join(root, name), 'wb') as f:
+                    f.write(body)
+            with open(os.path.join(root, 'css/app.1a2b3c.css.gz'), 'wb') as f:
+                f.write(b'gzipped')
+            with open(os.path.join(root, 'staticfiles.json'), 'w') as f:
+                json.dump({'paths': {'css/app.css': 'css/app.1a2b3c.css'}}, f)
+
+            with override_settings(DEBUG=False, STATIC_ROOT=root):
+                middleware = StaticFilesMiddleware(lambda request: None)
+            factory = RequestFactory()
+            response = middleware.process_request(
+                factory.get('/static/css/app.1a2b3c.css', HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertEqual(b''.join(response.streaming_content), b'gzipped')
+            self.assertEqual((response['Content-Encoding'], response['Content-Type']), ('gzip', 'text/css'))
+            self.assertIn('immutable', response['Cache-Control'])
+            gzip_etag = response['ETag']
+            response.close()
+            # gzip;q=0 refuses the copy; the identity body has its own ETag
+            for accept in ('gzip;q=0', 'br, identity'):
+                response = middleware.process_request(
+                    factory.get('/static/css/app.1a2b3c.css', HTTP_ACCEPT_ENCODING=accept))
+                self.assertNotIn('Content-Encoding', response)
+                self.assertNotEqual(response['ETag'], gzip_etag)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                response.close()
+            revalidated = middleware.process_request(
+                factory.get('/static/css/app.1a2b3c.css', HTTP_IF_NONE_MATCH=gzip_etag))
+            self.assertEqual(revalidated.status_code, 200)
+            revalidated.close()
+            response = middleware.process_request(factory.get('/static/css/app.css'))
+            self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+            self.assertNotIn('Content-Encoding', response)
+            response.close()
+            revalidated = middleware.process_request(
+                factory.get('/static/css/app.css', HTTP_IF_NONE_MATCH=response['ETag']))
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertIsNone(middleware.process_request(factory.get('/static/../settings.py')))
+
+
+class RoleResolutionTestCase(TestCase):
+    def setUp(self):
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        self.group = Group.objects.create(name='G1', branch=branch, degree=degree)
+        self.student_user = User.objects.create(username='student')
+        self.student = Student.objects.create(user=self.student_user, roll_number='S1', group=self.group)
+        self.teacher_user = User.objects.create(username='teacher')
+        Teacher.objects.create(user=self.teacher_user, employee_id='T1', department='CS')
+
+    def test_cached_with_profile_relations(self):
+        """Test the role is resolved once, with the group, and primes user.student/user.teacher"""
+        user = User.objects.get(id=self.student_user.id)
+        role, profile = roles.get_role(user)
+        self.assertEqual((role, profile), ('student', self.student))
+        user = User.objects.get(id=self.student_user.id)
+        with self.assertNumQueries(0):
+            role, profile = roles.get_role(user)
+            self.assertEqual(profile.group.name, 'G1')
+            self.assertIs(user.student, profile)
+            self.assertFalse(hasattr(user, 'teacher'))
+        self.student.group = Group.objects.create(name='G2', branch=self.group.branch, degree=self.group.degree)
+        self.student.save()
+        self.assertEqual(roles.get_role(user)[1].group.name, 'G2')
+        staff = User.objects.create(username='staff', is_staff=True)
+        self.assertEqual(roles.get_role(staff), ('admin', None))
+
+    def test_role_required(self):
+        """Test views of another role redirect, and their JSON endpoints answer 403"""
+        client = Client()
+        client.force_login(self.teacher_user)
+        self.assertRedirects(client.get(reverse('students:scan_qr')), reverse('core:dashboard'),
+                             fetch_redirect_response=False)
+        response = client.get(reverse('students:next_free_period'))
+        self.assertEqual((response.status_code, response.json()), (403, {'error': 'Not a student'}))
+        self.assertRedirects(client.get(reverse('core:dashboard')), reverse('teachers:dashboard'),
+                             fetch_redirect_response=False)
+        client.force_login(self.student_user)
+        self.assertEqual(client.get(reverse('students:scan_qr')).status_code, 200)
+
+
+class AuthOverheadTestCase(TestCase):
+    def test_pbkdf2_iterations_setting(self):
+        """Test the PBKDF2 iteration count follows the setting and old hashes are upgraded"""
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            encoded = make_password('secret')
+            self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+            self.assertTrue(check_password('secret', encoded))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            user = User.objects.create(username='u', password=encoded)
+            self.assertTrue(user.check_password('secret'))
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_auth_overhead_recorded(self):
+        """Test each request's session/user/role loading is timed for the admin dashboard"""
+        metrics.auth_overhead.clear()
+        client = Client()
+        client.force_login(User.objects.create(username='admin', is_staff=True))
+        response = client.get(reverse('admins:dashboard'))
+        self.assertContains(response, 'Auth per request')
+        summary = metrics.auth_summary()
+        self.assertEqual(summary['requests'], 1)
+        self.assertGreaterEqual(summary['queries'], 1)
+
+
+@override_settings(RATE_LIMITS={'api': {'rate': '6/m', 'burst': 2}, 'scan': {'rate': '6/m', 'burst': 1}})
+class RateLimitTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.rate_limits.clear()
+
+    def test_burst_then_sustained_rate(self):
+        """Test a client gets its burst at once, then one request per 1/rate seconds"""
+        policy = ratelimit.Policy('api', '6/m', 2)
+        now = 1000 * policy.window
+        self.assertIsNone(ratelimit.hit(policy, 'u1', now))
+        self.assertIsNone(ratelimit.hit(policy, 'u1', now + 1))
+        retry = ratelimit.hit(policy, 'u1', now + 2)
+        self.assertEqual(retry, 28)
+        self.assertEqual(ratelimit.hit(policy, 'u1', now + 2 + retry - 1), 1)
+        self.assertIsNone(ratelimit.hit(policy, 'u1', now + 2 + retry))
+        # Other clients have their own budget
+        self.assertIsNone(ratelimit.hit(policy, 'u2', now + 2))
+
+    def test_racing_requests_share_the_last_token(self):
+        """Test a request decides on the count after its own increment and gives a refused one back"""
+        policy = ratelimit.Policy('api', '6/m', 1)
+        now = 1000 * policy.window
+        key = policy.keys('u1', now)[0]
+        # Another process has incremented but not decided yet
+        cache.add(key, 0)
+        cache.incr(key)
+        self.assertEqual(ratelimit.hit(policy, 'u1', now), 20)
+        self.assertEqual(cache.get(key), 1)
+        cache.decr(key)
+        self.assertIsNone(ratelimit.hit(policy, 'u1', now))
+        self.assertEqual(ratelimit.hit(policy, 'u1', now), 20)
+        self.assertEqual(cache.get(key), 1)
+
+    def test_policy_validation(self):
+        """Test policies without a positive rate or burst are refused when built"""
+        for rate, burst in (('6/m', 0), ('0/m', 2), ('6/d', 2), ('m', 2)):
+            with self.assertRaises(ValueError):
+                ratelimit.Policy('api', rate, burst)
+
+    def test_view_answers_429_with_retry_after(self):
+        """Test a limited view answers 429 with Retry-After and the requests are counted"""
+        client = Client()
+        client.force_login(User.objects.create(username='staff', is_staff=True))
+        url = reverse('admins:api_branches')
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.get(url).status_code, 200)
+        response = client.get(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(response.json()['retry_after'], int(response['Retry-After']))
+        self.assertEqual(metrics.rate_limits.summary(), [{'policy': 'api', 'allowed': 2, 'limited': 1}])
+        self.assertContains(client.get(reverse('admins:dashboard')), 'Rate limited:')
+        with override_settings(RATE_LIMIT_ENABLED=False):
+            self.assertEqual(client.get(url).status_code, 200)
+
+    def test_only_listed_methods_count(self):
+        """Test opening the scan page does not use up the student's scan budget"""
+        client = Client()
+        user = User.objects.create(username='student')
+        Student.objects.create(user=user, roll_number='R1')
+        client.force_login(user)
+        for _ in range(3):
+            self.assertEqual(client.get(reverse('students:scan_qr')).status_code, 200)
+        self.assertEqual(client.post(reverse('students:scan_qr'), {'qr_data': '{}'}).status_code, 200)
+        self.assertEqual(client.post(reverse('students:scan_qr'), {'qr_data': '{}'}).status_code, 429)
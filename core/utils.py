@@ -1,11 +1,14 @@
 import requests
 import json
 from django.conf import settings
+from django.core import signing
 from datetime import datetime, time
 import qrcode
 import io
 import base64
-from .models import Attendance
+from django.db.models import Count, Q, Sum
+from .models import Attendance, AttendanceSummary, Term
+from teachers import timetable
 
 
 def ai_recommendation(prompt):
@@ -16,7 +19,7 @@ def ai_recommendation(prompt):
     headers = {"Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}"}
     
     try:
-        response = requests.post(API_URL, headers=headers, json={"inputs": prompt, "max_length": 100})
+        response = requests.post(API_URL, headers=headers, json={"inputs": prompt, "max_length": 100}, timeout=15)
         if response.status_code == 200:
             result = response.json()
             if isinstance(result, list) and len(result) > 0:
@@ -32,24 +35,23 @@ def get_student_recommendation(student, current_time=None):
     """
     Get personalized recommendation for student based on time and interests
     """
-    if current_time is None:
-        current_time = datetime.now().time()
-    
-    # Check if it's a free period (between classes)
-    free_periods = [
-        (time(9, 30), time(10, 0)),  # 9:30-10:00
-        (time(11, 30), time(12, 0)), # 11:30-12:00
-        (time(14, 30), time(15, 0)), # 2:30-3:00
-    ]
+    return ai_recommendation(recommendation_prompt(student, current_time))
+
+
+def recommendation_prompt(student, current_time=None):
+    """
+    Prompt for the student's recommendation: a free-period activity or a
+    personal development one, depending on the group timetable
+    """
+    if isinstance(current_time, time):
+        current_time = datetime.combine(datetime.now().date(), current_time)
     
-    is_free_period = any(start <= current_time <= end for start, end in free_periods)
+    # Free period = a teaching hour with nothing on the student's group timetable
+    is_free_period = timetable.is_free_period(student.group_id, current_time)
     
     if is_free_period:
-        prompt = f"Suggest a quick 15-minute learning activity for a student interested in {student.interests or 'general studies'}"
-    else:
-        prompt = f"Suggest a personal development or career skill activity for a student interested in {student.interests or 'technology'}"
-    
-    return ai_recommendation(prompt)
+        return f"Suggest a quick 15-minute learning activity for a student interested in {student.interests or 'general studies'}"
+    return f"Suggest a personal development or career skill activity for a student interested in {student.interests or 'technology'}"
 
 
 def generate_qr_code(data):
@@ -75,16 +77,35 @@ def generate_qr_code(data):
     return f"data:image/png;base64,{img_str}"
 
 
+QR_TOKEN_SALT = 'attendance.qr'
+
+
+def qr_token(qr_id):
+    """Signed reference to a QRCode row, embedded in the QR payload"""
+    return signing.dumps(qr_id, salt=QR_TOKEN_SALT)
+
+
+def qr_id_from_token(token):
+    """The QRCode id a token was signed for; raises signing.BadSignature if forged"""
+    return signing.loads(token, salt=QR_TOKEN_SALT)
+
+
 def calculate_attendance_percentage(student, subject=None):
     """
-    Calculate attendance percentage for a student
+    Calculate attendance percentage for a student in the current term
+    (all live attendance when no term is running). Earlier terms are
+    reported per term by ``term_attendance_history``.
     """
+    filters = {'student': student}
     if subject:
-        total_classes = Attendance.objects.filter(student=student, subject=subject).count()
-        present_classes = Attendance.objects.filter(student=student, subject=subject, is_present=True).count()
-    else:
-        total_classes = Attendance.objects.filter(student=student).count()
-        present_classes = Attendance.objects.filter(student=student, is_present=True).count()
+        filters['subject'] = subject
+    term = Term.current()
+    if term is not None:
+        filters['date__range'] = (term.start_date, term.end_date)
+    counts = Attendance.objects.filter(**filters).aggregate(
+        total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+    total_classes = counts['total']
+    present_classes = counts['present']
     
     if total_classes == 0:
         return 0.0
@@ -92,45 +113,51 @@ def calculate_attendance_percentage(student, subject=None):
     return round((present_classes / total_classes) * 100, 2)
 
 
-def get_weekly_timetable():
-    """
-    Get hardcoded weekly timetable
-    """
-    timetable = {
-        'Monday': [
-            {'time': '09:00', 'subject': 'Mathematics', 'room': 'A101'},
-            {'time': '10:00', 'subject': 'Physics', 'room': 'B201'},
-            {'time': '11:00', 'subject': 'Chemistry', 'room': 'C301'},
-            {'time': '12:00', 'subject': 'English', 'room': 'D401'},
-            {'time': '14:00', 'subject': 'Computer Science', 'room': 'E501'},
-        ],
-        'Tuesday': [
-            {'time': '09:00', 'subject': 'Mathematics', 'room': 'A101'},
-            {'time': '10:00', 'subject': 'Biology', 'room': 'F601'},
-            {'time': '11:00', 'subject': 'History', 'room': 'G701'},
-            {'time': '12:00', 'subject': 'Geography', 'room': 'H801'},
-            {'time': '14:00', 'subject': 'Physical Education', 'room': 'Gym'},
-        ],
-        'Wednesday': [
-            {'time': '09:00', 'subject': 'Physics', 'room': 'B201'},
-            {'time': '10:00', 'subject': 'Chemistry', 'room': 'C301'},
-            {'time': '11:00', 'subject': 'Mathematics', 'room': 'A101'},
-            {'time': '12:00', 'subject': 'Computer Science', 'room': 'E501'},
-            {'time': '14:00', 'subject': 'English', 'room': 'D401'},
-        ],
-        'Thursday': [
-            {'time': '09:00', 'subject': 'Biology', 'room': 'F601'},
-            {'time': '10:00', 'subject': 'Mathematics', 'room': 'A101'},
-            {'time': '11:00', 'subject': 'Physics', 'room': 'B201'},
-            {'time': '12:00', 'subject': 'History', 'room': 'G701'},
-            {'time': '14:00', 'subject': 'Chemistry', 'room': 'C301'},
-        ],
-        'Friday': [
-            {'time': '09:00', 'subject': 'Computer Science', 'room': 'E501'},
-            {'time': '10:00', 'subject': 'English', 'room': 'D401'},
-            {'time': '11:00', 'subject': 'Geography', 'room': 'H801'},
-            {'time': '12:00', 'subject': 'Mathematics', 'room': 'A101'},
-            {'time': '14:00', 'subject': 'Physical Education', 'room': 'Gym'},
-        ],
+def _attendance_percentages(group_by, **filters):
+    """
+    Attendance percentage in the current term per ``group_by`` value, in one
+    query; values without attendance are missing (0% in
+    ``calculate_attendance_percentage``).
+    """
+    term = Term.current()
+    if term is not None:
+        filters['date__range'] = (term.start_date, term.end_date)
+    rows = Attendance.objects.filter(**filters).values(group_by).annotate(
+        total=Count('id'), present=Count('id', filter=Q(is_present=True)))
+    return {row[group_by]: round((row['present'] / row['total']) * 100, 2) for row in rows}
+
+
+def subject_attendance_percentages(student):
+    """``calculate_attendance_percentage`` of ``student`` for every subject, by subject id"""
+    return _attendance_percentages('subject_id', student=student)
+
+
+def student_attendance_percentages(subject, students):
+    """``calculate_attendance_percentage`` in ``subject`` for each of ``students``, by student id"""
+    return _attendance_percentages('student_id', subject=subject, student__in=students)
+
+
+def term_attendance_history(student):
+    """
+    Overall attendance of a student per archived term, newest first, read
+    from the precomputed summaries
+    """
+    rows = AttendanceSummary.objects.filter(student=student, term__archived_at__isnull=False).values(
+        'term__name', 'term__start_date'
+    ).annotate(total=Sum('total'), present=Sum('present')).order_by('-term__start_date')
+    return [
+        {'term': row['term__name'],
+         'percentage': round(row['present'] / row['total'] * 100, 2) if row['total'] else 0.0}
+        for row in rows
+    ]
+
+
+def get_weekly_timetable(group=None):
+    """
+    Get the weekly timetable for a group (shared entries only if no group)
+    """
+    group_id = getattr(group, 'id', group)
+    return {
+        day: [{'time': e['time'], 'subject': e['subject'], 'room': e['room']} for e in sessions]
+        for day, sessions in timetable.weekly_timetable(group_id).items()
     }
-    return timetable
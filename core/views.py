@@ -3,6 +3,8 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 
+from .roles import ADMIN, STUDENT, TEACHER
+
 
 def login_view(request):
     if request.method == 'POST':
@@ -20,14 +22,12 @@ def login_view(request):
 
 @login_required
 def dashboard(request):
-    user = request.user
-    
-    # Determine user role and redirect to appropriate dashboard
-    if hasattr(user, 'student'):
+    # Redirect to the dashboard of the role resolved by RoleMiddleware
+    if request.role == STUDENT:
         return redirect('students:dashboard')
-    elif hasattr(user, 'teacher'):
+    elif request.role == TEACHER:
         return redirect('teachers:dashboard')
-    elif user.is_staff:
+    elif request.role == ADMIN:
         return redirect('admins:dashboard')
     else:
         messages.error(request, 'Invalid user role.')
@@ -0,0 +1,67 @@
+"""
+Database profiles, selected with the DB_PROFILE environment variable.
+
+- ``sqlite`` (default): a single-server deployment. WAL journaling lets
+  readers run alongside the writer, ``synchronous=NORMAL`` is safe in
+  WAL mode and avoids an fsync per commit, and IMMEDIATE transactions
+  take the write lock up front so concurrent writers wait for up to
+  ``busy_timeout`` instead of failing with "database is locked" when a
+  read transaction tries to upgrade.
+- ``sqlite-basic``: SQLite with its stock settings (rollback journal,
+  deferred transactions, 5 s timeout), kept for comparison.
+- ``postgres``: DB_NAME, DB_USER, DB_PASSWORD, DB_HOST and DB_PORT.
+  Connections persist for DB_CONN_MAX_AGE seconds (default 60), or, with
+  DB_POOL=True, come from a psycopg connection pool of up to DB_POOL_SIZE
+  connections (needs ``psycopg[pool]``).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PROFILES = ('sqlite', 'sqlite-basic', 'postgres')
+
+SQLITE_BUSY_TIMEOUT_MS = 20000
+
+
+def database_config(profile, base_dir, name=None):
+    """The DATABASES entry for ``profile``; ``name`` overrides the database name."""
+    if profile == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': name or os.environ.get('DB_NAME', base_dir / 'db.sqlite3'),
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS};'
+                ),
+            },
+        }
+    if profile == 'sqlite-basic':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': name or os.environ.get('DB_NAME', base_dir / 'db.sqlite3'),
+        }
+    if profile == 'postgres':
+        pool = os.environ.get('DB_POOL', 'False') == 'True'
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': name or os.environ.get('DB_NAME', 'sih_project'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+            # The pool keeps connections itself; Django refuses both at once
+            'CONN_MAX_AGE': 0 if pool else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'OPTIONS': {},
+        }
+        if pool:
+            config['OPTIONS']['pool'] = {
+                'min_size': 2,
+                'max_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+                'timeout': 10,
+            }
+        return config
+    raise ImproperlyConfigured(f"Unknown DB_PROFILE '{profile}'. Use one of: {', '.join(PROFILES)}.")
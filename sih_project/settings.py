@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .database import database_config
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # load .env file from project root (where manage.py is)
@@ -42,10 +44,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.staticfiles.StaticFilesMiddleware',
+    'core.routers.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.roles.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,21 +68,38 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.role',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'sih_project.wsgi.application'
+# Async deployment: uvicorn sih_project.asgi:application
+ASGI_APPLICATION = 'sih_project.asgi.application'
 
-# Database
+# Database: DB_PROFILE is sqlite (default), sqlite-basic or postgres;
+# see sih_project/database.py for the settings of each
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(DB_PROFILE, BASE_DIR),
 }
 
+# Read replica for dashboards and reports (core/routers.py): DB_REPLICA_NAME
+# is the replica's database name (a second SQLite file kept up to date with
+# `manage.py sync_replica` locally) and DB_REPLICA_HOST its Postgres host.
+# Browsers read from the primary for REPLICA_STICKY_SECONDS after a write.
+DB_REPLICA_NAME = os.environ.get('DB_REPLICA_NAME')
+if DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **database_config(DB_PROFILE, BASE_DIR, name=DB_REPLICA_NAME),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if os.environ.get('DB_REPLICA_HOST'):
+        DATABASES['replica']['HOST'] = os.environ['DB_REPLICA_HOST']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -94,6 +116,19 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. Logins during the morning rush are dominated by
+# PBKDF2; PASSWORD_PBKDF2_ITERATIONS trades that cost against brute-force
+# resistance (Django's default when unset). Stored hashes are re-hashed to
+# the configured count at each user's next login.
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 0)) or None
+PASSWORD_HASHERS = [
+    'core.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -105,6 +140,18 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
+# `collectstatic` fingerprints and pre-compresses everything into STATIC_ROOT,
+# which core.staticfiles.StaticFilesMiddleware serves when DEBUG is off
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'core.staticfiles.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 
 # Media files
 MEDIA_URL = '/media/'
@@ -118,5 +165,75 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Cache. Workers hand results (e.g. generated suggestions) to the web
+# process through it, so use a shared backend (file, database, Redis)
+# when TASKS_EAGER is off.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Sessions: db, cached_db, cache or signed_cookies (or a full engine path).
+# cached_db serves sessions from the cache and only reads django_session on
+# a miss, but a logout must reach every process's cache, so it is the
+# default only with a shared CACHE_BACKEND. signed_cookies keeps sessions
+# out of the server altogether.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE') or ('cached_db' if os.environ.get('CACHE_BACKEND') else 'db')
+if '.' not in SESSION_ENGINE:
+    SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_ENGINE}'
+
+# Background tasks (core/tasks.py), run by `python manage.py run_worker`.
+# Eager mode runs tasks inline, so development works without a worker.
+TASKS_EAGER = os.environ.get('TASKS_EAGER', str(DEBUG)) == 'True'
+TASK_QUEUES = {
+    'default': {'concurrency': 4, 'timeout': 60},
+    # LLM calls are slow and rate limited upstream
+    'llm': {'concurrency': 2, 'timeout': 120},
+    # The timetable solver replaces every group's timetable: one run at a time
+    'timetable': {'concurrency': 1, 'timeout': 120},
+    # Analytics snapshot refreshes all write the same directory
+    'analytics': {'concurrency': 1, 'timeout': 120},
+}
+
+# Columnar copy of the live attendance that the analytics page reads
+# instead of the database (core/analytics.py); empty to always read the
+# database. Refreshed on the 'analytics' queue after attendance changes.
+ANALYTICS_SNAPSHOT_DIR = os.environ.get('ANALYTICS_SNAPSHOT_DIR', str(BASE_DIR / 'snapshots' / 'analytics'))
+
+# Per-client rate limits (core/ratelimit.py): a sustained rate ('<n>/s',
+# '/m' or '/h') and a burst spent at once, counted per user in the shared
+# cache. Limited requests get 429 with Retry-After.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True') == 'True'
+RATE_LIMITS = {
+    # Each refresh may start an LLM call
+    'suggestions': {'rate': '4/m', 'burst': 3},
+    'scan': {'rate': '20/m', 'burst': 10},
+    'upload': {'rate': '30/m', 'burst': 10},
+    'download': {'rate': '60/m', 'burst': 30},
+    'api': {'rate': '300/m', 'burst': 100},
+}
+
+# Suggestion audit log (ai_suggestions/audit.py): rows are buffered per
+# process and written in batches of SUGGESTION_AUDIT_BATCH, or after
+# SUGGESTION_AUDIT_FLUSH_SECONDS. `manage.py compact_suggestions` deletes
+# rows older than SUGGESTION_RETENTION_DAYS.
+SUGGESTION_AUDIT_BATCH = int(os.environ.get('SUGGESTION_AUDIT_BATCH', 100))
+SUGGESTION_AUDIT_FLUSH_SECONDS = int(os.environ.get('SUGGESTION_AUDIT_FLUSH_SECONDS', 10))
+SUGGESTION_RETENTION_DAYS = int(os.environ.get('SUGGESTION_RETENTION_DAYS', 90))
+
+# Scans queued offline by the scan page are accepted for this many minutes
+# after their QR code expires (students/scans.py). Scan times come from the
+# phone, so this is also how long a QR token passed on after class can still
+# mark attendance: longer windows forgive longer outages but widen that gap.
+ATTENDANCE_SYNC_WINDOW = int(os.environ.get('ATTENDANCE_SYNC_WINDOW', 30))
+
+# Suggestions come from the local task catalogue (ai_suggestions/recommender.py);
+# with OPENAI_API_KEY set, the LLM then tailors them on the llm queue
+SUGGESTION_LLM_ENRICH = os.environ.get('SUGGESTION_LLM_ENRICH', 'True') == 'True'
+# Completed or dismissed tasks are not suggested again for this many days
+SUGGESTION_SEEN_DAYS = int(os.environ.get('SUGGESTION_SEEN_DAYS', 7))
+
 # Hugging Face API Key
 HUGGINGFACE_API_KEY = os.environ.get('HUGGINGFACE_API_KEY', 'your-api-key-here')
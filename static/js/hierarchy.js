@@ -0,0 +1,61 @@
+// Dependent Degree -> Branch -> Group dropdowns.
+// The whole hierarchy is fetched once (the browser revalidates it with its
+// ETag, so repeat visits get a 304) and filtered locally on every change.
+function bindHierarchySelects(options) {
+  const degreeSel = options.degree;
+  const branchSel = options.branch;
+  const groupSel = options.group;
+  const empty = options.emptyLabel || '--';
+  let hierarchy = null;
+
+  function refill(select, items, label, placeholder) {
+    if (!select) return;
+    const current = select.value;
+    select.innerHTML = '';
+    const blank = document.createElement('option');
+    blank.value = '';
+    blank.textContent = placeholder;
+    select.appendChild(blank);
+    items.forEach(function(item) {
+      const opt = document.createElement('option');
+      opt.value = item.id;
+      opt.textContent = label(item);
+      select.appendChild(opt);
+    });
+    if ([...select.options].some(o => o.value === current)) select.value = current;
+  }
+
+  function selected(select) {
+    return select && select.value ? parseInt(select.value, 10) : null;
+  }
+
+  function refillBranches() {
+    const degree = selected(degreeSel);
+    refill(branchSel, hierarchy.branches.filter(b => !degree || b.degree_id === degree),
+           b => b.name, options.branchLabel || empty);
+  }
+
+  function refillGroups() {
+    const degree = selected(degreeSel);
+    const branch = selected(branchSel);
+    refill(groupSel, hierarchy.groups.filter(g => (!degree || g.degree_id === degree) && (!branch || g.branch_id === branch)),
+           g => g.label || g.name, options.groupLabel || empty);
+  }
+
+  fetch(options.url, { credentials: 'same-origin', headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+    .then(r => r.json())
+    .then(data => {
+      hierarchy = data;
+      if (options.fillOnLoad) refillGroups();
+    })
+    .catch(err => console.error('Could not load the degree/branch/group hierarchy', err));
+
+  if (degreeSel) degreeSel.addEventListener('change', function() {
+    if (!hierarchy) return;
+    refillBranches();
+    refillGroups();
+  });
+  if (branchSel) branchSel.addEventListener('change', function() {
+    if (hierarchy) refillGroups();
+  });
+}
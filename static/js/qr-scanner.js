@@ -0,0 +1,111 @@
+/*
+ * Camera QR scanner that keeps the main thread idle.
+ *
+ *   const scanner = new QrScanner({video, workerUrl, decoderUrl, onDetect});
+ *   scanner.start(); scanner.stop();
+ *
+ * Frames are sampled at most `maxFps` times a second (fewer when decoding
+ * is slower), downscaled so the longer side is at most `maxSide` pixels,
+ * and decoded in a Web Worker (qr-worker.js), with at most one frame in
+ * flight. Sampling pauses while the tab is hidden. `onDetect` fires once
+ * per distinct payload, however long the camera stays on the code.
+ */
+class QrScanner {
+  constructor({ video, workerUrl, decoderUrl, onDetect, maxFps = 8, maxSide = 480 }) {
+    this.video = video;
+    this.workerUrl = workerUrl;
+    this.decoderUrl = decoderUrl;
+    this.onDetect = onDetect;
+    this.interval = 1000 / maxFps;
+    this.maxSide = maxSide;
+    this.running = false;
+    this.busy = false;
+    this.seen = new Set();
+    this.timer = null;
+    this.canvas = document.createElement('canvas');
+    this.context = this.canvas.getContext('2d', { willReadFrequently: true });
+    this.onVisibility = () => {
+      if (!document.hidden) this.schedule(0);
+    };
+  }
+
+  async start() {
+    const stream = await navigator.mediaDevices.getUserMedia({
+      video: { facingMode: 'environment', width: { ideal: 1280 }, height: { ideal: 720 } },
+    });
+    this.video.srcObject = stream;
+    this.video.setAttribute('playsinline', '');
+    await this.video.play();
+    if (!this.worker) {
+      this.worker = new Worker(this.workerUrl);
+      this.worker.onmessage = (event) => this.handle(event.data);
+      this.worker.postMessage({ type: 'init', decoderUrl: this.decoderUrl });
+    }
+    this.running = true;
+    document.addEventListener('visibilitychange', this.onVisibility);
+    this.schedule(0);
+  }
+
+  stop() {
+    this.running = false;
+    clearTimeout(this.timer);
+    document.removeEventListener('visibilitychange', this.onVisibility);
+    if (this.video.srcObject) {
+      this.video.srcObject.getTracks().forEach((track) => track.stop());
+      this.video.srcObject = null;
+    }
+  }
+
+  schedule(delay) {
+    clearTimeout(this.timer);
+    this.timer = setTimeout(() => this.sample(), delay);
+  }
+
+  async sample() {
+    if (!this.running || this.busy || document.hidden) return;
+    const video = this.video;
+    if (video.readyState < video.HAVE_CURRENT_DATA || !video.videoWidth) {
+      this.schedule(this.interval);
+      return;
+    }
+    const scale = Math.min(1, this.maxSide / Math.max(video.videoWidth, video.videoHeight));
+    const width = Math.round(video.videoWidth * scale);
+    const height = Math.round(video.videoHeight * scale);
+    this.busy = true;
+    this.sentAt = performance.now();
+    try {
+      let frame;
+      if (window.createImageBitmap) {
+        frame = await createImageBitmap(video, { resizeWidth: width, resizeHeight: height, resizeQuality: 'low' });
+      } else {
+        this.canvas.width = width;
+        this.canvas.height = height;
+        this.context.drawImage(video, 0, 0, width, height);
+        frame = this.context.getImageData(0, 0, width, height);
+      }
+      const transfer = frame instanceof ImageBitmap ? [frame] : [frame.data.buffer];
+      this.worker.postMessage({ type: 'frame', frame }, transfer);
+    } catch (err) {
+      this.busy = false;
+      this.schedule(this.interval);
+    }
+  }
+
+  handle(message) {
+    if (message.type === 'error') {
+      console.error('QR worker:', message.message);
+      return;
+    }
+    if (message.type !== 'result') return;
+    this.busy = false;
+    if (message.data && !this.seen.has(message.data)) {
+      this.seen.add(message.data);
+      this.onDetect(message.data);
+    }
+    if (this.running) {
+      // Never sample faster than decoding keeps up
+      const elapsed = performance.now() - this.sentAt;
+      this.schedule(Math.max(this.interval - elapsed, message.ms || 0));
+    }
+  }
+}
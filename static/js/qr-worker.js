@@ -0,0 +1,89 @@
+/*
+ * QR decoding off the main thread.
+ *
+ * Receives downscaled camera frames from qr-scanner.js, one at a time, and
+ * answers each with {type: 'result', data: <payload or null>}. Uses the
+ * native BarcodeDetector when the browser has it in workers; otherwise it
+ * loads the vendored ZXing library (URL given in the 'init' message) the
+ * first time it is needed.
+ */
+let detector = null;
+let decoderUrl = null;
+let reader = null;
+let canvas = null;
+let context = null;
+
+async function nativeDetector() {
+  if (!('BarcodeDetector' in self)) return null;
+  try {
+    const formats = await self.BarcodeDetector.getSupportedFormats();
+    return formats.includes('qr_code') ? new self.BarcodeDetector({ formats: ['qr_code'] }) : null;
+  } catch (err) {
+    return null;
+  }
+}
+
+function pixels(frame) {
+  // ImageBitmap -> RGBA pixels
+  if (!(frame instanceof ImageBitmap)) return frame;
+  if (!canvas || canvas.width !== frame.width || canvas.height !== frame.height) {
+    canvas = new OffscreenCanvas(frame.width, frame.height);
+    context = canvas.getContext('2d', { willReadFrequently: true });
+  }
+  context.drawImage(frame, 0, 0);
+  return context.getImageData(0, 0, frame.width, frame.height);
+}
+
+function luminance(image) {
+  // RGBA -> one grey byte per pixel, which ZXing takes as is
+  const grey = new Uint8ClampedArray(image.width * image.height);
+  const rgba = image.data;
+  for (let i = 0, j = 0; i < grey.length; i += 1, j += 4) {
+    grey[i] = (rgba[j] * 77 + rgba[j + 1] * 150 + rgba[j + 2] * 29) >> 8;
+  }
+  return new self.ZXing.RGBLuminanceSource(grey, image.width, image.height);
+}
+
+async function decode(frame) {
+  if (detector) {
+    const codes = await detector.detect(frame);
+    return codes.length ? codes[0].rawValue : null;
+  }
+  if (!reader) {
+    importScripts(decoderUrl);
+    reader = new self.ZXing.QRCodeReader();
+  }
+  const bitmap = new self.ZXing.BinaryBitmap(new self.ZXing.HybridBinarizer(luminance(pixels(frame))));
+  try {
+    return reader.decode(bitmap).getText();
+  } catch (err) {
+    // No code in this frame
+    if (err instanceof self.ZXing.NotFoundException || err instanceof self.ZXing.ChecksumException
+        || err instanceof self.ZXing.FormatException) return null;
+    throw err;
+  } finally {
+    reader.reset();
+  }
+}
+
+self.onmessage = async (event) => {
+  const message = event.data;
+  if (message.type === 'init') {
+    decoderUrl = message.decoderUrl;
+    detector = await nativeDetector();
+    self.postMessage({ type: 'ready', native: !!detector });
+    return;
+  }
+  if (message.type === 'frame') {
+    const started = performance.now();
+    let data = null;
+    try {
+      data = await decode(message.frame);
+    } catch (err) {
+      self.postMessage({ type: 'error', message: String(err) });
+    } finally {
+      if (message.frame.close) message.frame.close();
+    }
+    self.postMessage({ type: 'result', data, ms: performance.now() - started });
+  }
+};
@@ -0,0 +1,113 @@
+/*
+ * IndexedDB queue of attendance scans waiting to reach the server.
+ *
+ * Shared by the scan page and the service worker (students/sw.js). A scan
+ * is {id, token, scanned_at}: the signed token from the QR payload and the
+ * phone's time of the scan. flush() posts the queue in batches to
+ * students:sync_scans with the CSRF token it is given (the running page's)
+ * or, from the service worker, a fresh one fetched from the same URL. It
+ * drops every scan the server answered for, accepted or rejected; scans are
+ * kept when the request fails, for the next flush, unless the server refused
+ * the batch as malformed. A 403 ends the flush without a retry: the session
+ * is not a student's, and only a later flush from a student's page can help.
+ */
+const ScanQueue = (() => {
+  const DB_NAME = 'attendance';
+  const STORE = 'scans';
+  const SYNC_TAG = 'attendance-sync';
+  const BATCH = 50;
+
+  function open() {
+    return new Promise((resolve, reject) => {
+      const request = indexedDB.open(DB_NAME, 1);
+      request.onupgradeneeded = () => request.result.createObjectStore(STORE, { keyPath: 'id' });
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => reject(request.error);
+    });
+  }
+
+  async function run(mode, action) {
+    const db = await open();
+    return new Promise((resolve, reject) => {
+      const transaction = db.transaction(STORE, mode);
+      const request = action(transaction.objectStore(STORE));
+      transaction.oncomplete = () => {
+        db.close();
+        resolve(request ? request.result : undefined);
+      };
+      transaction.onerror = () => {
+        db.close();
+        reject(transaction.error);
+      };
+    });
+  }
+
+  function add(scan) {
+    return run('readwrite', (store) => store.put(scan));
+  }
+
+  function all() {
+    return run('readonly', (store) => store.getAll());
+  }
+
+  function remove(ids) {
+    return run('readwrite', (store) => {
+      ids.forEach((id) => store.delete(id));
+    });
+  }
+
+  async function freshToken(url) {
+    const response = await fetch(url, { credentials: 'same-origin' });
+    const type = response.headers.get('Content-Type') || '';
+    if (!response.ok || !type.startsWith('application/json')) {
+      throw new Error(`CSRF token request failed (${response.status})`);
+    }
+    return (await response.json()).csrf_token;
+  }
+
+  function send(url, csrf, batch) {
+    return fetch(url, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrf },
+      body: JSON.stringify({
+        sent_at: new Date().toISOString(),
+        scans: batch.map(({ id, token, scanned_at }) => ({ id, token, scanned_at })),
+      }),
+    });
+  }
+
+  async function flush(url, csrf) {
+    const scans = await all();
+    let results = [];
+    if (!scans.length) return results;
+    let current = csrf || await freshToken(url);
+    for (let i = 0; i < scans.length; i += BATCH) {
+      const batch = scans.slice(i, i + BATCH);
+      let response = await send(url, current, batch);
+      if (response.status === 403 && csrf) {
+        // The page's token was rotated by a login in another tab
+        csrf = null;
+        current = await freshToken(url);
+        response = await send(url, current, batch);
+      }
+      if (response.status === 403) break;
+      if (response.status === 400) {
+        // A batch the server cannot read will never succeed; drop it
+        await remove(batch.map((scan) => scan.id));
+        continue;
+      }
+      const type = response.headers.get('Content-Type') || '';
+      if (!response.ok || !type.startsWith('application/json')) {
+        // Offline, overloaded or logged out: keep the scans for the next try
+        throw new Error(`Scan sync failed (${response.status})`);
+      }
+      const data = await response.json();
+      await remove(data.results.map((result) => result.id));
+      results = results.concat(data.results);
+    }
+    return results;
+  }
+
+  return { SYNC_TAG, add, all, flush };
+})();
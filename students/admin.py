@@ -1,10 +1,27 @@
+from django import forms
 from django.contrib import admin
+
+from admins.hierarchy import get_validator
 from .models import Student
 
 
+class StudentAdminForm(forms.ModelForm):
+    class Meta:
+        model = Student
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        branch, degree, group = (cleaned_data.get(name) for name in ('branch', 'degree', 'group'))
+        # Raises ValidationError, shown as a form error
+        get_validator().validate(branch and branch.pk, degree and degree.pk, group and group.pk)
+        return cleaned_data
+
+
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
+    form = StudentAdminForm
     list_display = ('user', 'roll_number', 'attendance_percentage', 'created_at')
     list_filter = ('created_at', 'attendance_percentage')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'roll_number')
-    readonly_fields = ('created_at',)
\ No newline at end of file
+    readonly_fields = ('created_at',)
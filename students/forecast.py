@@ -0,0 +1,85 @@
+"""
+Attendance forecast for a student: per subject, how many of the remaining
+classes of the term they can miss and stay at or above the target, and
+where they end the term if they attend everything (best case) or none of
+it (worst case). Keeping the current rate would end the term at the
+current percentage, so that is not repeated as a projection.
+
+Inputs are the current term's AttendanceSummary rows (kept up to date by
+``recount_attendance`` after every scan) and the remaining timetable
+sessions counted per weekday, so the work is proportional to the number of
+subjects. The result is cached per student until the next recount, the
+next timetable change or the next hour.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.models import AttendanceSummary, Term
+from teachers import timetable
+from teachers.models import Subject
+
+TARGET = 75
+TTL = 24 * 3600
+
+
+def forecast_cache_key(student_id):
+    return f'forecast:{student_id}'
+
+
+def subject_forecast(attended, held, remaining, target=TARGET):
+    """The forecast for one subject (integer arithmetic, so 75% is exact)."""
+    total = held + remaining
+    # Largest m with (attended + remaining - m) / total >= target%
+    spare = (100 * (attended + remaining) - target * total) // 100 if total else remaining
+    return {
+        'attended': attended,
+        'held': held,
+        'remaining': remaining,
+        'current': round(attended / held * 100, 2) if held else None,
+        'best_case': round((attended + remaining) / total * 100, 2) if total else None,
+        'worst_case': round(attended / total * 100, 2) if total else None,
+        'can_miss': max(0, min(spare, remaining)),
+        # Classes they must attend to reach the target, or None when out of reach
+        'must_attend': max(0, remaining - spare) if spare >= 0 else None,
+    }
+
+
+def compute_forecast(student, now=None):
+    now = timezone.localtime(now) if now else timezone.localtime()
+    term = Term.current(now.date())
+    if term is None:
+        return {'term': None, 'subjects': []}
+    counts = {
+        row['subject_id']: (row['present'], row['total'])
+        for row in AttendanceSummary.objects.filter(student=student, term=term).values(
+            'subject_id', 'present', 'total')
+    }
+    remaining = timetable.remaining_sessions(student.group_id, term.end_date, now)
+    names = dict(Subject.objects.filter(id__in=set(counts) | set(remaining)).values_list('id', 'name'))
+    subjects = []
+    for subject_id in sorted(names, key=names.get):
+        attended, held = counts.get(subject_id, (0, 0))
+        subjects.append({
+            'subject': names[subject_id],
+            **subject_forecast(attended, held, remaining.get(subject_id, 0)),
+        })
+    return {
+        'term': term.name,
+        'term_end': term.end_date.isoformat(),
+        'target': TARGET,
+        'subjects': subjects,
+    }
+
+
+def get_forecast(student, now=None):
+    """The cached forecast, recomputed after a recount, a timetable change or each hour."""
+    now = timezone.localtime(now) if now else timezone.localtime()
+    # Sessions later today drop out of "remaining" hour by hour
+    stamp = [timetable.get_index().version, now.strftime('%Y-%m-%d %H')]
+    key = forecast_cache_key(student.id)
+    cached = cache.get(key)
+    if cached and cached['stamp'] == stamp:
+        return cached['forecast']
+    result = compute_forecast(student, now)
+    cache.set(key, {'stamp': stamp, 'forecast': result}, TTL)
+    return result
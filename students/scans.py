@@ -0,0 +1,122 @@
+"""
+Batched ingestion of QR scans captured offline.
+
+When the network drops during a scan burst, the scan page stores each scan
+(the QR's signed token and when it was scanned) in IndexedDB and a service
+worker posts the queue later, many scans per request. Each scan is checked
+against the QRCode it was signed for: the scan time must fall inside that
+QR's validity window and the upload must arrive within
+``ATTENDANCE_SYNC_WINDOW`` of the QR expiring. Scan times come from the
+phone's clock, so they are shifted by the difference between the phone's
+``sent_at`` and the server's clock before the check. Both times are the
+client's word: the server-side bounds are the sync window and
+``MAX_CLOCK_OFFSET``, so a token passed on after class is only good
+until the window closes.
+
+Accepted scans are upserted in one transaction with a single statement,
+then pushed to the teachers' live counters and recounted once.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import analytics
+from core.models import Attendance
+from core.utils import qr_id_from_token
+from teachers.live import record_scan
+from teachers.models import QRCode
+from .tasks import recount_attendance
+
+MAX_BATCH = 50
+# Phone clocks drift, and a scan right at expiry may be read a moment late
+CLOCK_SKEW = timedelta(minutes=2)
+# Larger differences between the phone's clock and ours are not drift
+MAX_CLOCK_OFFSET = timedelta(minutes=10)
+
+
+def sync_window():
+    return timedelta(minutes=getattr(settings, 'ATTENDANCE_SYNC_WINDOW', 30))
+
+
+def _parse_time(value):
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None or timezone.is_naive(parsed):
+        raise ValueError('scan time must be an ISO 8601 timestamp with an offset')
+    return parsed
+
+
+def _token_qr_id(scan):
+    try:
+        return qr_id_from_token(scan['token'])
+    except (signing.BadSignature, KeyError, TypeError):
+        return None
+
+
+def _check(scan, qr_id, qr_codes, offset, now):
+    """The QRCode a scan marks attendance for, or the reason it is rejected"""
+    try:
+        scanned_at = _parse_time(scan['scanned_at']) + offset
+    except (KeyError, ValueError):
+        qr_id = None
+    if qr_id is None:
+        return None, 'Invalid QR code data.'
+    if abs(offset) > MAX_CLOCK_OFFSET:
+        return None, "The phone's clock is too far off to date the scan."
+    qr_code = qr_codes.get(qr_id)
+    if qr_code is None or not qr_code.is_active:
+        return None, 'QR code expired or invalid.'
+    if not qr_code.created_at - CLOCK_SKEW <= scanned_at <= qr_code.expires_at + CLOCK_SKEW:
+        return None, 'Scanned outside the QR code validity window.'
+    if now > qr_code.expires_at + sync_window():
+        return None, 'Synced too late for this QR code.'
+    return qr_code, None
+
+
+def ingest_scans(student, scans, sent_at, now=None):
+    """
+    Validate and store a batch of offline scans for ``student``.
+
+    ``scans`` is a list of ``{'id', 'token', 'scanned_at'}`` dicts and
+    ``sent_at`` the phone's clock when it posted them. Returns one result
+    per scan, ``{'id', 'success', 'message'}``, in the same order.
+    """
+    if len(scans) > MAX_BATCH:
+        raise ValueError(f'at most {MAX_BATCH} scans per batch')
+    now = now or timezone.now()
+    offset = now - _parse_time(sent_at)
+    qr_ids = [_token_qr_id(scan) for scan in scans]
+    qr_codes = QRCode.objects.in_bulk({qr_id for qr_id in qr_ids if qr_id is not None})
+
+    results = []
+    rows = {}
+    marked = {}
+    for scan, qr_id in zip(scans, qr_ids):
+        qr_code, error = _check(scan, qr_id, qr_codes, offset, now)
+        results.append({'id': scan.get('id'), 'success': error is None,
+                        'message': error or 'Attendance marked successfully!'})
+        if qr_code is None:
+            continue
+        # The class day is the QR's (as scan_qr dates it), whatever the phone's clock said
+        day = qr_code.created_at.date()
+        rows[qr_code.subject_id, day] = Attendance(student=student, subject_id=qr_code.subject_id,
+                                                   date=day, is_present=True)
+        marked[qr_code.id] = qr_code
+
+    if rows:
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                list(rows.values()),
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'date'],
+                update_fields=['is_present'],
+            )
+        # bulk_create sends no post_save
+        analytics.invalidate()
+        for qr_code in marked.values():
+            record_scan(qr_code, student)
+        recount_attendance.delay(student.id, dedup_key=f'recount:{student.id}')
+    return results
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from core import roles
+from core.models import Attendance, AttendanceSummary, Term
+from core.tasks import task
+from core.utils import calculate_attendance_percentage
+from .forecast import forecast_cache_key
+from .models import Student
+
+
+@task()
+def recount_attendance(student_id):
+    """Recompute a student's stored overall attendance percentage and current-term summary"""
+    student = Student.objects.filter(id=student_id).first()
+    if student is None:
+        return
+    Student.objects.filter(id=student_id).update(
+        attendance_percentage=calculate_attendance_percentage(student)
+    )
+    term = Term.current()
+    if term is not None:
+        counts = Attendance.objects.filter(
+            student=student, date__range=(term.start_date, term.end_date)
+        ).values('subject_id').annotate(total=Count('id'), present=Count('id', filter=Q(is_present=True))).order_by()
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(term=term, student=student, subject_id=row['subject_id'],
+                               total=row['total'], present=row['present']) for row in counts],
+            update_conflicts=True,
+            unique_fields=['term', 'student', 'subject'],
+            update_fields=['total', 'present'],
+        )
+    cache.delete(forecast_cache_key(student_id))
+    # The cached profile carries attendance_percentage, and update() sends no post_save
+    roles.invalidate(student.user_id)
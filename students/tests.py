@@ -1,3 +1,207 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attendance, Material, Term
+from teachers import timetable
+from teachers.models import Teacher, Subject, Timetable, QRCode
+from .forecast import get_forecast, subject_forecast
+from .models import Student
+from .scans import MAX_BATCH, ingest_scans
+from .tasks import recount_attendance
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class AsyncStudentViewsTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        teacher = Teacher.objects.create(user=User.objects.create(username='teacher'), employee_id='T001', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        self.material = Material.objects.create(
+            title='Notes', subject=subject, uploaded_by=teacher,
+            file=SimpleUploadedFile('notes.txt', b'x' * 200000),
+        )
+        user = User.objects.create_user(username='student', password='testpass123')
+        Student.objects.create(user=user, roll_number='S001')
+        self.client = Client()
+        self.client.login(username='student', password='testpass123')
+
+    def test_download_streams_file(self):
+        """Test materials are streamed as attachments"""
+        response = self.client.get(reverse('students:download_material', args=[self.material.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="notes', response['Content-Disposition'])
+        self.assertEqual(b''.join(response.streaming_content), b'x' * 200000)
+        response.close()
+
+    async def test_download_under_asgi(self):
+        """Test the async download path reads the file in chunks"""
+        await self.async_client.alogin(username='student', password='testpass123')
+        response = await self.async_client.get(reverse('students:download_material', args=[self.material.id]))
+        self.assertEqual(response['Content-Length'], '200000')
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content), 200000)
+
+    def test_json_endpoints_require_student(self):
+        """Test the async JSON endpoints reject non-students"""
+        teacher_client = Client()
+        teacher_client.force_login(User.objects.get(username='teacher'))
+        self.assertEqual(teacher_client.get(reverse('students:next_free_period')).status_code, 403)
+        self.assertIn('next_free_period', self.client.get(reverse('students:next_free_period')).json())
+
+    def test_scan_page_decodes_in_worker(self):
+        """Test the scan page loads the worker-based scanner and a self-hosted decoder, nothing from a CDN"""
+        response = self.client.get(reverse('students:scan_qr'))
+        self.assertContains(response, 'js/qr-scanner.js')
+        self.assertContains(response, 'js/qr-worker.js')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, 'vendor/zxing-library/zxing.min.js')
+        self.assertNotContains(response, 'cdn.jsdelivr.net')
+
+
+class AttendanceForecastTestCase(TestCase):
+    def test_subject_forecast(self):
+        """Test the can-miss and must-attend counts around the 75% target"""
+        self.assertEqual(subject_forecast(6, 8, 4)['can_miss'], 1)  # 9 of 12 is exactly 75%
+        self.assertEqual(subject_forecast(6, 8, 4)['must_attend'], 3)
+        self.assertEqual(subject_forecast(2, 8, 2)['must_attend'], None)
+        self.assertEqual(subject_forecast(2, 8, 2)['best_case'], 40.0)
+        self.assertEqual(subject_forecast(2, 8, 2)['worst_case'], 20.0)
+        self.assertEqual(subject_forecast(0, 0, 4)['can_miss'], 1)
+
+    def test_forecast_from_summary_and_timetable(self):
+        """Test the forecast uses the current term's summary and the sessions left in the term"""
+        teacher = Teacher.objects.create(user=User.objects.create(username='t'), employee_id='T1', department='CS')
+        subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        Timetable.objects.create(day='Monday', time_slot='09:00', subject=subject, room_number='R1')
+        timetable.invalidate()
+        user = User.objects.create_user(username='student', password='testpass123')
+        student = Student.objects.create(user=user, roll_number='S1')
+        monday = date(2026, 1, 5)
+        Term.objects.create(name='Spring', start_date=monday - timedelta(days=28), end_date=monday + timedelta(days=14))
+        for weeks, present in ((4, True), (3, True), (2, True), (1, False)):
+            Attendance.objects.create(student=student, subject=subject, is_present=present,
+                                      date=monday - timedelta(weeks=weeks))
+        now = timezone.make_aware(datetime(2026, 1, 5, 7, 0))
+
+        with mock.patch('django.utils.timezone.localdate', return_value=monday):
+            recount_attendance(student.id)
+        forecast = get_forecast(student, now)
+        # 3 of 4 so far; this morning and the next two Mondays are left
+        self.assertEqual(forecast['subjects'], [{
+            'subject': 'Physics', 'attended': 3, 'held': 4, 'remaining': 3, 'current': 75.0,
+            'best_case': 85.71, 'worst_case': 42.86, 'can_miss': 0, 'must_attend': 3,
+        }])
+
+        client = Client()
+        client.login(username='student', password='testpass123')
+        response = client.get(reverse('students:attendance_forecast'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('subjects', response.json())
+
+
+class OfflineScanSyncTestCase(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username='teacher', password='testpass123')
+        teacher = Teacher.objects.create(user=teacher_user, employee_id='T001', department='CS')
+        self.subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        teacher_client = Client()
+        teacher_client.force_login(teacher_user)
+        teacher_client.post(reverse('teachers:generate_qr', args=[self.subject.id]))
+        self.qr_code = QRCode.objects.get()
+        self.token = json.loads(self.qr_code.qr_data)['token']
+        user = User.objects.create_user(username='student', password='testpass123')
+        self.student = Student.objects.create(user=user, roll_number='S001')
+        self.client = Client()
+        self.client.login(username='student', password='testpass123')
+
+    def sync(self, scans, sent_at=None):
+        body = {'scans': scans, 'sent_at': (sent_at or timezone.now()).isoformat()}
+        return self.client.post(reverse('students:sync_scans'), json.dumps(body), content_type='application/json')
+
+    def test_batch_marks_attendance(self):
+        """Test queued scans with a signed token are stored and answered per scan"""
+        scanned_at = (self.qr_code.created_at + timedelta(minutes=1)).isoformat()
+        response = self.sync([
+            {'id': 'a', 'token': self.token, 'scanned_at': scanned_at},
+            {'id': 'b', 'token': self.token, 'scanned_at': scanned_at},
+            {'id': 'c', 'token': self.token + 'x', 'scanned_at': scanned_at},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['success'] for r in response.json()['results']], [True, True, False])
+        attendance = Attendance.objects.get()
+        self.assertEqual((attendance.student, attendance.subject, attendance.is_present),
+                         (self.student, self.subject, True))
+        self.assertEqual(attendance.date, self.qr_code.created_at.date())
+
+    def test_time_window(self):
+        """Test scans outside the QR validity window, or synced too late, are rejected"""
+        late = (self.qr_code.expires_at + timedelta(minutes=10)).isoformat()
+        result, = self.sync([{'id': 'a', 'token': self.token, 'scanned_at': late}]).json()['results']
+        self.assertFalse(result['success'])
+        on_time = [{'id': 'a', 'token': self.token, 'scanned_at': self.qr_code.created_at.isoformat()}]
+        days_later = self.qr_code.expires_at + timedelta(days=2)
+        result, = ingest_scans(self.student, on_time, days_later.isoformat(), now=days_later)
+        self.assertEqual(result['message'], 'Synced too late for this QR code.')
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_phone_clock_offset(self):
+        """Test scan times are corrected by the phone's clock offset, up to a bound"""
+        for behind, accepted in ((timedelta(minutes=5), True), (timedelta(hours=1), False)):
+            scanned_at = (self.qr_code.created_at + timedelta(minutes=1) - behind).isoformat()
+            response = self.sync([{'id': 'a', 'token': self.token, 'scanned_at': scanned_at}],
+                                 sent_at=timezone.now() - behind)
+            self.assertEqual(response.json()['results'][0]['success'], accepted)
+
+    def test_sync_window_default(self):
+        """Test the default sync window closes within the hour after the QR expires"""
+        on_time = [{'id': 'a', 'token': self.token, 'scanned_at': self.qr_code.created_at.isoformat()}]
+        hour_later = self.qr_code.expires_at + timedelta(hours=1)
+        result, = ingest_scans(self.student, on_time, hour_later.isoformat(), now=hour_later)
+        self.assertEqual(result['message'], 'Synced too late for this QR code.')
+
+    def test_rejects_bad_requests(self):
+        """Test malformed or oversized batches and non-students are refused"""
+        self.assertEqual(self.client.post(reverse('students:sync_scans'), 'nope',
+                                          content_type='application/json').status_code, 400)
+        scan = {'id': 'a', 'token': self.token, 'scanned_at': timezone.now().isoformat()}
+        self.assertEqual(self.sync([scan] * (MAX_BATCH + 1)).status_code, 400)
+        teacher_client = Client()
+        teacher_client.force_login(User.objects.get(username='teacher'))
+        response = teacher_client.post(reverse('students:sync_scans'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_fresh_csrf_token(self):
+        """Test the service worker can flush with a token fetched from the sync URL"""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.student.user)
+        token = client.get(reverse('students:sync_scans')).json()['csrf_token']
+        scanned_at = (self.qr_code.created_at + timedelta(minutes=1)).isoformat()
+        body = {'scans': [{'id': 'a', 'token': self.token, 'scanned_at': scanned_at}],
+                'sent_at': timezone.now().isoformat()}
+        response = client.post(reverse('students:sync_scans'), json.dumps(body),
+                               content_type='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Attendance.objects.exists())
+
+    def test_service_worker(self):
+        """Test the service worker is served as JavaScript under /students/"""
+        response = self.client.get(reverse('students:service_worker'))
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertContains(response, 'js/scan-queue.js')
+        self.assertContains(response, reverse('students:sync_scans'))
@@ -5,7 +5,12 @@ app_name = 'students'
 
 urlpatterns = [
     path('dashboard/', views.student_dashboard, name='dashboard'),
+    path('recommendation/', views.recommendation, name='recommendation'),
+    path('forecast/', views.attendance_forecast, name='attendance_forecast'),
+    path('next-free-period/', views.next_free_period, name='next_free_period'),
     path('scan-qr/', views.scan_qr, name='scan_qr'),
+    path('scan-qr/sync/', views.sync_scans, name='sync_scans'),
+    path('sw.js', views.service_worker, name='service_worker'),
     path('materials/', views.materials_list, name='materials_list'),
     path('download/<int:material_id>/', views.download_material, name='download_material'),
 ]
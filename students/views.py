@@ -1,32 +1,48 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.contrib import messages
 from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
+from django.views.decorators.http import require_http_methods, require_POST
 from django.utils import timezone
 from django.db import models
 import json
 
+from core.aio import file_download
 from core.models import Attendance, Material, Announcement
-from core.utils import get_student_recommendation, calculate_attendance_percentage
+from core.ratelimit import rate_limit
+from core.roles import STUDENT, role_required
+from core.utils import (
+    ai_recommendation, recommendation_prompt, subject_attendance_percentages, term_attendance_history,
+)
 from teachers.models import Subject
+from teachers.live import record_scan
+from teachers import timetable
+from .forecast import get_forecast
+from .scans import ingest_scans
+from .tasks import recount_attendance
 
 
 @login_required
+@role_required(STUDENT)
 def student_dashboard(request):
-    student = request.user.student
+    student = request.profile
     
     # Get attendance data
     attendance_data = []
+    percentages = subject_attendance_percentages(student)
     subjects = Subject.objects.all()
     for subject in subjects:
-        percentage = calculate_attendance_percentage(student, subject)
         attendance_data.append({
             'subject': subject.name,
-            'percentage': percentage
+            'percentage': percentages.get(subject.id, 0.0)
         })
     
-    # Get AI recommendation
-    ai_recommendation = get_student_recommendation(student)
+    # Today's classes for the student's group from the timetable index
+    todays_schedule = timetable.sessions_for_day(student.group_id, timezone.localtime().strftime('%A'))
+    
+    next_free = timetable.next_free_period(student.group_id)
     
     # Get materials
     materials = Material.objects.all().order_by('-upload_date')[:5]
@@ -41,7 +57,9 @@ def student_dashboard(request):
     context = {
         'student': student,
         'attendance_data': attendance_data,
-        'ai_recommendation': ai_recommendation,
+        'term_history': term_attendance_history(student),
+        'todays_schedule': todays_schedule,
+        'next_free': next_free,
         'materials': materials,
         'announcements': announcements,
     }
@@ -49,11 +67,47 @@ def student_dashboard(request):
 
 
 @login_required
+@role_required(STUDENT, api=True)
+async def recommendation(request):
+    """AI recommendation for the student, loaded by the dashboard after render"""
+    student = request.profile
+    prompt = await sync_to_async(recommendation_prompt)(student)
+    # The Hugging Face call can take seconds; run it outside the event loop
+    text = await sync_to_async(ai_recommendation, thread_sensitive=False)(prompt)
+    return JsonResponse({'recommendation': text})
+
+
+@login_required
+@role_required(STUDENT, api=True)
+async def next_free_period(request):
+    """When the student's group is next free, from the per-day free-slot index"""
+    student = request.profile
+    period = await sync_to_async(timetable.next_free_period)(student.group_id)
+    if period is None:
+        return JsonResponse({'next_free_period': None})
+    return JsonResponse({
+        'next_free_period': {
+            'day': period['day'],
+            'start': period['start'].isoformat(),
+            'end': period['end'].isoformat(),
+            'is_now': period['is_now'],
+            'starts_in_minutes': max(0, int((period['start'] - timezone.localtime()).total_seconds() // 60)),
+        }
+    })
+
+
+@login_required
+@role_required(STUDENT, api=True)
+async def attendance_forecast(request):
+    """Per-subject classes the student can still miss and term-end projections"""
+    return JsonResponse(await sync_to_async(get_forecast)(request.profile))
+
+
+@login_required
+@role_required(STUDENT)
+@rate_limit('scan', methods=('POST',))
 def scan_qr(request):
-    if not hasattr(request.user, 'student'):
-        messages.error(request, 'Access denied.')
-        return redirect('students:dashboard')
-    
+    student = request.profile
     if request.method == 'POST':
         qr_data = request.POST.get('qr_data')
         try:
@@ -67,14 +121,14 @@ def scan_qr(request):
                 teacher_id=data['teacher_id'],
                 is_active=True,
                 expires_at__gt=timezone.now()
-            ).first()
+            ).order_by('-created_at').first()
             
             if not qr_code:
                 return JsonResponse({'success': False, 'message': 'QR code expired or invalid.'})
             
             # Mark attendance
             attendance, created = Attendance.objects.get_or_create(
-                student=request.user.student,
+                student=student,
                 subject=subject,
                 date=timezone.now().date(),
                 defaults={'is_present': True}
@@ -83,10 +137,12 @@ def scan_qr(request):
             if not created:
                 attendance.is_present = True
                 attendance.save()
+
+            # Push the scan to the teacher's live counter
+            record_scan(qr_code, student)
             
-            # Update student's overall attendance percentage
-            request.user.student.attendance_percentage = calculate_attendance_percentage(request.user.student)
-            request.user.student.save()
+            # Update student's overall attendance percentage in the background
+            recount_attendance.delay(student.id, dedup_key=f'recount:{student.id}')
             
             return JsonResponse({'success': True, 'message': 'Attendance marked successfully!'})
             
@@ -96,6 +152,34 @@ def scan_qr(request):
     return render(request, 'students/scan_qr.html')
 
 
+@login_required
+@role_required(STUDENT, api=True)
+@rate_limit('scan')
+@require_http_methods(['GET', 'POST'])
+def sync_scans(request):
+    """
+    Batch of scans the scan page queued while offline (see students/scans.py).
+    A GET answers a current CSRF token for the service worker, which has no page.
+    """
+    if request.method == 'GET':
+        return JsonResponse({'csrf_token': get_token(request)})
+    try:
+        body = json.loads(request.body)
+        scans = body['scans']
+        if not isinstance(scans, list) or not all(isinstance(scan, dict) for scan in scans):
+            raise ValueError('scans must be a list of objects')
+        results = ingest_scans(request.profile, scans, body['sent_at'])
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'results': results})
+
+
+@never_cache
+def service_worker(request):
+    """The scan-queue service worker, served under /students/ so that is its scope"""
+    return render(request, 'students/sw.js', content_type='application/javascript')
+
+
 @login_required
 def materials_list(request):
     materials = Material.objects.all().order_by('-upload_date')
@@ -103,9 +187,7 @@ def materials_list(request):
 
 
 @login_required
-def download_material(request, material_id):
-    from django.http import HttpResponse
-    material = get_object_or_404(Material, id=material_id)
-    response = HttpResponse(material.file.read(), content_type='application/octet-stream')
-    response['Content-Disposition'] = f'attachment; filename="{material.file.name}"'
-    return response
\ No newline at end of file
+@rate_limit('download')
+async def download_material(request, material_id):
+    material = await aget_object_or_404(Material, id=material_id)
+    return file_download(request, material.file)
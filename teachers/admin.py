@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Teacher, Subject, Timetable, QRCode
+from .models import Teacher, Subject, Timetable, TeacherUnavailability, QRCode
 
 
 @admin.register(Teacher)
@@ -19,9 +19,15 @@ class SubjectAdmin(admin.ModelAdmin):
 
 @admin.register(Timetable)
 class TimetableAdmin(admin.ModelAdmin):
-    list_display = ('day', 'time_slot', 'subject', 'room_number')
-    list_filter = ('day', 'subject')
-    search_fields = ('subject__name', 'room_number')
+    list_display = ('group', 'day', 'time_slot', 'subject', 'room_number')
+    list_filter = ('day', 'group', 'subject')
+    search_fields = ('subject__name', 'room_number', 'group__name')
+
+
+@admin.register(TeacherUnavailability)
+class TeacherUnavailabilityAdmin(admin.ModelAdmin):
+    list_display = ('teacher', 'day', 'time_slot')
+    list_filter = ('day', 'teacher')
 
 
 @admin.register(QRCode)
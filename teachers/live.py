@@ -0,0 +1,140 @@
+"""
+Live attendance counters for QR sessions.
+
+The scan path publishes every marked student on the session's topic; the
+teacher's QR display subscribes to it. Roster and initial scans are loaded once
+per session, after which all counting happens in memory.
+"""
+import threading
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.models import Attendance
+from core.pubsub import broker
+
+# How long a finished session stays in memory for late subscribers
+SESSION_GRACE = timedelta(minutes=5)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def topic_for(qr_id):
+    return f"qr:{qr_id}"
+
+
+class LiveSession:
+    def __init__(self, qr_code):
+        self.qr_id = qr_code.id
+        self.subject_id = qr_code.subject_id
+        self.teacher_id = qr_code.teacher_id
+        self.group_id = qr_code.group_id
+        self.created_at = qr_code.created_at
+        self.expires_at = qr_code.expires_at
+        self.roster = {}
+        self.marked = set()
+        self.ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def topic(self):
+        return topic_for(self.qr_id)
+
+    def is_expired(self, now=None):
+        return (now or timezone.now()) >= self.expires_at
+
+    def load(self):
+        """Load the class roster and anything already scanned."""
+        from admins.models import GroupSubjectAssignment
+        from students.models import Student
+
+        if self.group_id:
+            # QR generated during a timetable session: only that group is expected
+            group_ids = [self.group_id]
+        else:
+            group_ids = list(
+                GroupSubjectAssignment.objects.filter(
+                    subject_id=self.subject_id, teacher_id=self.teacher_id
+                ).values_list('group_id', flat=True)
+            )
+        students = Student.objects.select_related('user')
+        if group_ids:
+            students = students.filter(group_id__in=group_ids)
+        roster = {
+            s.id: {
+                'id': s.id,
+                'name': s.user.get_full_name() or s.user.username,
+                'roll_number': s.roll_number,
+            }
+            for s in students
+        }
+        already = Attendance.objects.filter(
+            student_id__in=list(roster),
+            subject_id=self.subject_id,
+            date__in={self.created_at.date(), self.expires_at.date()},
+            is_present=True,
+        ).values_list('student_id', flat=True)
+        with self._lock:
+            self.roster = roster
+            self.marked.update(already)
+        self.ready.set()
+
+    def mark(self, student_id):
+        with self._lock:
+            self.marked.add(student_id)
+
+    def snapshot(self):
+        with self._lock:
+            # Scans from outside the roster do not count towards it
+            marked = self.marked.intersection(self.roster)
+            roster = list(self.roster.values())
+        pending = sorted((s for s in roster if s['id'] not in marked), key=lambda s: s['roll_number'])
+        return {
+            'qr_id': self.qr_id,
+            'version': broker.version(self.topic),
+            'scanned': len(marked),
+            'total': len(roster),
+            'pending': pending,
+            'expires_at': self.expires_at.isoformat(),
+            'expired': self.is_expired(),
+        }
+
+
+def _prune(now):
+    stale = [qr_id for qr_id, s in _sessions.items() if s.expires_at + SESSION_GRACE < now]
+    for qr_id in stale:
+        _sessions.pop(qr_id, None)
+        broker.discard(topic_for(qr_id))
+
+
+def get_session(qr_code):
+    """Return the live session for ``qr_code``, loading it on first use."""
+    with _sessions_lock:
+        _prune(timezone.now())
+        session = _sessions.get(qr_code.id)
+        loaded_elsewhere = session is not None
+        if session is None:
+            # Register before loading so scans arriving meanwhile are not lost
+            session = LiveSession(qr_code)
+            _sessions[qr_code.id] = session
+    if loaded_elsewhere:
+        session.ready.wait(timeout=5)
+        return session
+    try:
+        session.load()
+    except Exception:
+        with _sessions_lock:
+            _sessions.pop(qr_code.id, None)
+        raise
+    return session
+
+
+def record_scan(qr_code, student):
+    """Called from the scan path once attendance has been stored."""
+    session = _sessions.get(qr_code.id)
+    # Nobody is watching a QR without a session, and its topic would never be pruned
+    if session is None:
+        return
+    session.mark(student.id)
+    broker.publish(topic_for(qr_code.id), {'student_id': student.id})
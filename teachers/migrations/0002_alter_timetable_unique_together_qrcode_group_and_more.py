@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admins', '0004_branch_degree'),
+        ('teachers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='timetable',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='qrcode',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='admins.group'),
+        ),
+        migrations.AddField(
+            model_name='timetable',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='timetable_entries', to='admins.group'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetable',
+            unique_together={('group', 'day', 'time_slot')},
+        ),
+    ]
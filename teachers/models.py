@@ -43,21 +43,41 @@ class Timetable(models.Model):
         ('16:00', '04:00 PM'),
     ]
     
+    # Entries without a group are shared by every group (e.g. assemblies)
+    group = models.ForeignKey('admins.Group', on_delete=models.CASCADE, related_name='timetable_entries', null=True, blank=True)
     day = models.CharField(max_length=10, choices=DAY_CHOICES)
     time_slot = models.CharField(max_length=5, choices=TIME_CHOICES)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     room_number = models.CharField(max_length=20)
     
     class Meta:
-        unique_together = ['day', 'time_slot']
+        unique_together = ['group', 'day', 'time_slot']
     
     def __str__(self):
+        if self.group_id:
+            return f"{self.group.name}: {self.day} {self.time_slot} - {self.subject.name}"
         return f"{self.day} {self.time_slot} - {self.subject.name}"
 
 
+class TeacherUnavailability(models.Model):
+    """A weekly slot in which the teacher cannot be timetabled"""
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='unavailable_slots')
+    day = models.CharField(max_length=10, choices=Timetable.DAY_CHOICES)
+    time_slot = models.CharField(max_length=5, choices=Timetable.TIME_CHOICES)
+
+    class Meta:
+        unique_together = ['teacher', 'day', 'time_slot']
+        verbose_name_plural = 'Teacher unavailabilities'
+
+    def __str__(self):
+        return f"{self.teacher.user.get_full_name()} unavailable {self.day} {self.time_slot}"
+
+
 class QRCode(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE)
+    # Group of the timetable session the QR was generated in, if any
+    group = models.ForeignKey('admins.Group', on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
@@ -0,0 +1,144 @@
+"""
+Roll calls taken offline and uploaded later.
+
+Rooms without connectivity take the roll on a device; the teacher uploads
+the records afterwards to ``teachers:sync_attendance`` for one
+GroupSubjectAssignment, as JSON (``{"records": [{"roll_number", "date",
+"present"}, ...]}``) or as a CSV with those three columns.
+
+However many records there are, the work is a fixed number of queries:
+one lookup of all roll numbers, one of the rows that already exist (to
+report created vs updated) and a batched upsert, all in one transaction.
+Rows that cannot be stored are reported back by position with a short
+error code; the rest are stored.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import analytics
+from core.models import Attendance, Term
+from students.models import Student
+from students.tasks import recount_attendance
+
+MAX_RECORDS = 10000
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'p', 'present'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'a', 'absent'}
+
+
+def parse_records(body, content_type):
+    """Records from a JSON or CSV upload; raises ValueError when unreadable."""
+    text = body.decode('utf-8-sig')
+    if content_type.startswith('text/csv'):
+        reader = csv.DictReader(io.StringIO(text))
+        records = []
+        for row in reader:
+            if None in row:
+                raise ValueError(f'line {reader.line_num} has more fields than the header')
+            records.append({(key or '').strip().lower(): (value or '').strip() for key, value in row.items()})
+    else:
+        data = json.loads(text)
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ValueError('records must be a list of objects')
+    if len(records) > MAX_RECORDS:
+        raise ValueError(f'at most {MAX_RECORDS} records per upload')
+    return records
+
+
+def _present(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(value)
+
+
+def _archived(day, terms):
+    return any(term.start_date <= day <= term.end_date for term in terms)
+
+
+def sync_roll_call(assignment, records):
+    """
+    Upsert ``records`` as attendance for ``assignment``'s subject.
+
+    Returns ``{'received', 'created', 'updated', 'rejected', 'errors'}``
+    where ``errors`` lists ``{'row', 'roll_number', 'error'}`` (``row``
+    counts from 0) for every record that was not stored.
+    """
+    today = timezone.now().date()
+    archived_terms = list(Term.objects.filter(archived_at__isnull=False))
+    rolls = {str(r.get('roll_number') or '').strip() for r in records} - {''}
+    students = Student.objects.only('id', 'group_id').in_bulk(rolls, field_name='roll_number')
+
+    errors = []
+    rows = {}
+    for index, record in enumerate(records):
+        roll = str(record.get('roll_number') or '').strip()
+        student = students.get(roll)
+        try:
+            day = date.fromisoformat(str(record.get('date') or '').strip())
+        except ValueError:
+            day = None
+        error = None
+        if student is None:
+            error = 'unknown_roll'
+        elif student.group_id != assignment.group_id:
+            error = 'not_in_group'
+        elif day is None:
+            error = 'invalid_date'
+        elif day > today:
+            error = 'future_date'
+        elif _archived(day, archived_terms):
+            error = 'archived_term'
+        else:
+            try:
+                present = _present(record.get('present'))
+            except ValueError:
+                error = 'invalid_present'
+        if error:
+            errors.append({'row': index, 'roll_number': roll, 'error': error})
+            continue
+        key = (student.id, day)
+        if key in rows:
+            # The later record for the same student and day wins
+            errors.append({'row': rows[key][0], 'roll_number': roll, 'error': 'duplicate'})
+        rows[key] = (index, Attendance(student_id=student.id, subject_id=assignment.subject_id,
+                                       date=day, is_present=present))
+
+    created = updated = 0
+    if rows:
+        with transaction.atomic():
+            existing = set(Attendance.objects.filter(
+                subject_id=assignment.subject_id,
+                student_id__in={student_id for student_id, _ in rows},
+                date__in={day for _, day in rows},
+            ).values_list('student_id', 'date'))
+            Attendance.objects.bulk_create(
+                [attendance for _, attendance in rows.values()],
+                update_conflicts=True,
+                unique_fields=['student', 'subject', 'date'],
+                update_fields=['is_present'],
+                batch_size=500,
+            )
+        updated = len(existing & rows.keys())
+        created = len(rows) - updated
+        analytics.invalidate()
+        for student_id in {student_id for student_id, _ in rows}:
+            recount_attendance.delay(student_id, dedup_key=f'recount:{student_id}')
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'received': len(records),
+        'created': created,
+        'updated': updated,
+        'rejected': len(errors),
+        'errors': errors,
+    }
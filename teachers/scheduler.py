@@ -0,0 +1,362 @@
+"""
+Conflict-free timetable generation.
+
+The solver works on plain data so it can be benchmarked without a database:
+a lesson is one weekly hour of a group-subject assignment, a slot is a
+(day, time_slot) pair from ``Timetable`` and a room is a (name, capacity) pair.
+
+Hard constraints: no teacher, group or room is double-booked, the room seats
+the whole group and the teacher is available. Soft preferences spread a
+group's hours of the same subject over different days.
+
+Search is an iterative forward search: lessons are taken most-constrained
+first and put into the slot with the fewest conflicts. When every slot
+conflicts, the clashing lessons are evicted and re-queued; lessons that keep
+getting evicted become more expensive to evict again, which stops the search
+from cycling. It stops when everything is placed or the time budget runs out.
+"""
+import random
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict, deque, namedtuple
+
+from django.db import transaction
+from django.db.models import Count
+
+Lesson = namedtuple('Lesson', ['assignment_id', 'group_id', 'subject_id', 'teacher_id', 'size'])
+Room = namedtuple('Room', ['name', 'capacity'])
+
+# Marks a slot taken by an entry outside the problem; it can never be evicted
+FIXED = -1
+
+
+class ScheduleResult:
+    def __init__(self, slots, rooms, lessons, placements, unplaced, iterations, seconds):
+        self.slots = slots
+        self.rooms = rooms
+        self.lessons = lessons
+        # lesson index -> (slot index, room index)
+        self.placements = placements
+        self.unplaced = unplaced
+        self.iterations = iterations
+        self.seconds = seconds
+
+    @property
+    def complete(self):
+        return not self.unplaced
+
+    def entries(self):
+        """Yield (lesson, day, time_slot, room_name) for every placed lesson."""
+        for i, (s, r) in sorted(self.placements.items()):
+            day, time_slot = self.slots[s]
+            yield self.lessons[i], day, time_slot, self.rooms[r].name
+
+    def violations(self):
+        """Hard-constraint violations in the placements (empty when valid)."""
+        seen = {}
+        problems = []
+        for i, (s, r) in self.placements.items():
+            lesson = self.lessons[i]
+            if lesson.size > self.rooms[r].capacity:
+                problems.append(f"lesson {i} does not fit room {self.rooms[r].name}")
+            for key in (('teacher', lesson.teacher_id, s), ('group', lesson.group_id, s), ('room', r, s)):
+                if key in seen:
+                    problems.append(f"{key[0]} {key[1]} double-booked in slot {self.slots[s]}")
+                seen[key] = i
+        return problems
+
+    def summary(self):
+        return {
+            'lessons': len(self.lessons),
+            'placed': len(self.placements),
+            'unplaced': len(self.unplaced),
+            'iterations': self.iterations,
+            'seconds': round(self.seconds, 3),
+        }
+
+
+class TimetableSolver:
+    def __init__(self, lessons, slots, rooms, unavailable=None, fixed=None, blocked_slots=(), seed=0):
+        """
+        ``unavailable`` maps teacher_id -> slot indexes the teacher cannot take.
+        ``fixed`` is an iterable of (teacher_id, slot index, room name) already
+        taken by entries outside the problem. ``blocked_slots`` are slot indexes
+        no group can use (shared entries such as assemblies).
+        """
+        self.lessons = list(lessons)
+        self.slots = list(slots)
+        self.rooms = sorted(rooms, key=lambda r: (r.capacity, r.name))
+        self.capacities = [r.capacity for r in self.rooms]
+        self.rng = random.Random(seed)
+        self.slot_day = [day for day, _ in self.slots]
+
+        blocked = set(blocked_slots)
+        unavailable = unavailable or {}
+        self.candidate_slots = {}
+        for lesson in self.lessons:
+            if lesson.teacher_id not in self.candidate_slots:
+                off = set(unavailable.get(lesson.teacher_id, ())) | blocked
+                self.candidate_slots[lesson.teacher_id] = [s for s in range(len(self.slots)) if s not in off]
+
+        self.teacher_at = {}
+        self.group_at = {}
+        self.room_at = {}
+        self.free_rooms = [list(range(len(self.rooms))) for _ in self.slots]
+        self.group_day_load = defaultdict(int)
+        self.group_day_subject = defaultdict(int)
+        self.placements = {}
+        self.evictions = defaultdict(int)
+
+        room_index = {room.name: r for r, room in enumerate(self.rooms)}
+        for teacher_id, s, room_name in fixed or ():
+            self.teacher_at[(teacher_id, s)] = FIXED
+            r = room_index.get(room_name)
+            if r is not None and (r, s) not in self.room_at:
+                self.room_at[(r, s)] = FIXED
+                self.free_rooms[s].remove(r)
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _place(self, i, s, r):
+        lesson = self.lessons[i]
+        day = self.slot_day[s]
+        self.teacher_at[(lesson.teacher_id, s)] = i
+        self.group_at[(lesson.group_id, s)] = i
+        self.room_at[(r, s)] = i
+        self.free_rooms[s].remove(r)
+        self.group_day_load[(lesson.group_id, day)] += 1
+        self.group_day_subject[(lesson.group_id, day, lesson.subject_id)] += 1
+        self.placements[i] = (s, r)
+
+    def _unplace(self, i):
+        s, r = self.placements.pop(i)
+        lesson = self.lessons[i]
+        day = self.slot_day[s]
+        del self.teacher_at[(lesson.teacher_id, s)]
+        del self.group_at[(lesson.group_id, s)]
+        del self.room_at[(r, s)]
+        insort(self.free_rooms[s], r)
+        self.group_day_load[(lesson.group_id, day)] -= 1
+        self.group_day_subject[(lesson.group_id, day, lesson.subject_id)] -= 1
+
+    # -- search ------------------------------------------------------------
+
+    def _best_move(self, i):
+        lesson = self.lessons[i]
+        first_fit = bisect_left(self.capacities, lesson.size)
+        if first_fit == len(self.rooms):
+            return None
+        best = None
+        best_score = None
+        for s in self.candidate_slots[lesson.teacher_id]:
+            conflicts = []
+            other = self.teacher_at.get((lesson.teacher_id, s))
+            if other == FIXED:
+                continue
+            if other is not None:
+                conflicts.append(other)
+            other = self.group_at.get((lesson.group_id, s))
+            if other is not None and other not in conflicts:
+                conflicts.append(other)
+
+            free = self.free_rooms[s]
+            k = bisect_left(free, first_fit)
+            if k < len(free):
+                r = free[k]
+            else:
+                # No suitable room free: take the smallest one held by a movable lesson
+                r = None
+                for candidate in range(first_fit, len(self.rooms)):
+                    holder = self.room_at.get((candidate, s))
+                    if holder != FIXED:
+                        r = candidate
+                        if holder not in conflicts:
+                            conflicts.append(holder)
+                        break
+                if r is None:
+                    continue
+
+            day = self.slot_day[s]
+            score = (
+                sum(1000 + 50 * self.evictions[j] for j in conflicts)
+                + 20 * self.group_day_subject[(lesson.group_id, day, lesson.subject_id)]
+                + 2 * self.group_day_load[(lesson.group_id, day)]
+                + self.rng.random()
+            )
+            if best_score is None or score < best_score:
+                best_score = score
+                best = (s, r, conflicts)
+                if score < 1:
+                    break
+        return best
+
+    def _difficulty(self, i, teacher_load, group_load):
+        lesson = self.lessons[i]
+        return (
+            len(self.candidate_slots[lesson.teacher_id]) - teacher_load[lesson.teacher_id],
+            -lesson.size,
+            -group_load[lesson.group_id],
+        )
+
+    def diagnose(self):
+        """Obvious reasons the problem cannot be fully solved."""
+        problems = []
+        teacher_load = defaultdict(int)
+        group_load = defaultdict(int)
+        for lesson in self.lessons:
+            teacher_load[lesson.teacher_id] += 1
+            group_load[lesson.group_id] += 1
+            if not self.capacities or lesson.size > self.capacities[-1]:
+                problems.append(f"group {lesson.group_id} ({lesson.size} students) fits in no room")
+        for teacher_id, load in teacher_load.items():
+            available = len(self.candidate_slots[teacher_id])
+            if load > available:
+                problems.append(f"teacher {teacher_id} needs {load} hours but is available for {available}")
+        # Lessons too big for the smaller rooms must fit in the larger ones
+        for k, capacity in enumerate(self.capacities):
+            demand = sum(1 for lesson in self.lessons if lesson.size > capacity)
+            supply = (len(self.rooms) - k - 1) * len(self.slots)
+            if demand > supply:
+                problems.append(f"{demand} lessons need rooms above {capacity} seats but only {supply} room-hours exist")
+                break
+        for group_id, load in group_load.items():
+            if load > len(self.slots):
+                problems.append(f"group {group_id} needs {load} hours but the week has {len(self.slots)} slots")
+        return sorted(set(problems))
+
+    def solve(self, time_limit=10.0, max_iterations=None):
+        started = time.perf_counter()
+        deadline = started + time_limit
+        max_iterations = max_iterations or 50 * max(len(self.lessons), 1)
+
+        teacher_load = defaultdict(int)
+        group_load = defaultdict(int)
+        for lesson in self.lessons:
+            teacher_load[lesson.teacher_id] += 1
+            group_load[lesson.group_id] += 1
+        order = sorted(range(len(self.lessons)), key=lambda i: self._difficulty(i, teacher_load, group_load))
+        queue = deque(order)
+        hopeless = []
+        iterations = 0
+
+        while queue and iterations < max_iterations:
+            if iterations % 256 == 0 and time.perf_counter() > deadline:
+                break
+            iterations += 1
+            i = queue.popleft()
+            move = self._best_move(i)
+            if move is None:
+                hopeless.append(i)
+                continue
+            s, r, conflicts = move
+            for j in conflicts:
+                self._unplace(j)
+                self.evictions[j] += 1
+                queue.append(j)
+            self._place(i, s, r)
+
+        unplaced = sorted(set(queue) | set(hopeless))
+        return ScheduleResult(
+            self.slots, self.rooms, self.lessons, dict(self.placements), unplaced,
+            iterations, time.perf_counter() - started,
+        )
+
+
+def all_slots():
+    from .models import Timetable
+    return [(day, slot) for day, _ in Timetable.DAY_CHOICES for slot, _ in Timetable.TIME_CHOICES]
+
+
+def build_solver(group_ids=None, seed=0):
+    """Load assignments, rooms and availability from the database into a solver."""
+    from admins.models import GroupSubjectAssignment, Room as RoomModel
+    from students.models import Student
+    from .models import Timetable, TeacherUnavailability
+
+    slots = all_slots()
+    slot_index = {slot: s for s, slot in enumerate(slots)}
+
+    assignments = GroupSubjectAssignment.objects.filter(hours_per_week__gt=0)
+    if group_ids:
+        assignments = assignments.filter(group_id__in=group_ids)
+    assignments = list(assignments)
+    scope = {a.group_id for a in assignments}
+
+    sizes = dict(
+        Student.objects.filter(group_id__in=scope).values('group_id').annotate(n=Count('id')).values_list('group_id', 'n')
+    )
+    lessons = [
+        Lesson(a.id, a.group_id, a.subject_id, a.teacher_id, sizes.get(a.group_id, 0))
+        for a in assignments
+        for _ in range(a.hours_per_week)
+    ]
+    rooms = [Room(name, capacity) for name, capacity in RoomModel.objects.values_list('name', 'capacity')]
+
+    unavailable = defaultdict(set)
+    for teacher_id, day, time_slot in TeacherUnavailability.objects.values_list('teacher_id', 'day', 'time_slot'):
+        unavailable[teacher_id].add(slot_index[(day, time_slot)])
+
+    # Entries of groups we are not regenerating stay where they are
+    fixed = []
+    blocked = set()
+    kept = Timetable.objects.exclude(group_id__in=scope).values_list('group_id', 'subject__teacher_id', 'day', 'time_slot', 'room_number')
+    for group_id, teacher_id, day, time_slot, room_number in kept:
+        s = slot_index[(day, time_slot)]
+        fixed.append((teacher_id, s, room_number))
+        if group_id is None:
+            blocked.add(s)
+
+    return TimetableSolver(lessons, slots, rooms, unavailable, fixed, blocked, seed=seed), scope
+
+
+def generate_timetable(group_ids=None, seed=0, time_limit=10.0, commit=True, allow_partial=False):
+    """
+    Solve the timetable for ``group_ids`` (all assigned groups by default) and,
+    if ``commit``, replace those groups' entries with the result.
+    """
+    from .models import Timetable
+    from . import timetable
+
+    solver, scope = build_solver(group_ids, seed=seed)
+    result = solver.solve(time_limit=time_limit)
+    if commit and (result.complete or allow_partial):
+        with transaction.atomic():
+            Timetable.objects.filter(group_id__in=scope).delete()
+            Timetable.objects.bulk_create([
+                Timetable(group_id=lesson.group_id, subject_id=lesson.subject_id, day=day, time_slot=time_slot, room_number=room)
+                for lesson, day, time_slot, room in result.entries()
+            ])
+        # bulk_create skips post_save, so refresh the index explicitly
+        timetable.invalidate()
+    return result
+
+
+def synthetic_solver(groups, subjects_per_group=6, hours=4, room_utilisation=0.75, unavailable_ratio=0.1, seed=0):
+    """Random institution of ``groups`` groups, used by the benchmark."""
+    rng = random.Random(seed)
+    slots = all_slots()
+    lessons = []
+    # Every teacher takes about four assignments, never twice in one group
+    teacher_count = max(subjects_per_group, groups * subjects_per_group // 4)
+    teacher_ids = list(range(teacher_count))
+    rng.shuffle(teacher_ids)
+    for g in range(groups):
+        size = rng.randint(30, 90)
+        for k in range(subjects_per_group):
+            teacher_id = teacher_ids[(g * subjects_per_group + k) % teacher_count]
+            lessons.extend(Lesson(None, g, k, teacher_id, size) for _ in range(hours))
+
+    # Enough rooms of each size for the groups that need them
+    tiers = [60, 90, 120]
+    demand = defaultdict(int)
+    for lesson in lessons:
+        demand[next(c for c in tiers if c >= lesson.size)] += 1
+    rooms = []
+    for capacity in tiers:
+        count = -(-demand[capacity] // int(len(slots) * room_utilisation)) if demand[capacity] else 0
+        rooms.extend(Room(f"R{capacity}-{r}", capacity) for r in range(count))
+    unavailable = {
+        t: set(rng.sample(range(len(slots)), int(len(slots) * unavailable_ratio)))
+        for t in range(teacher_count)
+    }
+    return TimetableSolver(lessons, slots, rooms, unavailable, seed=seed)
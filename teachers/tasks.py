@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.tasks import task
+from .scheduler import generate_timetable
+
+# The last generation requested from the admin page and, once it ran, its outcome
+STATUS_KEY = 'timetable:generation'
+STATUS_TTL = 24 * 3600
+
+
+def generation_status():
+    return cache.get(STATUS_KEY)
+
+
+@task(queue='timetable', max_attempts=1)
+def generate_timetable_task(time_limit=10.0, allow_partial=False):
+    """Run the timetable generator for every assigned group and remember the outcome for the admin page"""
+    try:
+        result = generate_timetable(time_limit=time_limit, allow_partial=allow_partial)
+    except Exception:
+        cache.set(STATUS_KEY, {'state': 'failed', 'finished_at': timezone.now().isoformat()}, STATUS_TTL)
+        raise
+    cache.set(STATUS_KEY, {
+        'state': 'done',
+        'complete': result.complete,
+        'allow_partial': allow_partial,
+        'finished_at': timezone.now().isoformat(),
+        **result.summary(),
+    }, STATUS_TTL)
+
+
+def queue_generation(time_limit, allow_partial):
+    cache.set(STATUS_KEY, {'state': 'queued', 'queued_at': timezone.now().isoformat()}, STATUS_TTL)
+    generate_timetable_task.delay(time_limit=time_limit, allow_partial=allow_partial, dedup_key='timetable:generate')
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.utils import timezone
+
+from admins.models import Degree, Branch, Group, GroupSubjectAssignment
+from core.models import Attendance
+from core.pubsub import Broker
+from students.models import Student
+from .models import Teacher, Subject, QRCode, Timetable
+from . import live, rollcall, timetable
+
+
+class BrokerTestCase(TestCase):
+    def test_wait_wakes_on_publish(self):
+        """Test subscribers are released by a publish on their topic"""
+        broker = Broker()
+        result = {}
+
+        def subscriber():
+            result['version'], result['events'] = broker.wait('t', 0, timeout=5)
+
+        thread = threading.Thread(target=subscriber)
+        thread.start()
+        broker.publish('t', {'n': 1})
+        thread.join(timeout=5)
+        self.assertEqual(result['version'], 1)
+        self.assertEqual(result['events'], [{'n': 1}])
+
+    def test_wait_times_out_without_events(self):
+        """Test waiting on a quiet topic returns no events"""
+        broker = Broker()
+        self.assertEqual(broker.wait('quiet', 0, timeout=0.01), (0, []))
+
+    async def test_wait_async_wakes_on_publish_from_thread(self):
+        """Test coroutines waiting on a topic are woken by a publish in another thread"""
+        broker = Broker()
+        threading.Timer(0.05, broker.publish, args=('t', {'n': 1})).start()
+        self.assertEqual(await broker.wait_async('t', 0, timeout=5), (1, [{'n': 1}]))
+        self.assertEqual(await broker.wait_async('t', 1, timeout=0.01), (1, []))
+
+
+class LiveAttendanceTestCase(TestCase):
+    def setUp(self):
+        live._sessions.clear()
+        teacher_user = User.objects.create_user(username='teacher', password='testpass123')
+        self.teacher = Teacher.objects.create(user=teacher_user, employee_id='T001', department='CS')
+        self.subject = Subject.objects.create(name='Test Subject', code='TEST101', teacher=self.teacher)
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        group = Group.objects.create(name='G1', branch=branch, degree=degree)
+        GroupSubjectAssignment.objects.create(group=group, subject=self.subject, teacher=self.teacher)
+        self.students = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'student{i}', password='testpass123')
+            self.students.append(Student.objects.create(user=user, roll_number=f'S00{i}', group=group))
+        self.qr_data = json.dumps({'subject_id': self.subject.id, 'teacher_id': self.teacher.id})
+        self.qr_code = QRCode.objects.create(
+            subject=self.subject,
+            teacher=self.teacher,
+            expires_at=timezone.now() + timedelta(minutes=15),
+            qr_data=self.qr_data,
+        )
+        self.client = Client()
+
+    def test_scan_updates_live_status(self):
+        """Test a scan is reflected in the live feed without reloading the dashboard"""
+        self.client.login(username='teacher', password='testpass123')
+        url = reverse('teachers:qr_live_status', args=[self.qr_code.id])
+        snapshot = self.client.get(url, {'since': -1}).json()
+        self.assertEqual((snapshot['scanned'], snapshot['total']), (0, 3))
+
+        student_client = Client()
+        student_client.login(username='student1', password='testpass123')
+        student_client.post(reverse('students:scan_qr'), {'qr_data': self.qr_data})
+
+        snapshot = self.client.get(url, {'since': snapshot['version']}).json()
+        self.assertEqual(snapshot['scanned'], 1)
+        self.assertEqual([s['roll_number'] for s in snapshot['pending']], ['S000', 'S002'])
+
+    async def test_stream_sends_initial_snapshot(self):
+        """Test the SSE feed opens with the current counts"""
+        await self.async_client.alogin(username='teacher', password='testpass123')
+        response = await self.async_client.get(reverse('teachers:qr_live_stream', args=[self.qr_code.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertIn(b'"total": 3', await anext(chunks))
+        await chunks.aclose()
+
+    def test_stream_under_wsgi(self):
+        """Test the SSE feed is sent as it happens when served over WSGI"""
+        self.client.login(username='teacher', password='testpass123')
+        response = self.client.get(reverse('teachers:qr_live_stream', args=[self.qr_code.id]))
+        self.assertFalse(response.is_async)
+        chunks = iter(response.streaming_content)
+        started = time.monotonic()
+        next(chunks)
+        self.assertIn(b'"scanned": 0', next(chunks))
+        threading.Timer(0.2, live.record_scan, args=(self.qr_code, self.students[0])).start()
+        self.assertIn(b'"scanned": 1', next(chunks))
+        self.assertLess(time.monotonic() - started, 5)
+        response.close()
+
+    def test_long_poll_wakes_on_scan(self):
+        """Test a waiting long-poll returns as soon as a student scans"""
+        self.client.login(username='teacher', password='testpass123')
+        url = reverse('teachers:qr_live_status', args=[self.qr_code.id])
+        version = self.client.get(url, {'since': -1}).json()['version']
+        session = live._sessions[self.qr_code.id]
+        timer = threading.Timer(0.2, live.record_scan, args=(self.qr_code, self.students[0]))
+        timer.start()
+        started = time.monotonic()
+        snapshot = self.client.get(url, {'since': version}).json()
+        timer.join()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(snapshot['scanned'], 1)
+        self.assertIs(live._sessions[self.qr_code.id], session)
+
+    def test_counts_only_the_roster(self):
+        """Test students outside the class do not count, and unwatched QRs publish nothing"""
+        outsider = Student.objects.create(user=User.objects.create_user(username='outsider'), roll_number='X001')
+        live.record_scan(self.qr_code, outsider)
+        self.assertEqual(live.broker.version(live.topic_for(self.qr_code.id)), 0)
+        Attendance.objects.create(student=outsider, subject=self.subject, date=timezone.localdate(), is_present=True)
+        self.client.login(username='teacher', password='testpass123')
+        url = reverse('teachers:qr_live_status', args=[self.qr_code.id])
+        snapshot = self.client.get(url, {'since': -1}).json()
+        self.assertEqual((snapshot['scanned'], snapshot['total']), (0, 3))
+        live.record_scan(self.qr_code, outsider)
+        self.assertEqual(self.client.get(url, {'since': -1}).json()['scanned'], 0)
+
+    def test_live_feed_requires_owner(self):
+        """Test students cannot subscribe to a teacher's QR session"""
+        self.client.login(username='student0', password='testpass123')
+        response = self.client.get(reverse('teachers:qr_live_status', args=[self.qr_code.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class TimetableIndexTestCase(TestCase):
+    def setUp(self):
+        timetable.invalidate()
+        user = User.objects.create_user(username='teacher', password='testpass123')
+        self.teacher = Teacher.objects.create(user=user, employee_id='T001', department='CS')
+        self.math = Subject.objects.create(name='Mathematics', code='MATH101', teacher=self.teacher)
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        self.g1 = Group.objects.create(name='G1', branch=branch, degree=degree)
+        self.g2 = Group.objects.create(name='G2', branch=branch, degree=degree)
+        Timetable.objects.create(group=self.g1, day='Monday', time_slot='09:00', subject=self.math, room_number='A101')
+        # 2024-01-01 was a Monday
+        self.monday_9 = datetime(2024, 1, 1, 9, 20)
+
+    def test_same_slot_for_different_groups(self):
+        """Test two groups can hold classes in the same slot"""
+        Timetable.objects.create(group=self.g2, day='Monday', time_slot='09:00', subject=self.math, room_number='B201')
+        self.assertEqual(timetable.current_session(self.g1.id, self.monday_9)['room'], 'A101')
+        self.assertEqual(timetable.current_session(self.g2.id, self.monday_9)['room'], 'B201')
+
+    def test_free_period_follows_group_timetable(self):
+        """Test free periods come from the group's timetable, not fixed windows"""
+        Timetable.objects.create(group=self.g2, day='Monday', time_slot='11:00', subject=self.math, room_number='B201')
+        self.assertFalse(timetable.is_free_period(self.g1.id, self.monday_9))
+        self.assertTrue(timetable.is_free_period(self.g2.id, self.monday_9))
+        self.assertFalse(timetable.is_free_period(self.g2.id, datetime(2024, 1, 1, 20, 0)))
+
+    def test_no_free_period_without_classes(self):
+        """Test days without classes and groups without a timetable have no free period"""
+        g3 = Group.objects.create(name='G3', branch=self.g1.branch, degree=self.g1.degree)
+        self.assertFalse(timetable.is_free_period(g3.id, self.monday_9))
+        self.assertIsNone(timetable.next_free_period(g3.id, self.monday_9))
+        # 2024-01-07 was a Sunday; G1 only has classes on Mondays
+        sunday = datetime(2024, 1, 7, 10, 0)
+        self.assertFalse(timetable.is_free_period(self.g1.id, sunday))
+        self.assertEqual(timetable.next_free_period(self.g1.id, sunday)['date'].isoformat(), '2024-01-08')
+
+    def test_index_reloads_on_change(self):
+        """Test edits to the timetable are visible without a restart"""
+        self.assertIsNone(timetable.next_session(self.g1.id, self.monday_9))
+        Timetable.objects.create(group=self.g1, day='Monday', time_slot='11:00', subject=self.math, room_number='C301')
+        self.assertEqual(timetable.next_session(self.g1.id, self.monday_9)['time'], '11:00')
+        self.assertEqual(timetable.current_session_for_teacher(self.teacher.id, self.monday_9)['group_id'], self.g1.id)
+
+    def test_next_free_period(self):
+        """Test the next free period comes from the group's free-slot index"""
+        Timetable.objects.create(group=self.g1, day='Monday', time_slot='10:00', subject=self.math, room_number='A101')
+        period = timetable.next_free_period(self.g1.id, self.monday_9)
+        self.assertEqual((period['start'].hour, period['end'].hour, period['is_now']), (11, 17, False))
+        Timetable.objects.create(group=self.g2, day='Monday', time_slot='11:00', subject=self.math, room_number='B201')
+        period = timetable.next_free_period(self.g2.id, self.monday_9)
+        self.assertTrue(period['is_now'])
+        # After hours the next free period is on the next day with classes
+        Timetable.objects.create(group=self.g1, day='Tuesday', time_slot='12:00', subject=self.math, room_number='A101')
+        period = timetable.next_free_period(self.g1.id, datetime(2024, 1, 1, 18, 0))
+        self.assertEqual((period['day'], period['start'].hour), ('Tuesday', 9))
+
+
+class RollCallSyncTestCase(TestCase):
+    def setUp(self):
+        teacher_user = User.objects.create_user(username='teacher', password='testpass123')
+        teacher = Teacher.objects.create(user=teacher_user, employee_id='T001', department='CS')
+        self.subject = Subject.objects.create(name='Physics', code='PHY101', teacher=teacher)
+        degree = Degree.objects.create(name='B.Tech')
+        branch = Branch.objects.create(name='CSE', degree=degree)
+        group = Group.objects.create(name='G1', branch=branch, degree=degree)
+        other = Group.objects.create(name='G2', branch=branch, degree=degree)
+        self.assignment = GroupSubjectAssignment.objects.create(group=group, subject=self.subject, teacher=teacher)
+        users = User.objects.bulk_create([User(username=f'student{i}') for i in range(4)])
+        self.students = Student.objects.bulk_create([
+            Student(user=user, roll_number=f'S{i}', group=group if i < 3 else other) for i, user in enumerate(users)
+        ])
+        self.url = reverse('teachers:sync_attendance', args=[self.assignment.id])
+        self.client = Client()
+        self.client.force_login(teacher_user)
+
+    def test_json_upload(self):
+        """Test records are upserted and rejected rows reported by position"""
+        yesterday = (timezone.now().date() - timedelta(days=1)).isoformat()
+        Attendance.objects.create(student=self.students[0], subject=self.subject,
+                                  date=yesterday, is_present=False)
+        records = [
+            {'roll_number': 'S0', 'date': yesterday, 'present': True},
+            {'roll_number': 'S1', 'date': yesterday, 'present': 'no'},
+            {'roll_number': 'S9', 'date': yesterday, 'present': True},
+            {'roll_number': 'S3', 'date': yesterday, 'present': True},
+            {'roll_number': 'S2', 'date': '2999-01-01', 'present': True},
+            {'roll_number': 'S2', 'date': 'yesterday', 'present': True},
+            {'roll_number': 'S2', 'date': yesterday, 'present': 'maybe'},
+        ]
+        response = self.client.post(self.url, json.dumps({'records': records}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual((report['received'], report['created'], report['updated'], report['rejected']), (7, 1, 1, 5))
+        self.assertEqual([(e['row'], e['error']) for e in report['errors']], [
+            (2, 'unknown_roll'), (3, 'not_in_group'), (4, 'future_date'), (5, 'invalid_date'), (6, 'invalid_present'),
+        ])
+        self.assertEqual(dict(Attendance.objects.values_list('student__roll_number', 'is_present')),
+                         {'S0': True, 'S1': False})
+
+    def test_csv_upload(self):
+        """Test a CSV roll call is stored with the same number of queries whatever its size"""
+        def upload(days):
+            lines = ['roll_number,date,present'] + [
+                f'S{i},{timezone.now().date() - timedelta(days=d)},{"1" if i else "0"}'
+                for d in range(1, days + 1) for i in range(3)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                report = rollcall.sync_roll_call(self.assignment, rollcall.parse_records(
+                    '\n'.join(lines).encode(), 'text/csv'))
+            return report, len(queries)
+
+        report, small = upload(2)
+        self.assertEqual((report['created'], report['rejected']), (6, 0))
+        report, large = upload(60)
+        self.assertEqual((report['created'], report['updated'], report['rejected']), (174, 6, 0))
+        self.assertEqual(small, large)
+        self.assertEqual(Attendance.objects.filter(is_present=True).count(), 120)
+        response = self.client.post(self.url, 'roll_number,date,present\nS0,2020-01-01,1', content_type='text/csv')
+        self.assertEqual(response.json()['created'], 1)
+
+    def test_csv_row_longer_than_header(self):
+        """Test a CSV row with extra fields rejects the upload instead of failing"""
+        response = self.client.post(self.url, 'roll_number,date,present\nS0,2020-01-01,1,extra',
+                                    content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', response.json()['error'])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_requires_own_assignment(self):
+        """Test other teachers cannot upload for the assignment"""
+        other = User.objects.create(username='other')
+        Teacher.objects.create(user=other, employee_id='T002', department='CS')
+        client = Client()
+        client.force_login(other)
+        self.assertEqual(client.post(self.url, '[]', content_type='application/json').status_code, 404)
+        self.assertEqual(self.client.post(self.url, '{', content_type='application/json').status_code, 400)
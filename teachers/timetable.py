@@ -0,0 +1,259 @@
+"""
+In-memory weekly timetable index.
+
+All ``Timetable`` rows are loaded once into per-day dictionaries keyed by group
+and by teacher, so "what is happening now for group X" is a pair of dict
+lookups. Saving or deleting a row bumps a version in the shared cache and each
+process rebuilds its copy the next time it notices the version moved.
+"""
+import threading
+import time as _time
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Subject, Timetable
+
+VERSION_KEY = 'timetable:version'
+
+DAYS = [day for day, _ in Timetable.DAY_CHOICES]
+SLOTS = [slot for slot, _ in Timetable.TIME_CHOICES]
+SLOT_SET = frozenset(SLOTS)
+DAYS_BY_WEEKDAY = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class TimetableIndex:
+    def __init__(self, version, rows):
+        self.version = version
+        # day -> group_id (None = shared) -> time_slot -> entry
+        self.by_group = {day: {} for day in DAYS}
+        # day -> teacher_id -> time_slot -> entry
+        self.by_teacher = {day: {} for day in DAYS}
+        # (group_id, day) -> free periods, filled lazily
+        self._free = {}
+        for row in rows:
+            entry = {
+                'id': row.id,
+                'time': row.time_slot,
+                'subject': row.subject.name,
+                'subject_id': row.subject_id,
+                'teacher_id': row.subject.teacher_id,
+                'group_id': row.group_id,
+                'room': row.room_number,
+            }
+            self.by_group[row.day].setdefault(row.group_id, {})[row.time_slot] = entry
+            self.by_teacher[row.day].setdefault(row.subject.teacher_id, {})[row.time_slot] = entry
+
+    def day_slots(self, group_id, day):
+        """Slot -> entry for a group on ``day``; group entries override shared ones."""
+        day_map = self.by_group.get(day, {})
+        shared = day_map.get(None, {})
+        if group_id is None:
+            return shared
+        own = day_map.get(group_id, {})
+        if not shared:
+            return own
+        return {**shared, **own}
+
+    def at(self, group_id, day, slot):
+        day_map = self.by_group.get(day, {})
+        if group_id is not None:
+            entry = day_map.get(group_id, {}).get(slot)
+            if entry is not None:
+                return entry
+        return day_map.get(None, {}).get(slot)
+
+    def free_periods(self, group_id, day):
+        """
+        Contiguous runs of free teaching slots, as [{'start', 'end'}] (cached).
+        A day on which the group has no class at all (Sunday, or any day for
+        a group without a timetable) is not a teaching day and has none.
+        """
+        key = (group_id, day)
+        periods = self._free.get(key)
+        if periods is None:
+            busy = self.day_slots(group_id, day)
+            periods = []
+            for slot in SLOTS if busy else ():
+                if slot in busy:
+                    continue
+                end = _slot_end(slot)
+                if periods and periods[-1]['end'] == slot:
+                    periods[-1]['end'] = end
+                else:
+                    periods.append({'start': slot, 'end': end})
+            self._free[key] = periods
+        return periods
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_index():
+    """Return the process-local index, rebuilding it if the timetable changed."""
+    global _index
+    version = _current_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _index_lock:
+        if _index is None or _index.version != version:
+            rows = Timetable.objects.select_related('subject')
+            _index = TimetableIndex(version, rows)
+        return _index
+
+
+def invalidate():
+    global _index
+    _index = None
+    cache.set(VERSION_KEY, _time.time_ns(), None)
+
+
+@receiver([post_save, post_delete], sender=Timetable)
+@receiver([post_save, post_delete], sender=Subject)
+def _timetable_changed(sender, **kwargs):
+    invalidate()
+
+
+def _slot_end(slot):
+    return f"{int(slot[:2]) + 1:02d}:00"
+
+
+def slot_for(moment):
+    """Map a time (or datetime) to its hourly slot key, or None outside teaching hours."""
+    slot = f"{moment.hour:02d}:00"
+    return slot if slot in SLOT_SET else None
+
+
+def _local(now):
+    now = now or timezone.now()
+    return timezone.localtime(now) if timezone.is_aware(now) else now
+
+
+def sessions_for_day(group_id, day):
+    """Ordered list of sessions a group has on ``day`` (a weekday name)."""
+    slots = get_index().day_slots(group_id, day)
+    return [slots[slot] for slot in SLOTS if slot in slots]
+
+
+def current_session(group_id, now=None):
+    """The session a group is in right now, or None."""
+    now = _local(now)
+    slot = slot_for(now)
+    if slot is None:
+        return None
+    return get_index().at(group_id, now.strftime('%A'), slot)
+
+
+def current_session_for_teacher(teacher_id, now=None):
+    """The session a teacher is teaching right now, or None."""
+    now = _local(now)
+    slot = slot_for(now)
+    if slot is None:
+        return None
+    return get_index().by_teacher.get(now.strftime('%A'), {}).get(teacher_id, {}).get(slot)
+
+
+def next_session(group_id, now=None):
+    """The next session later today for a group, or None."""
+    now = _local(now)
+    slots = get_index().day_slots(group_id, now.strftime('%A'))
+    current = f"{now.hour:02d}:00"
+    for slot in SLOTS:
+        if slot > current and slot in slots:
+            return slots[slot]
+    return None
+
+
+def is_free_period(group_id, now=None):
+    """True during teaching hours of a teaching day when the group has no class scheduled."""
+    now = _local(now)
+    slot = slot_for(now)
+    if slot is None:
+        return False
+    busy = get_index().day_slots(group_id, now.strftime('%A'))
+    return bool(busy) and slot not in busy
+
+
+def next_free_period(group_id, now=None, days_ahead=7):
+    """
+    The free period a group is in now, or the next one (looking up to
+    ``days_ahead`` days ahead). Returns a dict with ``date``, ``day``,
+    ``start``, ``end`` (local datetimes) and ``is_now``, or None.
+    """
+    now = _local(now)
+    index = get_index()
+    current = now.strftime('%H:%M')
+    for offset in range(days_ahead + 1):
+        date = now.date() + timedelta(days=offset)
+        day = date.strftime('%A')
+        for period in index.free_periods(group_id, day):
+            if offset == 0 and period['end'] <= current:
+                continue
+            start = datetime.combine(date, datetime.strptime(period['start'], '%H:%M').time(), now.tzinfo)
+            end = datetime.combine(date, datetime.strptime(period['end'], '%H:%M').time(), now.tzinfo)
+            return {
+                'date': date,
+                'day': day,
+                'start': start,
+                'end': end,
+                'is_now': start <= now < end,
+            }
+    return None
+
+
+def remaining_sessions(group_id, until, now=None):
+    """
+    Subject id -> number of sessions a group still has from now until the
+    date ``until`` (inclusive). Counted per weekday rather than per date:
+    sessions per weekday times how often that weekday is left.
+    """
+    now = _local(now)
+    index = get_index()
+    per_day = {}
+    for day in DAYS:
+        counts = {}
+        for entry in index.day_slots(group_id, day).values():
+            counts[entry['subject_id']] = counts.get(entry['subject_id'], 0) + 1
+        per_day[day] = counts
+
+    remaining = {}
+    # The rest of today: sessions that have not started yet
+    if now.date() <= until:
+        current = f"{now.hour:02d}:00"
+        for slot, entry in index.day_slots(group_id, now.strftime('%A')).items():
+            if slot > current:
+                remaining[entry['subject_id']] = remaining.get(entry['subject_id'], 0) + 1
+    # Whole days from tomorrow: full weeks plus the leftover days
+    days = (until - now.date()).days
+    if days > 0:
+        weeks, extra = divmod(days, 7)
+        weekday = now.weekday()
+        for offset in range(7):
+            day = DAYS_BY_WEEKDAY[(weekday + 1 + offset) % 7]
+            times = weeks + (1 if offset < extra else 0)
+            for subject_id, count in per_day.get(day, {}).items():
+                remaining[subject_id] = remaining.get(subject_id, 0) + count * times
+    return remaining
+
+
+def weekly_timetable(group_id=None):
+    """Day name -> ordered sessions, for every day that has classes."""
+    week = {}
+    for day in DAYS:
+        sessions = sessions_for_day(group_id, day)
+        if sessions:
+            week[day] = sessions
+    return week
@@ -8,8 +8,11 @@ urlpatterns = [
     path('groups/', views.group_selection, name='group_selection'),
     path('group/<int:subject_id>/', views.group_dashboard, name='group_dashboard'),
     path('group/<int:subject_id>/generate-qr/', views.generate_qr, name='generate_qr'),
+    path('qr/<int:qr_id>/live/', views.qr_live_status, name='qr_live_status'),
+    path('qr/<int:qr_id>/live/stream/', views.qr_live_stream, name='qr_live_stream'),
     path('group/<int:subject_id>/upload-material/', views.upload_material, name='upload_material'),
     path('attendance/<int:assignment_id>/', views.attendance_report, name='attendance_report'),
+    path('attendance/<int:assignment_id>/sync/', views.sync_attendance, name='sync_attendance'),
 ]
 
 
@@ -1,22 +1,38 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
 from django.db import models
+from django.views.decorators.http import require_POST
+import csv
 import json
 from datetime import timedelta
 
+from core.roles import TEACHER, role_required
 from core.models import Attendance, Material, Announcement
-from core.utils import generate_qr_code, calculate_attendance_percentage
+from core.ratelimit import rate_limit
+from core.utils import generate_qr_code, student_attendance_percentages, qr_token
+from core.pubsub import broker
+from core.routers import replica_reads
 from .models import Subject, QRCode
+from . import live
+from . import rollcall
+from . import timetable
 from admins.models import GroupSubjectAssignment
 
+# Seconds a live-feed request waits for a scan before answering/heartbeating
+LIVE_POLL_TIMEOUT = 25
+LIVE_HEARTBEAT = 15
+
 
 @login_required
+@role_required(TEACHER)
 def teacher_dashboard(request):
-    teacher = request.user.teacher
+    teacher = request.profile
     
     # Get teacher's group-subject assignments
     assignments = GroupSubjectAssignment.objects.select_related('group', 'subject').filter(teacher=teacher)
@@ -45,13 +61,10 @@ def teacher_dashboard(request):
 
 
 @login_required
+@role_required(TEACHER)
 def group_selection(request):
     """Step 1: Teacher selects a group/class"""
-    if not hasattr(request.user, 'teacher'):
-        messages.error(request, 'Access denied.')
-        return redirect('core:dashboard')
-    
-    teacher = request.user.teacher
+    teacher = request.profile
     assignments = GroupSubjectAssignment.objects.select_related('group', 'subject').filter(teacher=teacher)
     
     context = {
@@ -62,18 +75,16 @@ def group_selection(request):
 
 
 @login_required
+@role_required(TEACHER)
+@replica_reads
 def group_dashboard(request, subject_id):
     """Step 2: Show QR attendance, upload materials, view reports for selected group"""
-    if not hasattr(request.user, 'teacher'):
-        messages.error(request, 'Access denied.')
-        return redirect('core:dashboard')
-    
-    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user.teacher)
-    teacher = request.user.teacher
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.profile)
+    teacher = request.profile
     
     # Students should be those in the selected assignment's group if exists
     from students.models import Student
-    assignment = GroupSubjectAssignment.objects.filter(subject_id=subject_id, teacher=request.user.teacher).select_related('group').first()
+    assignment = GroupSubjectAssignment.objects.filter(subject_id=subject_id, teacher=request.profile).select_related('group').first()
     if assignment:
         students = Student.objects.filter(group=assignment.group)
     else:
@@ -81,11 +92,11 @@ def group_dashboard(request, subject_id):
     
     # Get attendance reports for this subject
     attendance_reports = []
+    percentages = student_attendance_percentages(subject, students)
     for student in students:
-        percentage = calculate_attendance_percentage(student, subject)
         attendance_reports.append({
             'student': student,
-            'percentage': percentage
+            'percentage': percentages.get(student.id, 0.0)
         })
     
     # Get materials for this subject
@@ -102,53 +113,131 @@ def group_dashboard(request, subject_id):
 
 
 @login_required
+@role_required(TEACHER)
 def generate_qr(request, subject_id):
-    if not hasattr(request.user, 'teacher'):
-        messages.error(request, 'Access denied.')
-        return redirect('core:dashboard')
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.profile)
     
-    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user.teacher)
+    # Timetable session the teacher is in right now, if it is this subject
+    session = timetable.current_session_for_teacher(request.profile.id)
+    if session and session['subject_id'] != subject.id:
+        session = None
     
     if request.method == 'POST':
-        # Create QR code data
+        expires_at = timezone.now() + timedelta(minutes=15)
+        qr_code = QRCode.objects.create(
+            subject=subject,
+            teacher=request.profile,
+            group_id=session['group_id'] if session else None,
+            expires_at=expires_at,
+        )
+        
+        # Create QR code data; the signed token lets offline scans be checked when they sync
         qr_data = {
             'subject_id': subject.id,
-            'teacher_id': request.user.teacher.id,
-            'timestamp': timezone.now().isoformat(),
-            'expires_at': (timezone.now() + timedelta(minutes=15)).isoformat()
+            'teacher_id': request.profile.id,
+            'timestamp': qr_code.created_at.isoformat(),
+            'expires_at': expires_at.isoformat(),
+            'token': qr_token(qr_code.id),
         }
         
         # Generate QR code
         qr_string = json.dumps(qr_data)
         qr_image = generate_qr_code(qr_string)
         
-        # Save QR code to database
-        qr_code = QRCode.objects.create(
-            subject=subject,
-            teacher=request.user.teacher,
-            expires_at=timezone.now() + timedelta(minutes=15),
-            qr_data=qr_string
-        )
+        # Save QR code data to database
+        qr_code.qr_data = qr_string
+        qr_code.save(update_fields=['qr_data'])
         
         context = {
+            'qr_code': qr_code,
             'qr_image': qr_image,
             'subject': subject,
             'expires_at': qr_code.expires_at,
             'qr_string': qr_string,
+            'session': session,
         }
         return render(request, 'teachers/qr_display.html', context)
     
     # GET request - show form
-    return render(request, 'teachers/generate_qr.html', {'subject': subject})
+    return render(request, 'teachers/generate_qr.html', {'subject': subject, 'session': session})
+
+
+async def _live_session(request, qr_id):
+    """The live session of one of the requesting teacher's QR codes"""
+    qr_code = await aget_object_or_404(QRCode, id=qr_id, teacher=request.profile)
+    # Loading the roster is a one-off per session; keep it off the event loop
+    return await sync_to_async(live.get_session)(qr_code)
 
 
 @login_required
+@role_required(TEACHER, api=True)
+async def qr_live_status(request, qr_id):
+    """Long-poll: answer as soon as the session moves past ``since``."""
+    session = await _live_session(request, qr_id)
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        since = 0
+    if broker.version(session.topic) <= since and not session.is_expired():
+        await broker.wait_async(session.topic, since, timeout=LIVE_POLL_TIMEOUT)
+    return JsonResponse(session.snapshot())
+
+
+def _snapshot_event(snapshot):
+    return f"id: {snapshot['version']}\ndata: {json.dumps(snapshot)}\n\n"
+
+
+async def _live_events(session):
+    yield 'retry: 3000\n\n'
+    while True:
+        snapshot = session.snapshot()
+        yield _snapshot_event(snapshot)
+        if snapshot['expired']:
+            yield 'event: end\ndata: {}\n\n'
+            return
+        version, _ = await broker.wait_async(session.topic, snapshot['version'], timeout=LIVE_HEARTBEAT)
+        while version <= snapshot['version'] and not session.is_expired():
+            yield ': keep-alive\n\n'
+            version, _ = await broker.wait_async(session.topic, snapshot['version'], timeout=LIVE_HEARTBEAT)
+
+
+def _live_events_sync(session):
+    """``_live_events`` for WSGI, which reads an async iterator to the end before sending anything"""
+    yield 'retry: 3000\n\n'
+    while True:
+        snapshot = session.snapshot()
+        yield _snapshot_event(snapshot)
+        if snapshot['expired']:
+            yield 'event: end\ndata: {}\n\n'
+            return
+        version, _ = broker.wait(session.topic, snapshot['version'], timeout=LIVE_HEARTBEAT)
+        while version <= snapshot['version'] and not session.is_expired():
+            yield ': keep-alive\n\n'
+            version, _ = broker.wait(session.topic, snapshot['version'], timeout=LIVE_HEARTBEAT)
+
+
+@login_required
+@role_required(TEACHER, api=True)
+async def qr_live_stream(request, qr_id):
+    """
+    Server-Sent Events feed of scan counts for an active QR session. Under
+    WSGI the stream holds a worker thread for as long as it is open.
+    """
+    session = await _live_session(request, qr_id)
+    if isinstance(request, ASGIRequest):
+        events = _live_events(session)
+    else:
+        events = _live_events_sync(session)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+@role_required(TEACHER)
 def upload_material(request, subject_id):
-    if not hasattr(request.user, 'teacher'):
-        messages.error(request, 'Access denied.')
-        return redirect('core:dashboard')
-    
-    subject = get_object_or_404(Subject, id=subject_id, teacher=request.user.teacher)
+    subject = get_object_or_404(Subject, id=subject_id, teacher=request.profile)
     
     if request.method == 'POST':
         title = request.POST.get('title')
@@ -159,7 +248,7 @@ def upload_material(request, subject_id):
             title=title,
             file=file,
             subject=subject,
-            uploaded_by=request.user.teacher,
+            uploaded_by=request.profile,
             description=description
         )
         
@@ -170,23 +259,36 @@ def upload_material(request, subject_id):
 
 
 @login_required
+@role_required(TEACHER)
+@replica_reads
 def attendance_report(request, assignment_id):
-    if not hasattr(request.user, 'teacher'):
-        messages.error(request, 'Access denied.')
-        return redirect('core:dashboard')
     assignment = get_object_or_404(
         GroupSubjectAssignment.objects.select_related('group', 'subject'),
         id=assignment_id,
-        teacher=request.user.teacher
+        teacher=request.profile
     )
     from students.models import Student
     students = Student.objects.filter(group=assignment.group)
     reports = []
+    percentages = student_attendance_percentages(assignment.subject, students)
     for s in students:
-        percentage = calculate_attendance_percentage(s, assignment.subject)
-        reports.append({'student': s, 'percentage': percentage})
+        reports.append({'student': s, 'percentage': percentages.get(s.id, 0.0)})
     context = {
         'assignment': assignment,
         'reports': reports,
     }
-    return render(request, 'teachers/attendance_report.html', context)
\ No newline at end of file
+    return render(request, 'teachers/attendance_report.html', context)
+
+
+@login_required
+@role_required(TEACHER, api=True)
+@rate_limit('upload')
+@require_POST
+def sync_attendance(request, assignment_id):
+    """Bulk upload of a roll call taken offline (JSON or CSV, see teachers/rollcall.py)"""
+    assignment = get_object_or_404(GroupSubjectAssignment, id=assignment_id, teacher=request.profile)
+    try:
+        records = rollcall.parse_records(request.body, request.content_type or '')
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(rollcall.sync_roll_call(assignment, records))
@@ -0,0 +1,26 @@
+{% load static %}/*
+ * Service worker for the scan page: sends scans queued in IndexedDB while
+ * offline once the browser is back online (Background Sync). Results are
+ * passed to open pages so they can show them. Browsers without Background
+ * Sync flush from the page when it comes back online or is reopened.
+ */
+importScripts('{% static "js/scan-queue.js" %}');
+
+const SYNC_URL = '{% url "students:sync_scans" %}';
+
+async function sync() {
+  const results = await ScanQueue.flush(SYNC_URL);
+  if (results.length) {
+    const pages = await self.clients.matchAll({ type: 'window' });
+    pages.forEach((page) => page.postMessage({ type: 'scan-results', results }));
+  }
+}
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => event.waitUntil(self.clients.claim()));
+
+self.addEventListener('sync', (event) => {
+  // A rejected promise makes the browser retry later with backoff
+  if (event.tag === ScanQueue.SYNC_TAG) event.waitUntil(sync());
+});